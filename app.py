@@ -1,26 +1,31 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-from flask import Flask, request
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+from flask import Flask, request, jsonify
 from datetime import datetime, timedelta
-try:
-    from dateutil.relativedelta import relativedelta
-except ImportError:
-    # Sugestão: pip install python-dateutil em seu ambiente
-    relativedelta = None
-import os, json, uuid, logging, traceback
-import numpy as np
-import telegram
-from apscheduler.schedulers.background import BackgroundScheduler
-from pytz import timezone
+import os, io, time, logging, traceback, tempfile
 import re
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
+from itertools import chain
+from ledger import linha_do_range, parse_valor, formatar_valor, com_colunas_tipadas
+from journal import JournalDespesas, WRITE_BEHIND
+from fila import FilaPorChat
+from dedup import DeduplicadorUpdates
+from graficos import ServicoGraficos, limpar_graficos_antigos
+from envio import EnvioResumos
+from importacao import ImportadorExtrato, IMPORTACAO_MAX_BYTES
+from exportacao import linhas_do_periodo, exportar_csv_gzip, resumo_csv, EXPORTACAO_PAGINA
+from sheets import governador_sheets
+from recursos import em_segundo_plano
+from classificador import ClassificadorCategorias, normalizar
+from metricas import registro as registro_metricas, medir_comando, updates_recebidos, amostrador, segredo_perfil
+from servicos import (planilha, fonte_ledger, bot, ledger_local, orcamento, parcelamentos, telegram_token,
+                      timezone_brasilia, sincronizar_ledger, ressincronizar_ledger)
+from tarefas import criar_executor, reconciliar_orcamento
 
 # ========== CONFIG ==========
+if not telegram_token:
+    raise Exception("A variável de ambiente TELEGRAM_TOKEN não está definida!")
+
 app = Flask(__name__)
 app.secret_key = os.environ.get('APP_SECRET_KEY', 'sua_chave_secreta_aqui')
 
@@ -31,71 +36,79 @@ os.makedirs(STATIC_DIR, exist_ok=True)
 logger = logging.getLogger()
 logging.basicConfig(level=logging.INFO)
 
-# ========== GOOGLE SHEETS ==========
-scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-json_creds = os.environ.get("GOOGLE_CREDS_JSON")
-if not json_creds:
-    raise Exception("A variável de ambiente GOOGLE_CREDS_JSON não está definida!")
-
-creds_dict = json.loads(json_creds)
-creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-gc = gspread.authorize(creds)
-
-SHEET_ID = os.environ.get("SHEET_ID", "1vKrmgkMTDwcx5qufF-YRvsXSk99J1Vq9-LwuQINwcl8")
-try:
-    spreadsheet = gc.open_by_key(SHEET_ID)
-    sheet = spreadsheet.sheet1
-except Exception as e:
-    logger.critical(f"Erro ao conectar com a planilha: {e}")
-    raise
-
-# ========== TELEGRAM ==========
-telegram_token = os.environ.get("TELEGRAM_TOKEN")
-if not telegram_token:
-    raise Exception("A variável de ambiente TELEGRAM_TOKEN não está definida!")
-bot = telegram.Bot(token=telegram_token)
+# Gráficos renderizados em memória (PNG), em processos separados e com cache
+servico_graficos = ServicoGraficos()
+servico_graficos.iniciar()
+limpar_graficos_antigos(STATIC_DIR)
 
-contatos = [
-    {"nome": "Larissa", "chat_id": int(os.environ.get("LARISSA_CHAT_ID", 0))},
-    {"nome": "Thiago",  "chat_id": int(os.environ.get("THIAGO_CHAT_ID", 0))}
-]
+# Resumos com legenda na foto e reaproveitamento do file_id de gráficos repetidos
+envio_resumos = EnvioResumos(bot)
 
-# ========== AGENDAMENTO ==========
-timezone_brasilia = timezone("America/Sao_Paulo")
-scheduler = BackgroundScheduler(timezone=timezone_brasilia)
+# ========== LEDGER LOCAL ==========
+# Espelho da planilha (servicos.ledger_local): carregado uma vez e depois só busca as linhas novas
+def atualizar_ledger():
+    try:
+        sincronizar_ledger()
+    except Exception as e:
+        logger.error(f"Erro na sincronização incremental do ledger: {e}")
+
+def registrar_no_ledger(aba, resposta, linhas):
+    primeira_linha = linha_do_range((resposta or {}).get("updates", {}).get("updatedRange"))
+    if primeira_linha:
+        ledger_local.registrar(aba, linhas, primeira_linha)
+    else:
+        ledger_local.ultima_sync = 0.0  # força a próxima sincronização
+
+def gravar_na_planilha(linhas):
+    # Um append por aba (uma só, ou uma por mês no modo particionado)
+    for aba, resposta, lote in fonte_ledger.gravar(linhas):
+        registrar_no_ledger(aba, resposta, lote)
 
-# Função para enviar o lembrete diário
-def enviar_lembrete_diario():
-    mensagem = "⏰ Lembrete: Não se esqueça de registrar suas despesas diárias!"
-    for contato in contatos:
+# Write-behind opcional: confirma após gravar no journal local e descarrega em lote
+journal_despesas = JournalDespesas(gravar_na_planilha, agrupar=fonte_ledger.agrupar) if WRITE_BEHIND else None
+
+# ========== AGENDAMENTO ==========
+# Lembrete e resumo diário: só o processo líder (trava em arquivo) executa
+executor_tarefas = criar_executor()
+
+# ========== INICIALIZAÇÃO EM SEGUNDO PLANO ==========
+# O servidor aceita requisições imediatamente; /health informa quando tudo está pronto
+estado_inicializacao = {"inicio": time.time(), "pronto": False, "segundos": None, "erro": None, "tentativas": 0}
+# Espera (segundos) entre tentativas de conectar na inicialização: dobra a cada falha até o máximo
+INICIALIZACAO_ESPERA = float(os.environ.get("INICIALIZACAO_ESPERA", 1))
+INICIALIZACAO_ESPERA_MAXIMA = float(os.environ.get("INICIALIZACAO_ESPERA_MAXIMA", 60))
+
+def conectar_servicos():
+    planilha.obter()
+    sincronizar_ledger(forcar=True)
+    if not orcamento.reconciliado():
+        reconciliar_orcamento()  # primeira execução: totais do mês a partir do ledger
+    bot.obter()
+
+def inicializar():
+    # Journal e jobs não dependem da conexão: começam já (cada um trata as próprias falhas)
+    if journal_despesas:
+        journal_despesas.iniciar()
+    executor_tarefas.iniciar()
+    espera = INICIALIZACAO_ESPERA
+    while True:
+        estado_inicializacao["tentativas"] += 1
         try:
-            bot.send_message(chat_id=contato["chat_id"], text=mensagem)
-            logger.info(f"Lembrete diário enviado para {contato['nome']}")
+            conectar_servicos()
+            break
         except Exception as e:
-            logger.error(f"Erro ao enviar lembrete para {contato['nome']}: {e}")
+            estado_inicializacao["erro"] = str(e)
+            logger.error(f"Erro na inicialização (nova tentativa em {espera:g}s): {e}")
             logger.error(traceback.format_exc())
+            time.sleep(espera)
+            espera = min(espera * 2, INICIALIZACAO_ESPERA_MAXIMA)
+    estado_inicializacao["erro"] = None
+    estado_inicializacao["pronto"] = True
+    estado_inicializacao["segundos"] = round(time.time() - estado_inicializacao["inicio"], 3)
 
-# Adicionar a tarefa de lembrete diário
-scheduler.add_job(enviar_lembrete_diario, 'cron', hour=20, minute=0)
+em_segundo_plano("inicializacao", inicializar)
 
-# Iniciar o scheduler
-scheduler.start()
 # ========== FUNÇÕES AUXILIARES ==========
-def parse_valor(valor_str):
-    valor_str = str(valor_str).replace("R$", "").replace(" ", "").strip()
-    valor_str = re.sub(r"[^\d\.,]", "", valor_str)
-    if "," in valor_str and "." in valor_str:
-        valor_str = valor_str.replace(".", "").replace(",", ".")
-    elif "," in valor_str:
-        valor_str = valor_str.replace(",", ".")
-    try:
-        return float(valor_str)
-    except:
-        return 0.0
-
-def formatar_valor(valor):
-    return f"R${valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-
 palavras_categoria = {
     "ALIMENTAÇÃO": ["mercado", "alimentação", "pão", "leite", "feira", "comida","almoço","refeição","jantar"],
     "TRANSPORTE": ["uber", "99", "ônibus", "metro", "trem", "corrida", "combustível", "gasolina"],
@@ -106,42 +119,22 @@ palavras_categoria = {
     "ASSINATURA": ["abacus","apple","assinatura","spotify","celular"]
 }
 
+# Autômato compilado uma vez + palavras aprendidas com correções (recarregadas a quente)
+classificador = ClassificadorCategorias(palavras_categoria)
+
 def classificar_categoria(descricao):
-    desc = descricao.lower()
-    for categoria, palavras in palavras_categoria.items():
-        if any(p in desc for p in palavras):
-            return categoria
-    return "OUTROS"
+    return classificador.classificar(descricao)
+
+# Extratos CSV/OFX: gravados direto na planilha em blocos (um append por bloco)
+def gravar_importacao(linhas):
+    gravar_na_planilha(linhas)
+    orcamento.registrar(linhas)
+
+importador_extratos = ImportadorExtrato(gravar_importacao, classificar_categoria, ledger_local.chaves_despesas)
 
 def gerar_grafico(tipo, titulo, dados, categorias=None):
-    plt.figure(figsize=(10, 6))
-    plt.title(titulo)
-    plt.rcParams.update({'font.size': 14})
-    if tipo == 'barra':
-        plt.bar(categorias, dados)
-        plt.xticks(rotation=45, ha='right')
-        plt.tight_layout()
-    elif tipo == 'pizza':
-        if categorias and len(categorias) > 6:
-            top_indices = np.argsort(dados)[-5:]
-            top_categorias = [categorias[i] for i in top_indices]
-            top_dados = [dados[i] for i in top_indices]
-            outros_valor = sum(d for i, d in enumerate(dados) if i not in top_indices)
-            top_categorias.append('Outros')
-            top_dados.append(outros_valor)
-            categorias = top_categorias
-            dados = top_dados
-        plt.pie(dados, labels=categorias, autopct='%1.1f%%', startangle=90, shadow=True)
-        plt.axis('equal')
-    elif tipo == 'linha':
-        plt.plot(categorias, dados, marker='o', linestyle='-')
-        plt.xticks(rotation=45, ha='right')
-        plt.tight_layout()
-    nome_arquivo = f"grafico_{uuid.uuid4().hex}.png"
-    caminho_arquivo = os.path.join(STATIC_DIR, nome_arquivo)
-    plt.savefig(caminho_arquivo, dpi=100, bbox_inches='tight')
-    plt.close()
-    return caminho_arquivo
+    # (PNG em bytes, hash do conteúdo): o hash identifica o file_id já enviado
+    return servico_graficos.gerar(tipo, titulo, dados, categorias)
 
 def detalhar_categorias(categorias_dict, total=0.0):
     texto = ""
@@ -153,21 +146,15 @@ def detalhar_categorias(categorias_dict, total=0.0):
 # ========== FUNÇÕES DE RESUMO ==========
 def gerar_resumo_geral(chat_id):
     try:
-        registros = sheet.get_all_records()
-        total = 0.0
-        categorias = {}
-        for r in registros:
-            valor = parse_valor(r.get("Valor", "0"))
-            total += valor
-            cat = r.get("Categoria", "OUTROS")
-            categorias[cat] = categorias.get(cat, 0) + valor
+        atualizar_ledger()
+        categorias, _, _ = ledger_local.agregar()
+        total = sum(categorias.values())
         resumo = f"📊 Resumo Geral:\n\nTotal registrado: {formatar_valor(total)}"
         resumo += "\n\n" + detalhar_categorias(categorias, total)
         labels = list(categorias.keys())
         valores = list(categorias.values())
-        grafico_path = gerar_grafico('pizza', 'Distribuição de Despesas', valores, labels)
-        bot.send_message(chat_id=chat_id, text=resumo)
-        bot.send_photo(chat_id=chat_id, photo=open(grafico_path, 'rb'))
+        grafico = gerar_grafico('pizza', 'Distribuição de Despesas', valores, labels)
+        envio_resumos.enviar(chat_id, resumo, grafico)
     except Exception as e:
         logger.error(f"Erro no resumo geral: {e}")
         logger.error(traceback.format_exc())
@@ -175,25 +162,18 @@ def gerar_resumo_geral(chat_id):
 
 def gerar_resumo_hoje(chat_id):
     try:
-        hoje = datetime.now(timezone_brasilia).strftime("%d/%m/%Y")
-        registros = sheet.get_all_records()
-        total = 0.0
-        categorias = {}
-        for r in registros:
-            data_str = r.get("Data da Despesa", "").strip()
-            if data_str == hoje:
-                v = parse_valor(r.get("Valor", "0"))
-                total += v
-                cat = r.get("Categoria", "OUTROS")
-                categorias[cat] = categorias.get(cat, 0) + v
+        data_hoje = datetime.now(timezone_brasilia).date()
+        hoje = data_hoje.strftime("%d/%m/%Y")
+        atualizar_ledger()
+        categorias, _, _ = ledger_local.agregar(data_hoje, data_hoje)
+        total = sum(categorias.values())
         resumo = f"📅 Resumo de Hoje ({hoje}):\n\nTotal registrado: {formatar_valor(total)}"
         if categorias:
             resumo += "\n\n" + detalhar_categorias(categorias, total)
             labels = list(categorias.keys())
             valores = list(categorias.values())
-            grafico_path = gerar_grafico('pizza', f'Despesas de Hoje ({hoje})', valores, labels)
-            bot.send_message(chat_id=chat_id, text=resumo)
-            bot.send_photo(chat_id=chat_id, photo=open(grafico_path, 'rb'))
+            grafico = gerar_grafico('pizza', f'Despesas de Hoje ({hoje})', valores, labels)
+            envio_resumos.enviar(chat_id, resumo, grafico)
         else:
             resumo += "\n\nNão há despesas registradas para hoje."
             bot.send_message(chat_id=chat_id, text=resumo)
@@ -204,24 +184,12 @@ def gerar_resumo_hoje(chat_id):
 
 def gerar_resumo_mensal(chat_id):
     try:
-        registros = sheet.get_all_records()
         hoje = datetime.now(timezone_brasilia)
-        dias = {}
-        categorias = {}
-        for r in registros:
-            data_str = r.get("Data da Despesa", "").strip()
-            if not data_str:
-                continue
-            try:
-                data = datetime.strptime(data_str, "%d/%m/%Y")
-            except:
-                continue
-            if data.month == hoje.month and data.year == hoje.year:
-                dia = data.day
-                v = parse_valor(r.get("Valor", "0"))
-                dias[dia] = dias.get(dia, 0) + v
-                cat = r.get("Categoria", "OUTROS")
-                categorias[cat] = categorias.get(cat, 0) + v
+        inicio_mes = hoje.date().replace(day=1)
+        fim_mes = (inicio_mes + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        atualizar_ledger()
+        categorias, totais_dia, _ = ledger_local.agregar(inicio_mes, fim_mes)
+        dias = {d.day: v for d, v in totais_dia.items()}
         labels = [f"{dia}/{hoje.month}" for dia in sorted(dias)]
         valores = [dias[dia] for dia in sorted(dias)]
         total = sum(valores)
@@ -240,9 +208,8 @@ def gerar_resumo_mensal(chat_id):
             resumo += f"\nDia com maior gasto: {dia_maior}/{hoje.month} - {formatar_valor(dias[dia_maior])}"
         if categorias:
             resumo += "\n\n" + detalhar_categorias(categorias, total)
-            grafico_path = gerar_grafico('linha', f"Despesas diárias - {mes_ano}", valores, labels)
-            bot.send_message(chat_id=chat_id, text=resumo)
-            bot.send_photo(chat_id=chat_id, photo=open(grafico_path, 'rb'))
+            grafico = gerar_grafico('linha', f"Despesas diárias - {mes_ano}", valores, labels)
+            envio_resumos.enviar(chat_id, resumo, grafico)
         else:
             bot.send_message(chat_id=chat_id, text=resumo + "\n\nNão há despesas registradas este mês.")
     except Exception as e:
@@ -252,22 +219,16 @@ def gerar_resumo_mensal(chat_id):
 
 def gerar_resumo_categoria(chat_id):
     try:
-        registros = sheet.get_all_records()
-        categorias = {}
-        total = 0.0
-        for r in registros:
-            v = parse_valor(r.get("Valor", "0"))
-            cat = r.get("Categoria", "OUTROS")
-            categorias[cat] = categorias.get(cat, 0) + v
-            total += v
+        atualizar_ledger()
+        categorias, _, _ = ledger_local.agregar()
+        total = sum(categorias.values())
         resumo = "📂 Resumo por Categoria:\n\n"
         resumo += detalhar_categorias(categorias, total)
         resumo += f"\nTotal Geral: {formatar_valor(total)}"
         labels = list(categorias.keys())
         valores = list(categorias.values())
-        grafico_path = gerar_grafico('pizza', 'Despesas por Categoria', valores, labels)
-        bot.send_message(chat_id=chat_id, text=resumo)
-        bot.send_photo(chat_id=chat_id, photo=open(grafico_path, 'rb'))
+        grafico = gerar_grafico('pizza', 'Despesas por Categoria', valores, labels)
+        envio_resumos.enviar(chat_id, resumo, grafico)
     except Exception as e:
         logger.error(f"Erro no resumo por categoria: {e}")
         logger.error(traceback.format_exc())
@@ -275,38 +236,19 @@ def gerar_resumo_categoria(chat_id):
 
 def gerar_resumo(chat_id, responsavel, dias, titulo):
     try:
-        registros = sheet.get_all_records()
-        limite = datetime.now(timezone_brasilia) - timedelta(days=dias)
-        total = 0.0
-        categorias = {}
-        registros_cont = 0
-        for r in registros:
-            data_str = r.get("Data da Despesa", "").strip()
-            if not data_str:
-                continue
-            try:
-                try:
-                    data = datetime.strptime(data_str, "%d/%m/%Y")
-                except ValueError:
-                    data = datetime.strptime(data_str, "%Y-%m-%d")
-            except Exception as err:
-                logger.warning(f"Data inválida: {data_str} | Erro: {err}")
-                continue
-            resp = r.get("Responsável", "").upper()
-            if data >= limite and (responsavel.upper() == "TODOS" or resp == responsavel.upper()):
-                v = parse_valor(r.get("Valor", "0"))
-                total += v
-                cat = r.get("Categoria", "OUTROS")
-                categorias[cat] = categorias.get(cat, 0) + v
-                registros_cont += 1
+        # Últimos `dias` dias contando hoje (parcelas futuras também entram)
+        inicio = datetime.now(timezone_brasilia).date() - timedelta(days=dias - 1)
+        filtro = None if responsavel.upper() == "TODOS" else responsavel
+        atualizar_ledger()
+        categorias, _, registros_cont = ledger_local.totais(inicio, None, filtro)
+        total = sum(categorias.values())
         resumo = f"📋 {titulo} ({responsavel.title()}):\n\nTotal: {formatar_valor(total)}\nRegistros: {registros_cont}"
         if categorias:
             resumo += "\n\n" + detalhar_categorias(categorias, total)
             labels = list(categorias.keys())
             valores = list(categorias.values())
-            grafico_path = gerar_grafico('pizza', f'{titulo} - {responsavel.title()}', valores, labels)
-            bot.send_message(chat_id=chat_id, text=resumo)
-            bot.send_photo(chat_id=chat_id, photo=open(grafico_path, 'rb'))
+            grafico = gerar_grafico('pizza', f'{titulo} - {responsavel.title()}', valores, labels)
+            envio_resumos.enviar(chat_id, resumo, grafico)
         else:
             bot.send_message(chat_id=chat_id, text=resumo + "\n\nNão há despesas registradas nesse período/para esse responsável.")
     except Exception as e:
@@ -314,19 +256,349 @@ def gerar_resumo(chat_id, responsavel, dias, titulo):
         logger.error(traceback.format_exc())
         bot.send_message(chat_id=chat_id, text=f"❌ Erro ao gerar {titulo.lower()}.")
 
-# ========== ROTA TELEGRAM ==========
-@app.route(f"/{telegram_token}", methods=["POST"])
-def receber_telegram():
+def gerar_resumo_periodo(chat_id, inicio, fim, responsavel=None, categoria=None):
+    try:
+        periodo = f"{inicio.strftime('%d/%m/%Y')} a {fim.strftime('%d/%m/%Y')}"
+        filtros = " - ".join(f.title() for f in (responsavel, categoria) if f)
+        titulo = f"Resumo de {periodo}" + (f" ({filtros})" if filtros else "")
+        categorias, responsaveis, registros_cont = ledger_local.totais(inicio, fim, responsavel, categoria)
+        total = sum(categorias.values())
+        resumo = f"🗓️ {titulo}:\n\nTotal: {formatar_valor(total)}\nRegistros: {registros_cont}"
+        if not registros_cont:
+            bot.send_message(chat_id=chat_id, text=resumo + "\n\nNão há despesas registradas nesse período.")
+            return
+        if not categoria:
+            resumo += "\n\n" + detalhar_categorias(categorias, total)
+        if not responsavel and (categoria or len(responsaveis) > 1):
+            resumo += "\n👤 Por responsável:\n" + detalhar_categorias(responsaveis, total)
+        # Com categoria fixa o gráfico divide por responsável
+        partes = responsaveis if categoria else categorias
+        grafico = gerar_grafico('pizza', titulo, list(partes.values()), [p.title() if categoria else p for p in partes])
+        envio_resumos.enviar(chat_id, resumo, grafico)
+    except Exception as e:
+        logger.error(f"Erro no resumo por período: {e}")
+        logger.error(traceback.format_exc())
+        bot.send_message(chat_id=chat_id, text="❌ Erro no resumo por período.")
+
+def ler_data_curta(texto, ano):
+    # "01/03" (ano informado), "01/03/25" ou "01/03/2025" -> date
+    partes = [int(p) for p in texto.split("/")]
+    if len(partes) == 3:
+        ano = partes[2] + 2000 if partes[2] < 100 else partes[2]
+    try:
+        return datetime(ano, partes[1], partes[0]).date()
+    except ValueError:
+        raise ValueError(f"Data inválida: {texto}")
+
+def responsavel_conhecido(nome):
+    # Nomes vêm do próprio ledger: qualquer pessoa que já registrou uma despesa
+    alvo = normalizar(nome).strip()
+    for responsavel in ledger_local.responsaveis():
+        if normalizar(responsavel) == alvo:
+            return responsavel
+    return None
+
+def interpretar_periodo(texto):
+    # "resumo de 01/03 a 15/04 [responsável] [categoria]" -> (inicio, fim, responsável, categoria)
+    # Retorna None se o texto não for esse comando; levanta ValueError se algo não for reconhecido.
+    m = re.match(r"\s*resumo de (\d{1,2}/\d{1,2}(?:/\d{2,4})?) (?:a|até) (\d{1,2}/\d{1,2}(?:/\d{2,4})?)\s*(.*)$",
+                 texto, re.IGNORECASE)
+    if not m:
+        return None
+    ano = datetime.now(timezone_brasilia).year
+    inicio, fim = ler_data_curta(m.group(1), ano), ler_data_curta(m.group(2), ano)
+    if fim < inicio and m.group(1).count("/") == 1:
+        inicio = inicio.replace(year=inicio.year - 1)  # "de 01/12 a 15/01": dezembro do ano anterior
+    if fim < inicio:
+        raise ValueError("A data final é anterior à inicial.")
+    atualizar_ledger()
+    responsavel = categoria = None
+    for palavra in m.group(3).split():
+        if palavra.lower() in ("da", "do", "de", "e", "em"):
+            continue
+        nome = None if responsavel else responsavel_conhecido(palavra)
+        if nome:
+            responsavel = nome
+            continue
+        conhecida = None if categoria else classificador.categoria_conhecida(palavra)
+        if conhecida:
+            categoria = conhecida
+        else:
+            raise ValueError(
+                f"Não reconheci \"{palavra}\". Responsáveis: {', '.join(n.title() for n in ledger_local.responsaveis())}."
+                f" Categorias: {', '.join(classificador.categorias())}."
+            )
+    return inicio, fim, responsavel, categoria
+
+def interpretar_exportacao(texto):
+    # "exportar [de 01/03 a 15/04 | 03/2025 | mês] [com resumo]" -> (inicio, fim, com_resumo)
+    # inicio/fim None = ledger inteiro; levanta ValueError se o período não for reconhecido.
+    resto = re.sub(r"^\s*exportar\s*", "", texto, flags=re.IGNORECASE)
+    com_resumo = bool(re.search(r"\bcom resumo\b", resto, re.IGNORECASE))
+    resto = re.sub(r"\s*com resumo\b", "", resto, flags=re.IGNORECASE).strip().lower()
+    hoje = datetime.now(timezone_brasilia).date()
+    if resto in ("", "tudo"):
+        return None, None, com_resumo
+    m = re.fullmatch(r"(?:o |do )?(mês|mes)|(\d{1,2})/(\d{4})", resto)
+    if m:
+        try:
+            inicio = hoje.replace(day=1) if m.group(1) else datetime(int(m.group(3)), int(m.group(2)), 1).date()
+        except ValueError:
+            raise ValueError(f"Mês inválido: {resto}")
+        fim = (inicio + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        return inicio, fim, com_resumo
+    m = re.fullmatch(r"de (\d{1,2}/\d{1,2}(?:/\d{2,4})?) (?:a|até) (\d{1,2}/\d{1,2}(?:/\d{2,4})?)", resto)
+    if not m:
+        raise ValueError(f"Período não reconhecido: \"{resto}\"")
+    inicio, fim = ler_data_curta(m.group(1), hoje.year), ler_data_curta(m.group(2), hoje.year)
+    if fim < inicio and m.group(1).count("/") == 1:
+        inicio = inicio.replace(year=inicio.year - 1)
+    if fim < inicio:
+        raise ValueError("A data final é anterior à inicial.")
+    return inicio, fim, com_resumo
+
+def exportar_despesas(chat_id, inicio, fim, com_resumo):
+    try:
+        atualizar_ledger()
+        if inicio:
+            periodo = f"{inicio.strftime('%d/%m/%Y')} a {fim.strftime('%d/%m/%Y')}"
+            rotulo = f"{inicio.isoformat()}_{fim.isoformat()}"
+        else:
+            periodo, rotulo = "todas as despesas", "completo"
+        # Página a página do espelho local direto para o gzip em disco
+        with tempfile.TemporaryFile() as arquivo:
+            linhas = chain(linhas_do_periodo(ledger_local.paginas(EXPORTACAO_PAGINA), inicio, fim),
+                           com_colunas_tipadas(parcelamentos.linhas(inicio, fim)))
+            resumo = exportar_csv_gzip(linhas, arquivo)
+            quantidade = sum(q for q, _ in resumo.values())
+            if not quantidade:
+                bot.send_message(chat_id=chat_id, text=f"Não há despesas para exportar ({periodo}).")
+                return
+            total = sum(v for _, v in resumo.values())
+            arquivo.seek(0)
+            bot.send_document(chat_id=chat_id, document=arquivo, filename=f"despesas-{rotulo}.csv.gz",
+                              caption=f"📤 {quantidade} despesas ({periodo}) - {formatar_valor(total)}")
+        if com_resumo:
+            bot.send_document(chat_id=chat_id, document=io.BytesIO(resumo_csv(resumo)),
+                              filename=f"resumo-{rotulo}.csv", caption="📂 Resumo por categoria")
+    except Exception as e:
+        logger.error(f"Erro ao exportar despesas: {e}")
+        logger.error(traceback.format_exc())
+        bot.send_message(chat_id=chat_id, text="❌ Erro ao exportar as despesas.")
+
+# ========== ORÇAMENTO ==========
+def texto_alertas(alertas):
+    mes_atual = datetime.now(timezone_brasilia).strftime("%Y-%m")
+    texto = ""
+    for alerta in alertas:
+        ano, mes = alerta["mes"].split("-")
+        quando = "" if alerta["mes"] == mes_atual else f" em {mes}/{ano}"
+        uso = f"{formatar_valor(alerta['total'])} de {formatar_valor(alerta['limite'])}"
+        if alerta["limiar"] >= 1:
+            texto += f"\n🚨 Orçamento de {alerta['categoria']}{quando} estourado: {uso}"
+        else:
+            texto += f"\n⚠️ {alerta['categoria']}{quando} já usou {alerta['limiar']:.0%} do orçamento: {uso}"
+    return texto
+
+def enviar_situacao_orcamento(chat_id):
+    hoje = datetime.now(timezone_brasilia)
+    situacao = orcamento.situacao(hoje.strftime("%Y-%m"))
+    com_limite = {c: v for c, v in situacao.items() if v["limite"]}
+    if not com_limite:
+        bot.send_message(chat_id=chat_id, text="Nenhum orçamento definido.\nExemplo: orçamento alimentação = 1500")
+        return
+    texto = f"💼 Orçamento de {hoje.strftime('%m/%Y')}:\n"
+    for categoria, item in sorted(com_limite.items(), key=lambda x: x[1]["total"] / x[1]["limite"], reverse=True):
+        uso = item["total"] / item["limite"]
+        marcador = "🚨" if uso >= 1 else "⚠️" if uso >= 0.8 else "✅"
+        texto += f"\n{marcador} {categoria}: {formatar_valor(item['total'])} de {formatar_valor(item['limite'])} ({uso:.0%})"
+        for responsavel, valor in sorted(item["responsaveis"].items(), key=lambda x: x[1], reverse=True):
+            texto += f"\n    {responsavel.title()}: {formatar_valor(valor)}"
+    bot.send_message(chat_id=chat_id, text=texto)
+
+# ========== PARCELAMENTOS ==========
+def enviar_compromissos(chat_id):
+    # Parcelas ainda por vir de todos os parcelamentos ativos, por mês
+    try:
+        atualizar_ledger()
+        hoje = datetime.now(timezone_brasilia).date()
+        ativos = parcelamentos.ativos(hoje)
+        if not ativos:
+            bot.send_message(chat_id=chat_id, text="🗓️ Nenhum parcelamento em aberto.")
+            return
+        por_mes = {}
+        for data, _, _, centavos in parcelamentos.projetar(hoje + timedelta(days=1)):
+            mes = (data.year, data.month)
+            por_mes[mes] = por_mes.get(mes, 0) + centavos
+        total = sum(por_mes.values()) / 100
+        resumo = f"🗓️ Compromissos futuros:\n\nTotal a pagar: {formatar_valor(total)}\n\n📆 Por mês:\n"
+        for ano, mes in sorted(por_mes):
+            resumo += f"{mes:02d}/{ano}: {formatar_valor(por_mes[(ano, mes)] / 100)}\n"
+        resumo += "\n💳 Parcelamentos em aberto:\n"
+        for plano, restantes in sorted(ativos, key=lambda x: x[0].inicio):
+            resumo += (f"[{plano.id}] {plano.descricao} ({plano.responsavel.title()}): "
+                       f"{restantes} de {plano.parcelas} x {formatar_valor(plano.centavos / 100)}\n")
+        labels = [f"{mes:02d}/{str(ano)[2:]}" for ano, mes in sorted(por_mes)]
+        valores = [por_mes[m] / 100 for m in sorted(por_mes)]
+        grafico = gerar_grafico('barra', 'Parcelas a pagar por mês', valores, labels)
+        envio_resumos.enviar(chat_id, resumo, grafico)
+    except Exception as e:
+        logger.error(f"Erro no relatório de compromissos: {e}")
+        logger.error(traceback.format_exc())
+        bot.send_message(chat_id=chat_id, text="❌ Erro no relatório de compromissos futuros.")
+
+def cancelar_parcelamento(chat_id, busca):
+    try:
+        atualizar_ledger()
+        hoje = datetime.now(timezone_brasilia).date()
+        encontrados = parcelamentos.buscar(busca, hoje)
+        if len(encontrados) != 1:
+            ativos = [p for p, _ in parcelamentos.ativos(hoje)]
+            lista = "\n".join(f"[{p.id}] {p.descricao} ({p.responsavel.title()})" for p in (encontrados or ativos))
+            if not lista:
+                bot.send_message(chat_id=chat_id, text="Nenhum parcelamento em aberto.")
+            elif encontrados:
+                bot.send_message(chat_id=chat_id, text=f"Mais de um parcelamento encontrado. Envie cancelar parcelamento <id>:\n{lista}")
+            else:
+                bot.send_message(chat_id=chat_id, text=f"Parcelamento não encontrado. Em aberto:\n{lista}")
+            return
+        plano = encontrados[0]
+        restantes = len(plano.datas(hoje + timedelta(days=1)))
+        if parcelamentos.cancelar(plano, hoje) is None:
+            bot.send_message(chat_id=chat_id, text=f"Parcelamento {plano.id} não encontrado na planilha.")
+            return
+        reconciliar_orcamento()  # tira as parcelas canceladas dos totais do orçamento
+        bot.send_message(chat_id=chat_id, text=(
+            f"🗑️ Parcelamento {plano.id} cancelado: {plano.descricao} ({plano.responsavel.title()})\n"
+            f"{restantes} parcelas futuras removidas ({formatar_valor(restantes * plano.centavos / 100)})"
+        ))
+    except Exception as e:
+        logger.error(f"Erro ao cancelar parcelamento: {e}")
+        logger.error(traceback.format_exc())
+        bot.send_message(chat_id=chat_id, text="❌ Erro ao cancelar o parcelamento.")
+
+# ========== PROCESSAMENTO DAS MENSAGENS ==========
+# Cadastro da despesa (AGORA SUPORTA PARCELAMENTO)
+def registrar_despesa(chat_id, texto):
+    partes = [p.strip() for p in texto.split(",")]
+
+    # Permitir 3 ou 4 partes (parcelado na 4a parte: "3x", "2x", ...)
+    if len(partes) not in (3, 4):
+        bot.send_message(chat_id=chat_id, text="❌ Formato inválido. Envie: Responsável, Descrição, Valor [, Parcelas]\nExemplo: Larissa, supermercado, 37,90 ou Larissa, mercado, 30, 3x")
+        return
+    responsavel, descricao, valor = partes[0], partes[1], partes[2]
+    parcelas = 1
+    if len(partes) == 4:
+        m = re.match(r"(\d+)\s*x", partes[3].replace(" ", ""), re.IGNORECASE)
+        if m and int(m.group(1)) >= 1:
+            parcelas = int(m.group(1))
+        else:
+            bot.send_message(chat_id=chat_id, text="❌ Formato de parcelas inválido. Use, por exemplo, 3x para 3 parcelas.")
+            return
+
+    categoria = classificar_categoria(descricao)
+    valor_float = parse_valor(valor)
+    valor_parcela = round(valor_float / parcelas, 2) if parcelas > 1 else valor_float
+    valor_formatado = formatar_valor(valor_parcela)
+    hoje = datetime.now(timezone_brasilia)
+    try:
+        if parcelas > 1:
+            # Um plano na aba Parcelamentos; as parcelas são projetadas nos resumos
+            plano = parcelamentos.adicionar(hoje.date(), categoria, descricao.upper(), responsavel.upper(),
+                                            valor_parcela, parcelas)
+            linhas = plano.linhas()
+        else:
+            # Colunas: Data da Despesa, Categoria, Descrição, Responsável, Valor
+            linhas = [[hoje.strftime("%d/%m/%Y"), categoria, descricao.upper(), responsavel.upper(), valor_formatado]]
+            if journal_despesas:
+                journal_despesas.adicionar(linhas)
+            else:
+                gravar_na_planilha(linhas)
+        # Totais do mês somados na hora (parcelas futuras no mês delas)
+        alertas = orcamento.registrar(linhas)
+        resposta = (
+            f"✅ Despesa registrada!\n"
+            f"📅 Data inicial: {hoje.strftime('%d/%m/%Y')}\n"
+            f"📂 Categoria: {categoria}\n"
+            f"📝 Descrição: {descricao.upper()}\n"
+            f"👤 Responsável: {responsavel.upper()}\n"
+            f"💰 Valor total: {formatar_valor(valor_float)}"
+        )
+        if parcelas > 1:
+            resposta += f"\n🔢 Parcelas: {parcelas} x {formatar_valor(valor_parcela)} (até {linhas[-1][0][3:]})"
+            resposta += f"\n🆔 Parcelamento {plano.id} - para cancelar: cancelar parcelamento {plano.id}"
+        resposta += texto_alertas(alertas)
+
+        bot.send_message(chat_id=chat_id, text=resposta)
+    except Exception as e:
+        logger.error(f"Erro ao registrar despesa: {e}")
+        logger.error(traceback.format_exc())
+        bot.send_message(chat_id=chat_id, text="❌ Erro ao registrar a despesa na planilha!")
+
+# Importação de extrato: documento CSV/OFX com o responsável na legenda
+def importar_extrato(chat_id, mensagem):
+    documento = mensagem["document"]
+    nome = documento.get("file_name") or "extrato"
+    responsavel = re.sub(r"^\s*importar\s*", "", mensagem.get("caption") or "", flags=re.IGNORECASE).strip()
+    if not responsavel:
+        bot.send_message(chat_id=chat_id, text="❌ Envie o extrato (CSV ou OFX) com o nome do responsável na legenda.\nExemplo: Larissa")
+        return
+    if (documento.get("file_size") or 0) > IMPORTACAO_MAX_BYTES:
+        bot.send_message(chat_id=chat_id, text=f"❌ Arquivo grande demais (máximo {IMPORTACAO_MAX_BYTES // (1024 * 1024)} MB).")
+        return
+    aviso = bot.send_message(chat_id=chat_id, text=f"📥 Importando {nome}...")
+
+    def progresso(resumo):
+        try:
+            bot.edit_message_text(
+                text=f"📥 Importando {nome}...\n{resumo['lidos']} lançamentos lidos, {resumo['importados']} importados",
+                chat_id=chat_id, message_id=aviso.message_id,
+            )
+        except Exception as e:
+            logger.warning(f"Progresso da importação não atualizado: {e}")
+
+    try:
+        atualizar_ledger()  # despesas já gravadas na planilha entram na deduplicação
+        with tempfile.TemporaryFile() as arquivo:
+            bot.get_file(documento["file_id"]).download(out=arquivo)
+            arquivo.seek(0)
+            resumo = importador_extratos.importar(arquivo, nome, responsavel, progresso)
+    except ValueError as e:
+        bot.send_message(chat_id=chat_id, text=f"❌ {e}")
+        return
+    except Exception as e:
+        logger.error(f"Erro ao importar extrato: {e}")
+        logger.error(traceback.format_exc())
+        bot.send_message(chat_id=chat_id, text="❌ Erro ao importar o extrato.")
+        return
+    texto = (
+        f"{'⚠️ Importação interrompida' if resumo['erro'] else '✅ Extrato importado'} ({nome}):\n"
+        f"👤 Responsável: {responsavel.upper()}\n"
+        f"📄 Lançamentos lidos: {resumo['lidos']}\n"
+        f"💰 Importados: {resumo['importados']} ({formatar_valor(resumo['total'])})\n"
+        f"🔁 Já registrados: {resumo['duplicados']}\n"
+        f"↩️ Créditos ignorados: {resumo['creditos']}\n"
+        f"❔ Linhas inválidas: {resumo['invalidos']}\n"
+        f"⏱️ {resumo['segundos']:.1f} s"
+    )
+    if resumo["categorias"]:
+        texto += "\n\n" + detalhar_categorias(resumo["categorias"], resumo["total"])
+    if resumo["erro"]:
+        texto += "\nErro ao gravar na planilha. Envie o arquivo de novo para continuar: o que já foi gravado não se repete."
+    bot.send_message(chat_id=chat_id, text=texto)
+
+def processar_mensagem(mensagem):
     try:
-        data = request.json
-        logger.info("POST do Telegram recebido: " + str(data))
-        if "message" not in data:
-            return "ok"
-        mensagem = data["message"]
         chat_id = mensagem["chat"]["id"]
         texto = mensagem.get("text", "")
         texto_lower = texto.lower()
 
+        # Extrato bancário enviado como arquivo
+        if mensagem.get("document"):
+            with medir_comando("importacao"):
+                importar_extrato(chat_id, mensagem)
+            return
+
         # Comando de ajuda
         if "ajuda" in texto_lower:
             ajuda_msg = (
@@ -336,84 +608,217 @@ def receber_telegram():
                 "_Exemplo:_ Larissa, supermercado, 37,90 ou Larissa, mercado, 30, 3x\n\n"
                 "📊 *Ver resumos:*\n"
                 "- resumo geral\n- resumo hoje\n- resumo do mês\n- resumo da semana\n- resumo por categoria\n- resumo da Larissa\n- resumo do Thiago\n"
+                "- resumo de 01/03 a 15/04 [responsável] [categoria]\n\n"
+                "📥 *Importar extrato:* envie o arquivo CSV ou OFX do banco com o nome do responsável na legenda\n\n"
+                "🏷️ *Categoria errada?* Ensine o bot:\n"
+                "_Formato:_ aprender <palavra> = <CATEGORIA>\n"
+                "_Exemplo:_ aprender ifood = alimentação\n\n"
+                "💳 *Parcelamentos:* compromissos futuros; cancelar parcelamento <id ou descrição>\n\n"
+                "💼 *Orçamento:* orçamento alimentação = 1500 (alerta em 80% e 100%); orçamentos mostra o mês\n\n"
+                "📤 *Exportar:* exportar [mês | 03/2025 | de 01/03 a 15/04] [com resumo]\n\n"
+                "🔄 *Planilha editada à mão?* Envie: ressincronizar\n"
             )
             bot.send_message(chat_id=chat_id, text=ajuda_msg, parse_mode="Markdown")
-            return "ok"
+            return
+
+        # Recarrega o ledger local inteiro (após edições manuais na planilha)
+        if "ressincronizar" in texto_lower:
+            try:
+                linhas = ressincronizar_ledger()
+                bot.send_message(chat_id=chat_id, text=f"🔄 Planilha ressincronizada: {linhas} linhas carregadas.")
+            except Exception as e:
+                logger.error(f"Erro ao ressincronizar: {e}")
+                logger.error(traceback.format_exc())
+                bot.send_message(chat_id=chat_id, text="❌ Erro ao ressincronizar a planilha.")
+            return
+
+        # Correção de categoria: "aprender ifood = alimentação"
+        m = re.match(r"\s*aprender\s+(.+?)\s*=\s*(.+?)\s*$", texto, re.IGNORECASE)
+        if m:
+            palavra, categoria = m.group(1), classificador.categoria_conhecida(m.group(2))
+            if not categoria:
+                bot.send_message(chat_id=chat_id, text="❌ Categoria desconhecida. Use uma destas: " + ", ".join(classificador.categorias()))
+                return
+            classificador.aprender(palavra, categoria)
+            bot.send_message(chat_id=chat_id, text=f"🏷️ Entendido! Despesas com \"{palavra}\" agora vão para {categoria}.")
+            return
+
+        # Orçamento: "orçamento alimentação = 1500" define, "orçamentos" mostra o mês
+        m = re.match(r"\s*or[çc]amento\s+(.+?)\s*=?\s*(\d[\d.,]*)\s*$", texto, re.IGNORECASE)
+        if m:
+            categoria = classificador.categoria_conhecida(m.group(1))
+            if not categoria:
+                bot.send_message(chat_id=chat_id, text="❌ Categoria desconhecida. Use uma destas: " + ", ".join(classificador.categorias()))
+                return
+            valor = parse_valor(m.group(2))
+            orcamento.definir_limite(categoria, valor)
+            if valor > 0:
+                bot.send_message(chat_id=chat_id, text=f"💼 Orçamento de {categoria}: {formatar_valor(valor)} por mês.")
+            else:
+                bot.send_message(chat_id=chat_id, text=f"💼 Orçamento de {categoria} removido.")
+            return
+        if re.match(r"\s*or[çc]amentos?\s*$", texto_lower):
+            enviar_situacao_orcamento(chat_id)
+            return
+
+        # Parcelamentos: cancelamento e relatório de parcelas futuras
+        m = re.match(r"\s*cancelar parcelamento\s*(.*?)\s*$", texto, re.IGNORECASE)
+        if m:
+            with medir_comando("cancelar_parcelamento"):
+                cancelar_parcelamento(chat_id, m.group(1))
+            return
+        if re.match(r"\s*(parcelamentos|compromissos)( futuros)?\s*$", texto_lower):
+            with medir_comando("compromissos"):
+                enviar_compromissos(chat_id)
+            return
+
+        # Exportação do ledger em CSV compactado
+        if re.match(r"\s*exportar\b", texto_lower):
+            try:
+                periodo = interpretar_exportacao(texto)
+            except ValueError as e:
+                bot.send_message(chat_id=chat_id, text=f"❌ {e}\nExemplos: exportar, exportar mês, exportar 03/2025, exportar de 01/03 a 15/04 com resumo")
+                return
+            with medir_comando("exportar"):
+                exportar_despesas(chat_id, *periodo)
+            return
 
         # Comandos de resumo
+        # (cada comando tem seu histograma de latência em /metrics)
         if "resumo geral" in texto_lower:
-            gerar_resumo_geral(chat_id)
+            with medir_comando("resumo_geral"):
+                gerar_resumo_geral(chat_id)
         elif "resumo hoje" in texto_lower:
-            gerar_resumo_hoje(chat_id)
+            with medir_comando("resumo_hoje"):
+                gerar_resumo_hoje(chat_id)
         elif "resumo por categoria" in texto_lower:
-            gerar_resumo_categoria(chat_id)
+            with medir_comando("resumo_categoria"):
+                gerar_resumo_categoria(chat_id)
         elif "resumo do mês" in texto_lower:
-            gerar_resumo_mensal(chat_id)
+            with medir_comando("resumo_mes"):
+                gerar_resumo_mensal(chat_id)
         elif "resumo da semana" in texto_lower:
-            gerar_resumo(chat_id, "TODOS", 7, "Resumo da Semana")
-        elif "resumo da larissa" in texto_lower:
-            gerar_resumo(chat_id, "LARISSA", 30, "Resumo do Mês")
-        elif "resumo do thiago" in texto_lower:
-            gerar_resumo(chat_id, "THIAGO", 30, "Resumo do Mês")
-        # Cadastro da despesa (AGORA SUPORTA PARCELAMENTO)
-        elif "," in texto:
-            partes = [p.strip() for p in texto.split(",")]
-
-            # Permitir 3 ou 4 partes (parcelado na 4a parte: "3x", "2x", ...)
-            if len(partes) not in (3, 4):
-                bot.send_message(chat_id=chat_id, text="❌ Formato inválido. Envie: Responsável, Descrição, Valor [, Parcelas]\nExemplo: Larissa, supermercado, 37,90 ou Larissa, mercado, 30, 3x")
-                return "ok"
-            responsavel, descricao, valor = partes[0], partes[1], partes[2]
-            parcelas = 1
-            if len(partes) == 4:
-                m = re.match(r"(\d+)\s*x", partes[3].replace(" ", ""), re.IGNORECASE)
-                if m:
-                    parcelas = int(m.group(1))
-                else:
-                    bot.send_message(chat_id=chat_id, text="❌ Formato de parcelas inválido. Use, por exemplo, 3x para 3 parcelas.")
-                    return "ok"
-
-            categoria = classificar_categoria(descricao)
-            valor_float = parse_valor(valor)
-            valor_parcela = round(valor_float / parcelas, 2) if parcelas > 1 else valor_float
-            valor_formatado = formatar_valor(valor_parcela)
-            hoje = datetime.now(timezone_brasilia)
+            with medir_comando("resumo_semana"):
+                gerar_resumo(chat_id, "TODOS", 7, "Resumo da Semana")
+        elif re.match(r"\s*resumo de \d", texto_lower):
             try:
-                for i in range(parcelas):
-                    # Usando dateutil.relativedelta SE disponível, senão 30 dias
-                    if relativedelta:
-                        data_parcela = hoje + relativedelta(months=i)
-                    else:
-                        data_parcela = hoje + timedelta(days=30 * i)
-                    data_str = data_parcela.strftime("%d/%m/%Y")
-                    descricao_final = descricao.upper()
-                    if parcelas > 1:
-                        descricao_final = f"{descricao.upper()} [{i+1}/{parcelas}]"
-                    # Colunas: Data da Despesa, Categoria, Descrição, Responsável, Valor
-                    sheet.append_row([data_str, categoria, descricao_final, responsavel.upper(), valor_formatado])
-                resposta = (
-                    f"✅ Despesa registrada!\n"
-                    f"📅 Data inicial: {hoje.strftime('%d/%m/%Y')}\n"
-                    f"📂 Categoria: {categoria}\n"
-                    f"📝 Descrição: {descricao.upper()}\n"
-                    f"👤 Responsável: {responsavel.upper()}\n"
-                    f"💰 Valor total: {formatar_valor(valor_float)}"
-                )
-                if parcelas > 1:
-                    resposta += f"\n🔢 Parcelas: {parcelas} x {formatar_valor(valor_parcela)}"
-
-                bot.send_message(chat_id=chat_id, text=resposta)
-            except Exception as e:
-                logger.error(f"Erro ao registrar despesa: {e}")
-                logger.error(traceback.format_exc())
-                bot.send_message(chat_id=chat_id, text="❌ Erro ao registrar a despesa na planilha!")
+                periodo = interpretar_periodo(texto)
+            except ValueError as e:
+                bot.send_message(chat_id=chat_id, text=f"❌ {e}\nExemplo: resumo de 01/03 a 15/04 Larissa alimentação")
+                return
+            if not periodo:
+                bot.send_message(chat_id=chat_id, text="❌ Formato inválido. Exemplo: resumo de 01/03 a 15/04 [responsável] [categoria]")
+                return
+            with medir_comando("resumo_periodo"):
+                gerar_resumo_periodo(chat_id, *periodo)
+        elif re.match(r"\s*resumo d[ao] \S", texto_lower):
+            # "resumo da Larissa", "resumo do Thiago": responsáveis lidos do ledger
+            nome = re.match(r"\s*resumo d[ao] (.+?)\s*$", texto_lower).group(1)
+            atualizar_ledger()
+            responsavel = responsavel_conhecido(nome)
+            if not responsavel:
+                bot.send_message(chat_id=chat_id, text="Não encontrei despesas de \"" + nome.title() + "\". Envie 'ajuda' para ver os comandos disponíveis.")
+                return
+            with medir_comando("resumo_pessoa"):
+                gerar_resumo(chat_id, responsavel, 30, "Resumo do Mês")
+        # Cadastro da despesa
+        elif "," in texto:
+            with medir_comando("despesa"):
+                registrar_despesa(chat_id, texto)
         else:
             bot.send_message(chat_id=chat_id, text="Comando não reconhecido. Envie 'ajuda' para ver os comandos disponíveis.")
     except Exception as e:
         logger.error(f"Erro ao processar mensagem: {e}")
         logger.error(traceback.format_exc())
+
+def processar_update(item):
+    # item: (mensagem, perfilar); perfilar=True grava o perfil de amostragem em /perfil/<segredo>,
+    # rotulado pelo comando (medir_comando), nunca pelo texto da mensagem
+    mensagem, perfilar = item
+    if perfilar and amostrador:
+        with amostrador.perfilar():
+            processar_mensagem(mensagem)
+    else:
+        processar_mensagem(mensagem)
+
+# Updates processados em segundo plano: ordem garantida por chat, chats em paralelo
+fila_updates = FilaPorChat(processar_update)
+
+# update_ids já recebidos (memória + SQLite compartilhado entre os workers)
+deduplicador = DeduplicadorUpdates()
+
+# Gauges lidos na hora em /metrics
+registro_metricas.coletor("fila", fila_updates.estatisticas)
+registro_metricas.coletor("graficos_cache", servico_graficos.estatisticas)
+registro_metricas.coletor("classificador", classificador.estatisticas)
+registro_metricas.coletor("telegram_fotos", envio_resumos.estatisticas)
+registro_metricas.coletor("sheets_cota", governador_sheets.estatisticas)
+registro_metricas.coletor("dedup", deduplicador.estatisticas)
+registro_metricas.coletor("orcamento", orcamento.estatisticas)
+registro_metricas.coletor("ledger_snapshot", ledger_local.estatisticas_snapshot)
+if journal_despesas:
+    registro_metricas.coletor("journal", lambda: {"pendentes": journal_despesas.pendentes()})
+
+# ========== ROTA TELEGRAM ==========
+@app.route(f"/{telegram_token}", methods=["POST"])
+def receber_telegram():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return "invalid", 400
+    # Payload completo só em DEBUG: formatado apenas se o nível estiver ativo
+    logger.debug("POST do Telegram recebido: %s", data)
+    mensagem = data.get("message")
+    if not isinstance(mensagem, dict) or "id" not in mensagem.get("chat", {}):
+        updates_recebidos.inc("ignorado")
+        return "ok"
+    # Reenvio do Telegram (webhook lento): descartado antes de qualquer trabalho
+    update_id = data.get("update_id")
+    if isinstance(update_id, int) and not deduplicador.primeira_vez(update_id):
+        updates_recebidos.inc("repetido")
+        return "ok"
+    # Profiler por amostragem sob demanda: header X-Perfil ou ?perfil= com o PERFIL_SEGREDO
+    # (e PERFIL_AMOSTRAGEM_MS > 0)
+    perfilar = segredo_perfil(request.headers.get("X-Perfil") or request.args.get("perfil"))
+    if not fila_updates.enfileirar(mensagem["chat"]["id"], (mensagem, perfilar)):
+        # Fila cheia: o Telegram reenvia o update mais tarde
+        logger.warning(f"Fila cheia, update recusado (chat {mensagem['chat']['id']})")
+        if isinstance(update_id, int):
+            deduplicador.esquecer(update_id)
+        updates_recebidos.inc("recusado")
+        return "busy", 503
+    updates_recebidos.inc("aceito")
     return "ok"
 
+@app.route("/health", methods=["GET"])
+def health():
+    status = {
+        "pronto": estado_inicializacao["pronto"],
+        "inicializacao_segundos": estado_inicializacao["segundos"],
+        "erro": estado_inicializacao["erro"],
+        "tentativas_inicializacao": estado_inicializacao["tentativas"],
+        "planilha": planilha.estado(),
+        "bot": bot.estado(),
+        "fila": fila_updates.profundidade(),
+        "tarefas": executor_tarefas.estado(),
+    }
+    return jsonify(status), (200 if status["pronto"] else 503)
+
+@app.route("/fila", methods=["GET"])
+def status_fila():
+    return jsonify(fila_updates.estatisticas())
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return registro_metricas.exportar(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+@app.route("/perfil/<segredo>", methods=["GET"])
+def perfil(segredo):
+    # Pilhas amostradas dos updates perfilados, no formato "collapsed" (flamegraph).
+    # Protegida como a rota do webhook: sem o PERFIL_SEGREDO a rota não existe
+    if not segredo_perfil(segredo):
+        return "not found", 404
+    return amostrador.exportar(), 200, {"Content-Type": "text/plain; charset=utf-8"}
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
     app.run(host="0.0.0.0", port=port, debug=False)
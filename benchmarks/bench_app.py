@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Benchmarks das funções do app com planilha e bot falsos (benchmarks/suporte.py):
+# cada gerar_resumo_*, parse_valor, classificar_categoria, gerar_grafico e o
+# cadastro/cancelamento de parcelamentos.
+# Uso: python benchmarks/bench_app.py [--linhas 1000 10000 100000] [--comparar anterior.json]
+
+import os
+import sys
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import suporte
+from suporte import PlanilhaFalsa, BotFalso, Latencia, gerar_linhas, medir
+
+CHAT_ID = 1000
+
+
+def bench_resumos(app, planilha, tamanhos, repeticoes):
+    resumos = {
+        "resumo_geral": lambda: app.gerar_resumo_geral(CHAT_ID),
+        "resumo_hoje": lambda: app.gerar_resumo_hoje(CHAT_ID),
+        "resumo_mes": lambda: app.gerar_resumo_mensal(CHAT_ID),
+        "resumo_categoria": lambda: app.gerar_resumo_categoria(CHAT_ID),
+        "resumo_semana": lambda: app.gerar_resumo(CHAT_ID, "TODOS", 7, "Resumo da Semana"),
+        "resumo_pessoa": lambda: app.gerar_resumo(CHAT_ID, "LARISSA", 30, "Resumo do Mês"),
+    }
+    resultados = {}
+    for n in tamanhos:
+        planilha.sheet1.linhas[1:] = gerar_linhas(n)
+        carga = medir(lambda: app.ressincronizar_ledger(), repeticoes=1)
+        resultados[f"carga_ledger/{n}"] = carga
+        print(f"{n:>9} {'(carga do ledger)':<22} {carga['mediana_ms']:>10.1f}")
+        for nome, funcao in resumos.items():
+            # Com o cache de gráficos limpo: mede também a renderização
+            frio = medir(funcao, repeticoes, preparar=app.servico_graficos.cache.clear)
+            quente = medir(funcao, repeticoes)
+            resultados[f"{nome}/{n}"] = frio
+            resultados[f"{nome}_cache/{n}"] = quente
+            print(f"{n:>9} {nome:<22} {frio['mediana_ms']:>10.1f} {quente['mediana_ms']:>10.1f}")
+    return resultados
+
+
+def bench_funcoes(app, repeticoes, n=100_000):
+    aleatorio = random.Random(7)
+    valores = [aleatorio.choice(["R$1.234,56", "37,90", "30", "R$ 12,5", "abc", "1.000"]) for _ in range(n)]
+    descricoes = [linha[2] + f" loja {aleatorio.randint(1, 10 ** 6)}" for linha in gerar_linhas(n, semente=9)]
+    repetidas = [linha[2] for linha in gerar_linhas(n, semente=9)]
+
+    def parse_todos():
+        for v in valores:
+            app.parse_valor(v)
+
+    def classificar(lista):
+        def executar():
+            for d in lista:
+                app.classificar_categoria(d)
+        return executar
+
+    resultados = {}
+    for nome, funcao in (("parse_valor", parse_todos),
+                         ("classificar_categoria", classificar(descricoes)),
+                         ("classificar_categoria_repetidas", classificar(repetidas))):
+        r = medir(funcao, repeticoes)
+        r["ns_por_chamada"] = r["mediana_ms"] * 1e6 / n
+        resultados[nome] = r
+        print(f"{nome:<32} {r['ns_por_chamada']:>10.0f} ns/chamada")
+
+    categorias = list(suporte.PERFIL_CATEGORIAS)
+    graficos = {
+        "pizza": (categorias, [aleatorio.uniform(10, 1000) for _ in categorias]),
+        "barra": (categorias, [aleatorio.uniform(10, 1000) for _ in categorias]),
+        "linha": ([f"{d}/10" for d in range(1, 32)], [aleatorio.uniform(10, 300) for _ in range(31)]),
+    }
+    for tipo, (rotulos, dados) in graficos.items():
+        r = medir(lambda: app.gerar_grafico(tipo, f"Bench {tipo}", dados, rotulos), repeticoes,
+                  preparar=app.servico_graficos.cache.clear)
+        resultados[f"gerar_grafico/{tipo}"] = r
+        print(f"{'gerar_grafico/' + tipo:<32} {r['mediana_ms']:>10.1f} ms")
+    return resultados
+
+
+def bench_parcelamentos(app, planilha, bot, repeticoes):
+    # Compra parcelada e cancelamento pelo comando (aba Parcelamentos da planilha falsa)
+    planos = []
+
+    def cadastrar():
+        app.registrar_despesa(CHAT_ID, "Larissa, geladeira, 1200, 12x")
+        planos.append(app.parcelamentos.planos[-1])
+
+    resultados = {
+        "parcelamento_cadastro": medir(cadastrar, repeticoes),
+        "parcelamento_cancelamento": medir(lambda: app.cancelar_parcelamento(CHAT_ID, planos.pop(0).id), repeticoes,
+                                           preparar=cadastrar),
+    }
+    aba = planilha.abas[app.parcelamentos.aba().title]
+    cancelados = sum(1 for linha in aba.linhas[1:] if len(linha) > 7 and linha[7])
+    # Plano cuja linha some da planilha antes do cancelamento: responde sem exceção
+    cadastrar()
+    plano = planos.pop()
+    del aba.linhas[plano.linha - 1]
+    plano.linha = None  # como quando o append não devolve o intervalo gravado
+    bot.guardar = True
+    app.cancelar_parcelamento(CHAT_ID, plano.id)
+    bot.guardar = False
+    resposta = bot.enviados[-1][2]
+    resultados["parcelamento_cancelamento"]["cancelados"] = cancelados
+    for nome in ("parcelamento_cadastro", "parcelamento_cancelamento"):
+        print(f"{nome:<32} {resultados[nome]['mediana_ms']:>10.1f} ms")
+    print(f"{'planos cancelados na planilha':<32} {cancelados:>10}/{repeticoes}")
+    print(f"{'plano removido da planilha':<32} {resposta}")
+    return resultados
+
+
+def main():
+    parser = suporte.argumentos_comuns(argparse.ArgumentParser(description=__doc__))
+    parser.add_argument("--linhas", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--latencia-sheets", type=float, default=0.0, help="segundos por chamada ao Sheets")
+    parser.add_argument("--latencia-telegram", type=float, default=0.0, help="segundos por chamada ao Telegram")
+    args = parser.parse_args()
+
+    planilha = PlanilhaFalsa(latencia=Latencia(args.latencia_sheets))
+    bot = BotFalso(latencia=Latencia(args.latencia_telegram))
+    app = suporte.carregar_app(planilha, bot)
+
+    print(f"{'linhas':>9} {'resumo':<22} {'frio (ms)':>10} {'cache (ms)':>10}")
+    resultados = bench_resumos(app, planilha, args.linhas, args.repeticoes)
+    print()
+    resultados.update(bench_funcoes(app, args.repeticoes))
+    print()
+    resultados.update(bench_parcelamentos(app, planilha, bot, args.repeticoes))
+    parametros = vars(args).copy()
+    parametros.pop("saida"), parametros.pop("comparar")
+    return suporte.finalizar("app", parametros, resultados, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
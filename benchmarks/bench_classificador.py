@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Vazão da classificação em lote: laço original (any(p in desc) por categoria)
+# contra o autômato, com e sem o cache de descrições repetidas.
+# Uso: python benchmarks/bench_classificador.py [--descricoes 100000] [--extras 50]
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import suporte
+from classificador import ClassificadorCategorias
+
+PALAVRAS_BASE = {
+    "ALIMENTAÇÃO": ["mercado", "alimentação", "pão", "leite", "feira", "comida", "almoço", "refeição", "jantar"],
+    "TRANSPORTE": ["uber", "99", "ônibus", "metro", "trem", "corrida", "combustível", "gasolina"],
+    "LAZER": ["cinema", "netflix", "bar", "show", "festa", "lazer"],
+    "MORADIA": ["aluguel", "condominio", "energia", "água", "internet", "luz"],
+    "SAÚDE": ["farmácia", "higiene", "produto de limpeza", "remédio"],
+    "GATOS": ["gatos", "areia", "sachê", "ração"],
+    "ASSINATURA": ["abacus", "apple", "assinatura", "spotify", "celular"],
+}
+
+
+def gerar_palavras(extras):
+    random.seed(7)
+    palavras = {c: list(p) for c, p in PALAVRAS_BASE.items()}
+    for categoria in palavras:
+        for _ in range(extras):
+            palavras[categoria].append("".join(random.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(7)))
+    return palavras
+
+
+def classificar_em_laco(palavras_categoria, descricao):
+    desc = descricao.lower()
+    for categoria, palavras in palavras_categoria.items():
+        if any(p in desc for p in palavras):
+            return categoria
+    return "OUTROS"
+
+
+def main():
+    parser = suporte.argumentos_comuns(argparse.ArgumentParser(description=__doc__))
+    parser.add_argument("--descricoes", type=int, default=100_000)
+    parser.add_argument("--extras", type=int, default=50, help="palavras extras por categoria")
+    args = parser.parse_args()
+    n, extras = args.descricoes, args.extras
+
+    palavras = gerar_palavras(extras)
+    todas = [p for lista in palavras.values() for p in lista]
+    random.seed(3)
+    descricoes = [
+        f"{random.choice(['compra', 'pagamento', 'pix'])} {random.choice(todas)} loja {random.randint(1, 500)}"
+        for _ in range(n)
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        classificador = ClassificadorCategorias(palavras, os.path.join(tmp, "aprendidas.json"))
+
+        t0 = time.perf_counter()
+        esperado = [classificar_em_laco(palavras, d) for d in descricoes]
+        t_laco = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        obtido = [classificador._classificar.__wrapped__(d.lower()) for d in descricoes]
+        t_automato = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        for d in descricoes:
+            classificador.classificar(d)
+        t_cache_fria = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for d in descricoes:
+            classificador.classificar(d)
+        t_cache_quente = time.perf_counter() - t0
+
+    divergencias = sum(1 for a, b in zip(esperado, obtido) if a != b)
+    print(f"{n} descrições, {len(todas)} palavras-chave, {divergencias} divergências (acentos)")
+    resultados = {"divergencias": {"quantidade": divergencias}}
+    for chave, nome, t in (("laco", "laço original", t_laco), ("automato", "autômato", t_automato),
+                           ("cache_fria", "autômato + cache (frio)", t_cache_fria),
+                           ("cache_quente", "autômato + cache (quente)", t_cache_quente)):
+        resultados[chave] = {"total_ms": t * 1000, "descricoes_por_s": n / t}
+        print(f"{nome:<26} {n / t:>12,.0f} descrições/s")
+    parametros = vars(args).copy()
+    parametros.pop("saida"), parametros.pop("comparar")
+    return suporte.finalizar("classificador", parametros, resultados, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Compara a agregação em laço (por linha) com o ledger em colunas (numpy) e
+# com o índice de somas acumuladas por dia (consultas de período).
+# Uso: python benchmarks/bench_colunar.py [--linhas 10000 100000 1000000]
+
+import os
+import sys
+import time
+import argparse
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import suporte
+from suporte import gerar_registros
+from ledger import parse_valor, parse_data
+from colunar import LedgerColunar, IndicePrefixos
+
+
+def agregar_em_laco(registros, inicio, responsavel=None):
+    # Mesmo laço usado antes em gerar_resumo: parse por linha a cada consulta
+    limite = datetime.combine(inicio, datetime.min.time())
+    total, categorias = 0.0, {}
+    for r in registros:
+        data_str = r.get("Data da Despesa", "").strip()
+        try:
+            data = datetime.strptime(data_str, "%d/%m/%Y")
+        except ValueError:
+            continue
+        if data >= limite and (responsavel is None or r.get("Responsável", "").upper() == responsavel):
+            v = parse_valor(r.get("Valor", "0"))
+            total += v
+            cat = r.get("Categoria", "OUTROS")
+            categorias[cat] = categorias.get(cat, 0) + v
+    return categorias
+
+
+def cronometrar(funcao, repeticoes=3):
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        funcao()
+        melhor = min(melhor, time.perf_counter() - t0)
+    return melhor
+
+
+def main():
+    parser = suporte.argumentos_comuns(argparse.ArgumentParser(description=__doc__))
+    parser.add_argument("--linhas", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                        help="tamanhos do ledger sintético")
+    args = parser.parse_args()
+
+    hoje = date.today()
+    consultas = {
+        "semana": (hoje - timedelta(days=6), None),
+        "mes": (hoje.replace(day=1), None),
+        "pessoa (30 dias)": (hoje - timedelta(days=29), "LARISSA"),
+        "categoria (tudo)": (date.min, None),
+    }
+    resultados = {}
+    print(f"{'linhas':>9} {'consulta':<18} {'laço (ms)':>11} {'numpy (ms)':>11} {'ganho':>8} {'prefixos (ms)':>14}")
+    for n in args.linhas:
+        registros = gerar_registros(n, hoje)
+        t0 = time.perf_counter()
+        colunar = LedgerColunar.de_linhas(
+            (parse_data(r["Data da Despesa"]), r["Categoria"], r["Responsável"],
+             round(parse_valor(r["Valor"]) * 100), 1)
+            for r in registros
+        )
+        carga = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        indice = IndicePrefixos.de_colunar(colunar)
+        carga_indice = time.perf_counter() - t0
+        print(f"{n:>9} {'(carga única)':<18} {'':>11} {carga * 1000:>11.1f} {'':>8} {carga_indice * 1000:>14.1f}")
+        resultados[f"{n} carga"] = {"colunar_ms": carga * 1000, "prefixos_ms": carga_indice * 1000}
+        for nome, (inicio, responsavel) in consultas.items():
+            t_laco = cronometrar(lambda: agregar_em_laco(registros, inicio, responsavel), repeticoes=1)
+            t_numpy = cronometrar(lambda: colunar.agregar(inicio, None, responsavel))
+            t_indice = cronometrar(lambda: indice.consultar(inicio, None, responsavel))
+            print(f"{n:>9} {nome:<18} {t_laco * 1000:>11.1f} {t_numpy * 1000:>11.2f} {t_laco / t_numpy:>7.0f}x"
+                  f" {t_indice * 1000:>14.3f}")
+            resultados[f"{n} {nome}"] = {"laco_ms": t_laco * 1000, "numpy_ms": t_numpy * 1000,
+                                         "prefixos_ms": t_indice * 1000}
+    parametros = vars(args).copy()
+    parametros.pop("saida"), parametros.pop("comparar")
+    return suporte.finalizar("colunar", parametros, resultados, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Exportação do ledger (exportacao.exportar_csv_gzip sobre LedgerLocal.paginas):
+# tempo e pico de memória alocada (tracemalloc) por tamanho do ledger. O pico
+# deve ficar constante; só o tempo cresce com o número de linhas.
+# Uso: python benchmarks/bench_exportacao.py [--linhas 10000 100000]
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import suporte
+from suporte import gerar_linhas
+from ledger import LedgerLocal
+from exportacao import linhas_do_periodo, exportar_csv_gzip, EXPORTACAO_PAGINA
+
+
+def main():
+    parser = suporte.argumentos_comuns(argparse.ArgumentParser(description=__doc__))
+    parser.add_argument("--linhas", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    resultados = {}
+    print(f"{'linhas':>9} {'tempo (ms)':>11} {'pico (KiB)':>11} {'gzip (KiB)':>11}")
+    for n in args.linhas:
+        ledger = LedgerLocal(":memory:")
+        ledger.registrar("Sheet1", gerar_linhas(n), 2)
+        with tempfile.TemporaryFile() as arquivo:
+            tracemalloc.start()
+            inicio = time.perf_counter()
+            exportar_csv_gzip(linhas_do_periodo(ledger.paginas(EXPORTACAO_PAGINA)), arquivo)
+            segundos = time.perf_counter() - inicio
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            tamanho = arquivo.tell()
+        resultados[f"exportar/{n}"] = {"mediana_ms": segundos * 1000, "pico_kib": pico / 1024,
+                                       "gzip_kib": tamanho / 1024}
+        print(f"{n:>9} {segundos * 1000:>11.1f} {pico / 1024:>11.0f} {tamanho / 1024:>11.0f}")
+    parametros = vars(args).copy()
+    parametros.pop("saida"), parametros.pop("comparar")
+    return suporte.finalizar("exportacao", parametros, resultados, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
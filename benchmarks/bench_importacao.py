@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Importação de extrato CSV (importacao.ImportadorExtrato) com planilha falsa e a
+# cota real do Sheets (sheets.governador_sheets): lançamentos por minuto, appends
+# feitos e o custo de reenviar o mesmo extrato (tudo deduplicado, nenhum append).
+# Confere também os separadores decimais: o mesmo extrato em "1.234,50" (bancos
+# brasileiros) e em "1,234.50" (cabeçalho em inglês, com e sem aspas) soma igual.
+# Uso: python benchmarks/bench_importacao.py [--lancamentos 5000] [--latencia-sheets 0.2]
+
+import io
+import os
+import sys
+import time
+import argparse
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import suporte
+from suporte import PlanilhaFalsa, BotFalso, Latencia, gerar_linhas
+
+
+def gerar_extrato(n):
+    # Extrato de conta no formato dos bancos: ";" como separador, débitos negativos, cp1252
+    linhas = ["Data;Histórico;Valor"]
+    for i, (data, _, descricao, _, valor) in enumerate(gerar_linhas(n, semente=5)):
+        linhas.append(f"{data};{descricao} {i % 97};-{valor.replace('R$', '')}")
+    return "\r\n".join(linhas).encode("cp1252")
+
+
+# Mesmos lançamentos nos formatos aceitos: (nome, cabeçalho, linha(data, descrição, valor))
+FORMATOS = {
+    "pt_br": ("Data;Histórico;Valor", lambda d, h, v: f"{d};{h};-{v:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")),
+    "en_us": ("date,description,amount", lambda d, h, v: f'{d},{h},"-{v:,.2f}"'),
+    "en_us_sem_aspas": ("date,description,amount", lambda d, h, v: f"{d},{h},-{v:,.2f}"),
+}
+
+
+def verificar_formatos(n=200):
+    # Total importado de cada formato; todos devem bater com o total esperado
+    from importacao import ImportadorExtrato
+    lancamentos = [(data, descricao, float(valor.replace("R$", "").replace(".", "").replace(",", ".")) * 37)
+                   for data, _, descricao, _, valor in gerar_linhas(n, semente=7)]
+    totais = {"esperado": round(sum(v for _, _, v in lancamentos), 2)}
+    for nome, (cabecalho, linha) in FORMATOS.items():
+        extrato = "\r\n".join([cabecalho] + [linha(d, h, v) for d, h, v in lancamentos]).encode("utf-8")
+        importador = ImportadorExtrato(lambda linhas: None, lambda descricao: "OUTROS", lambda r: Counter())
+        totais[nome] = round(importador.importar(io.BytesIO(extrato), f"{nome}.csv", "Larissa")["total"], 2)
+    return totais
+
+
+def importar(app, extrato):
+    inicio = time.perf_counter()
+    resumo = app.importador_extratos.importar(io.BytesIO(extrato), "extrato.csv", "Larissa")
+    return time.perf_counter() - inicio, resumo
+
+
+def main():
+    parser = suporte.argumentos_comuns(argparse.ArgumentParser(description=__doc__))
+    parser.add_argument("--lancamentos", type=int, default=5000)
+    parser.add_argument("--linhas", type=int, default=10_000, help="tamanho inicial do ledger")
+    parser.add_argument("--latencia-sheets", type=float, default=0.2, help="segundos por chamada ao Sheets")
+    args = parser.parse_args()
+
+    planilha = PlanilhaFalsa(gerar_linhas(args.linhas), latencia=Latencia(args.latencia_sheets))
+    app = suporte.carregar_app(planilha, BotFalso())
+    extrato = gerar_extrato(args.lancamentos)
+
+    appends_antes = planilha.chamadas().get("append_rows", 0)
+    segundos, resumo = importar(app, extrato)
+    appends = planilha.chamadas().get("append_rows", 0) - appends_antes
+    segundos_reenvio, reenvio = importar(app, extrato)
+    formatos = verificar_formatos()
+    resultados = {
+        "importacao": {
+            "segundos": segundos,
+            "lancamentos_por_minuto": resumo["lidos"] * 60 / segundos,
+            "importados": resumo["importados"],
+            "appends": appends,
+        },
+        "reenvio": {
+            "segundos": segundos_reenvio,
+            "duplicados": reenvio["duplicados"],
+            "importados": reenvio["importados"],
+        },
+        "formatos": formatos,
+    }
+    r = resultados["importacao"]
+    print(f"importação: {r['importados']} lançamentos em {r['segundos']:.2f} s "
+          f"({r['lancamentos_por_minuto']:.0f}/min), {r['appends']} appends")
+    print(f"reenvio: {reenvio['duplicados']} duplicados, {reenvio['importados']} importados, "
+          f"{segundos_reenvio:.2f} s")
+    errados = [nome for nome in FORMATOS if formatos[nome] != formatos["esperado"]]
+    print(f"separador decimal: total esperado R${formatos['esperado']:.2f}, "
+          + ", ".join(f"{nome} R${formatos[nome]:.2f}" for nome in FORMATOS)
+          + (f"  <-- ERRADO: {', '.join(errados)}" if errados else ""))
+    parametros = vars(args).copy()
+    parametros.pop("saida"), parametros.pop("comparar")
+    codigo = suporte.finalizar("importacao", parametros, resultados, args)
+    return 1 if errados else codigo
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Mede o tempo de importação do app e a latência das primeiras requisições
+# em um processo novo (cold start). Sem credenciais reais a conexão com a
+# planilha falha em segundo plano, o que não afeta as medições. Cada processo
+# roda em um diretório temporário novo: nada é gravado no repositório.
+# Uso: python benchmarks/bench_inicializacao.py [--repeticoes 5]
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import suporte
+from suporte import percentil, RAIZ, TEMPORARIO
+
+MEDICAO = r"""
+import json, time
+t0 = time.perf_counter()
+import app
+t_import = time.perf_counter() - t0
+cliente = app.app.test_client()
+t0 = time.perf_counter()
+cliente.get("/health")
+t_health = time.perf_counter() - t0
+t0 = time.perf_counter()
+cliente.post("/" + app.telegram_token, json={"message": {"chat": {"id": 1}, "text": "oi"}})
+t_webhook = time.perf_counter() - t0
+import sys
+print(json.dumps({
+    "import_s": t_import,
+    "primeiro_health_s": t_health,
+    "primeiro_webhook_s": t_webhook,
+    "matplotlib_carregado": "matplotlib" in sys.modules,
+    "numpy_carregado": "numpy" in sys.modules,
+    "gspread_carregado": "gspread" in sys.modules,
+}))
+"""
+
+
+def medir():
+    # Variáveis de suporte.py: SQLite, travas e journal ficam no diretório temporário
+    env = dict(os.environ)
+    env.setdefault("GRAFICOS_PROCESSOS", "0")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [RAIZ, env.get("PYTHONPATH")]))
+    saida = subprocess.run(
+        [sys.executable, "-c", MEDICAO], cwd=tempfile.mkdtemp(dir=TEMPORARIO), env=env,
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def main():
+    parser = suporte.argumentos_comuns(argparse.ArgumentParser(description=__doc__))
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    medicoes = [medir() for _ in range(args.repeticoes)]
+    resultados = {}
+    for chave in ("import", "primeiro_health", "primeiro_webhook"):
+        valores = [m[f"{chave}_s"] * 1000 for m in medicoes]
+        resultados[chave] = {"mediana_ms": percentil(valores, 50), "min_ms": min(valores)}
+        print(f"{chave + '_s':<20} mediana {resultados[chave]['mediana_ms']:8.1f} ms   mín {min(valores):8.1f} ms")
+    ultima = medicoes[-1]
+    resultados["modulos"] = {}
+    for chave in ("matplotlib_carregado", "numpy_carregado", "gspread_carregado"):
+        resultados["modulos"][chave] = ultima[chave]
+        print(f"{chave:<20} {ultima[chave]}")
+    parametros = vars(args).copy()
+    parametros.pop("saida"), parametros.pop("comparar")
+    return suporte.finalizar("inicializacao", parametros, resultados, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Workers lendo o mesmo ledger em disco, com e sem o snapshot mapeado (snapshot.py):
+# tempo do primeiro resumo em um processo novo e memória privada (não compartilhada)
+# que cada worker passa a ocupar. Sem snapshot, cada processo monta a própria cópia
+# em numpy; com snapshot, só o primeiro grava o arquivo e os demais o mapeiam.
+# Uso: python benchmarks/bench_snapshot.py [--linhas 200000] [--workers 4] [--dias 3650]
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import suporte
+from suporte import gerar_linhas, percentil, RAIZ, TEMPORARIO
+from ledger import LedgerLocal
+
+WORKER = r"""
+import sys, json, time
+from datetime import date, timedelta
+from ledger import LedgerLocal
+
+def privada_kib():
+    # Páginas só deste processo (o mapeamento do snapshot conta como compartilhado)
+    with open("/proc/self/smaps_rollup") as f:
+        return sum(int(l.split()[1]) for l in f if l.startswith(("Private_Clean", "Private_Dirty")))
+
+ledger = LedgerLocal(sys.argv[1], snapshot=sys.argv[2])
+import numpy, colunar, snapshot  # fora da medição de memória
+antes = privada_kib()
+t0 = time.perf_counter()
+hoje = date.today()
+ledger.totais(hoje - timedelta(days=29), hoje)
+primeiro = time.perf_counter() - t0
+ledger.agregar(hoje.replace(day=1), hoje)
+print(json.dumps({"primeiro_resumo_s": primeiro, "privada_kib": privada_kib() - antes}))
+"""
+
+
+def worker(banco, caminho_snapshot):
+    saida = subprocess.run([sys.executable, "-c", WORKER, banco, caminho_snapshot], cwd=RAIZ,
+                           capture_output=True, text=True, check=True).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def main():
+    parser = suporte.argumentos_comuns(argparse.ArgumentParser(description=__doc__))
+    parser.add_argument("--linhas", type=int, default=200_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--dias", type=int, default=3650, help="período coberto pelo ledger sintético")
+    args = parser.parse_args()
+
+    banco = os.path.join(TEMPORARIO, "bench-snapshot.db")
+    caminho_snapshot = os.path.join(TEMPORARIO, "bench-snapshot.snap")
+    LedgerLocal(banco, snapshot="").registrar("Sheet1", gerar_linhas(args.linhas, dias=args.dias), 2)
+
+    resultados = {}
+    print(f"{'modo':<10} {'1º worker (ms)':>15} {'demais (ms)':>12} {'privada/worker (KiB)':>21}")
+    for modo, caminho in (("processo", ""), ("snapshot", caminho_snapshot)):
+        medicoes = [worker(banco, caminho) for _ in range(args.workers)]
+        demais = [m["primeiro_resumo_s"] * 1000 for m in medicoes[1:]] or [medicoes[0]["primeiro_resumo_s"] * 1000]
+        privada = percentil([m["privada_kib"] for m in medicoes[1:] or medicoes], 50)
+        resultados[modo] = {
+            "primeiro_worker_ms": medicoes[0]["primeiro_resumo_s"] * 1000,
+            "demais_workers_mediana_ms": percentil(demais, 50),
+            "privada_kib": privada,
+        }
+        r = resultados[modo]
+        print(f"{modo:<10} {r['primeiro_worker_ms']:>15.1f} {r['demais_workers_mediana_ms']:>12.1f} {privada:>21}")
+    resultados["snapshot"]["arquivo_kib"] = os.path.getsize(caminho_snapshot) / 1024
+    print(f"snapshot: {resultados['snapshot']['arquivo_kib']:.0f} KiB em disco, mapeado por todos os workers")
+    parametros = vars(args).copy()
+    parametros.pop("saida"), parametros.pop("comparar")
+    return suporte.finalizar("snapshot", parametros, resultados, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Replay de updates do Telegram contra o webhook (receber_telegram) com planilha
+# e bot falsos: latência de resposta do webhook (p50/p99), updates recusados
+# pela fila e vazão de ponta a ponta até a fila esvaziar.
+# Uso: python benchmarks/bench_webhook.py [--updates 2000] [--chats 20] [--clientes 8]
+
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import suporte
+from suporte import PlanilhaFalsa, BotFalso, Latencia, gerar_linhas, percentil
+
+RESUMOS = ["resumo geral", "resumo hoje", "resumo do mês", "resumo da semana",
+           "resumo por categoria", "resumo da Larissa", "resumo do Thiago"]
+
+
+def gerar_updates(n, chats, fracao_resumos, semente=11):
+    # Mistura de cadastros de despesa e pedidos de resumo, como chegam do Telegram
+    aleatorio = random.Random(semente)
+    despesas = gerar_linhas(n, semente=semente)
+    updates = []
+    for i, linha in enumerate(despesas):
+        chat_id = aleatorio.randint(1, chats)
+        if aleatorio.random() < fracao_resumos:
+            texto = aleatorio.choice(RESUMOS)
+        else:
+            # Valor com ponto decimal: "37,90" quebraria a mensagem em mais partes
+            valor = linha[4].replace("R$", "").replace(".", "").replace(",", ".")
+            texto = f"{linha[3].title()}, {linha[2].lower()}, {valor}"
+        updates.append({"update_id": i + 1, "message": {
+            "message_id": i + 1, "chat": {"id": chat_id, "type": "private"}, "text": texto}})
+    return updates
+
+
+def replay(app, updates, clientes):
+    caminho = "/" + app.telegram_token
+    latencias, status = [], {}
+
+    def enviar(lote):
+        cliente = app.app.test_client()
+        medidas = []
+        for update in lote:
+            inicio = time.perf_counter()
+            resposta = cliente.post(caminho, json=update)
+            medidas.append((time.perf_counter() - inicio, resposta.status_code))
+        return medidas
+
+    lotes = [updates[i::clientes] for i in range(clientes)]
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clientes) as executor:
+        for medidas in executor.map(enviar, lotes):
+            for segundos, codigo in medidas:
+                latencias.append(segundos)
+                status[codigo] = status.get(codigo, 0) + 1
+    t_envio = time.perf_counter() - inicio
+    app.fila_updates.aguardar()
+    t_total = time.perf_counter() - inicio
+    return latencias, status, t_envio, t_total
+
+
+def main():
+    parser = suporte.argumentos_comuns(argparse.ArgumentParser(description=__doc__))
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--clientes", type=int, default=8, help="threads enviando POSTs em paralelo")
+    parser.add_argument("--resumos", type=float, default=0.05, help="fração de updates que pedem resumo")
+    parser.add_argument("--linhas", type=int, default=10_000, help="tamanho inicial do ledger")
+    parser.add_argument("--latencia-sheets", type=float, default=0.05)
+    parser.add_argument("--latencia-telegram", type=float, default=0.03)
+    args = parser.parse_args()
+
+    planilha = PlanilhaFalsa(gerar_linhas(args.linhas), latencia=Latencia(args.latencia_sheets))
+    bot = BotFalso(latencia=Latencia(args.latencia_telegram))
+    app = suporte.carregar_app(planilha, bot)
+
+    updates = gerar_updates(args.updates, args.chats, args.resumos)
+    logging.getLogger().setLevel(logging.ERROR)  # sem um aviso por 503 durante o replay
+    latencias, status, t_envio, t_total = replay(app, updates, args.clientes)
+    aceitos = status.get(200, 0)
+    resultados = {
+        "webhook": {
+            "p50_ms": percentil(latencias, 50) * 1000,
+            "p90_ms": percentil(latencias, 90) * 1000,
+            "p99_ms": percentil(latencias, 99) * 1000,
+            "max_ms": max(latencias) * 1000,
+            "requisicoes_por_s": len(latencias) / t_envio,
+        },
+        "ponta_a_ponta": {
+            "segundos": t_total,
+            "updates_por_s": aceitos / t_total if t_total else None,
+            "aceitos": aceitos,
+            "recusados": status.get(503, 0),
+        },
+        "chamadas": {"sheets": planilha.chamadas(), "telegram": dict(bot.contagem)},
+    }
+    w, p = resultados["webhook"], resultados["ponta_a_ponta"]
+    print(f"webhook: p50 {w['p50_ms']:.2f} ms  p90 {w['p90_ms']:.2f} ms  p99 {w['p99_ms']:.2f} ms  "
+          f"máx {w['max_ms']:.1f} ms  {w['requisicoes_por_s']:.0f} req/s")
+    print(f"ponta a ponta: {p['aceitos']} aceitos, {p['recusados']} recusados (503), "
+          f"{p['segundos']:.2f} s, {p['updates_por_s']:.1f} updates/s")
+    print(f"chamadas: {resultados['chamadas']}")
+    parametros = vars(args).copy()
+    parametros.pop("saida"), parametros.pop("comparar")
+    return suporte.finalizar("webhook", parametros, resultados, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,360 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Peças compartilhadas pelos benchmarks, sem planilha nem Telegram reais:
+#   - gerar_linhas(): ledger sintético no formato da planilha
+#   - PlanilhaFalsa / AbaFalsa / BotFalso: substitutos em memória do gspread e
+#     do telegram.Bot, com latência injetada por chamada
+#   - carregar_app(): importa o app já apontando para os substitutos
+#   - medir() / percentil(): cronometragem
+#   - salvar_resultados() / comparar(): JSON em benchmarks/resultados/ para
+#     comparar execuções e achar regressões
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import logging
+import platform
+import tempfile
+import threading
+from datetime import date, datetime, timedelta
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, RAIZ)
+
+# Estado local do app (SQLite, travas, palavras aprendidas, static/) em um
+# diretório temporário. Definido antes de importar qualquer módulo do app,
+# que lê a configuração na importação.
+TEMPORARIO = tempfile.mkdtemp(prefix="bench-financeiro-")
+for _chave, _valor in {
+    "TELEGRAM_TOKEN": "bench",
+    "GOOGLE_CREDS_JSON": "{}",
+    "LEDGER_DB": ":memory:",
+    "LEDGER_SNAPSHOT": os.path.join(TEMPORARIO, "ledger.snap"),
+    "TAREFAS_LOCK": os.path.join(TEMPORARIO, "tarefas.lock"),
+    "TAREFAS_ESTADO": os.path.join(TEMPORARIO, "tarefas.json"),
+    "CATEGORIAS_APRENDIDAS": os.path.join(TEMPORARIO, "categorias_aprendidas.json"),
+    "JOURNAL_PATH": os.path.join(TEMPORARIO, "despesas.journal"),
+    "DEDUP_DB": os.path.join(TEMPORARIO, "updates.db"),
+    "ORCAMENTO_DB": os.path.join(TEMPORARIO, "orcamento.db"),
+    "SHEETS_COTA_DB": os.path.join(TEMPORARIO, "sheets_cota.db"),
+}.items():
+    os.environ.setdefault(_chave, _valor)
+
+from ledger import COLUNAS, formatar_valor, letra_coluna
+
+DIR_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultados")
+
+CATEGORIAS = ["ALIMENTAÇÃO", "TRANSPORTE", "LAZER", "MORADIA", "SAÚDE", "GATOS", "ASSINATURA", "OUTROS"]
+RESPONSAVEIS = ["LARISSA", "THIAGO"]
+# Peso de cada categoria e faixa de valor (R$) típica
+PERFIL_CATEGORIAS = {
+    "ALIMENTAÇÃO": (30, 8, 400), "TRANSPORTE": (20, 6, 120), "LAZER": (12, 15, 300),
+    "MORADIA": (6, 80, 2500), "SAÚDE": (8, 10, 350), "GATOS": (6, 20, 250),
+    "ASSINATURA": (8, 10, 60), "OUTROS": (10, 5, 500),
+}
+DESCRICOES = {
+    "ALIMENTAÇÃO": ["MERCADO", "PADARIA PÃO", "FEIRA", "ALMOÇO", "JANTAR"],
+    "TRANSPORTE": ["UBER", "99", "GASOLINA", "ÔNIBUS"],
+    "LAZER": ["CINEMA", "BAR", "SHOW", "NETFLIX"],
+    "MORADIA": ["ALUGUEL", "CONDOMINIO", "ENERGIA", "INTERNET"],
+    "SAÚDE": ["FARMÁCIA", "REMÉDIO", "HIGIENE"],
+    "GATOS": ["RAÇÃO", "AREIA", "SACHÊ"],
+    "ASSINATURA": ["SPOTIFY", "APPLE", "CELULAR"],
+    "OUTROS": ["PRESENTE", "ROUPA", "ELETRÔNICO"],
+}
+
+
+# ========== LEDGER SINTÉTICO ==========
+def gerar_linhas(n, hoje=None, dias=3 * 365, semente=42):
+    # Linhas na ordem de ledger.COLUNAS, com os mesmos formatos gravados pelo bot
+    # (dd/mm/AAAA, "R$1.234,56"); datas concentradas nos meses recentes.
+    aleatorio = random.Random(semente)
+    hoje = hoje or date.today()
+    categorias = list(PERFIL_CATEGORIAS)
+    pesos = [PERFIL_CATEGORIAS[c][0] for c in categorias]
+    linhas = []
+    for _ in range(n):
+        categoria = aleatorio.choices(categorias, pesos)[0]
+        _, minimo, maximo = PERFIL_CATEGORIAS[categoria]
+        data = hoje - timedelta(days=min(int(aleatorio.expovariate(3.0 / dias)), dias))
+        valor = round(aleatorio.uniform(minimo, maximo), 2)
+        linhas.append([
+            data.strftime("%d/%m/%Y"),
+            categoria,
+            aleatorio.choice(DESCRICOES[categoria]),
+            aleatorio.choice(RESPONSAVEIS),
+            formatar_valor(valor),
+        ])
+    return linhas
+
+
+def gerar_registros(n, hoje=None, semente=42):
+    # Mesmo formato de sheet.get_all_records()
+    return [dict(zip(COLUNAS, linha)) for linha in gerar_linhas(n, hoje, semente=semente)]
+
+
+# ========== SUBSTITUTOS DO GSPREAD E DO TELEGRAM ==========
+class Latencia:
+    # Atraso por chamada: `base` segundos + até `variacao` segundos aleatórios
+    def __init__(self, base=0.0, variacao=0.0):
+        self.base = base
+        self.variacao = variacao
+
+    def esperar(self):
+        atraso = self.base + (random.random() * self.variacao if self.variacao else 0.0)
+        if atraso > 0:
+            time.sleep(atraso)
+
+
+def indice_coluna(letras):
+    # "A" -> 0, "AA" -> 26
+    indice = 0
+    for letra in letras:
+        indice = indice * 26 + ord(letra) - 64
+    return indice - 1
+
+
+class AbaFalsa:
+    # Subconjunto de gspread.Worksheet usado pelo app
+    def __init__(self, titulo, linhas=None, latencia=None):
+        self.title = titulo
+        self.linhas = [list(COLUNAS)] + [list(l) for l in (linhas or [])]
+        self.latencia = latencia or Latencia()
+        self.chamadas = {}
+        self.lock = threading.Lock()
+
+    def _registrar(self, metodo):
+        with self.lock:
+            self.chamadas[metodo] = self.chamadas.get(metodo, 0) + 1
+        self.latencia.esperar()
+
+    def row_values(self, linha):
+        self._registrar("row_values")
+        return list(self.linhas[linha - 1]) if linha <= len(self.linhas) else []
+
+    def get_values(self, intervalo=None, **kwargs):
+        self._registrar("get_values")
+        inicio = 1
+        m = re.match(r"(?:.*!)?[A-Z]+(\d+)", intervalo or "")
+        if m:
+            inicio = int(m.group(1))
+        with self.lock:
+            return [list(l) for l in self.linhas[inicio - 1:]]
+
+    def get_all_records(self, **kwargs):
+        self._registrar("get_all_records")
+        with self.lock:
+            return [dict(zip(self.linhas[0], l)) for l in self.linhas[1:]]
+
+    def update_cell(self, linha, coluna, valor):
+        self._registrar("update_cell")
+        with self.lock:
+            while len(self.linhas) < linha:
+                self.linhas.append([])
+            celulas = self.linhas[linha - 1]
+            celulas.extend([""] * (coluna - len(celulas)))
+            celulas[coluna - 1] = str(valor)
+        return {"updatedRange": f"'{self.title}'!{letra_coluna(coluna)}{linha}"}
+
+    def append_row(self, linha, **kwargs):
+        return self.append_rows([linha], **kwargs)
+
+    def append_rows(self, linhas, **kwargs):
+        self._registrar("append_rows")
+        with self.lock:
+            primeira = len(self.linhas) + 1
+            self.linhas.extend([str(v) for v in l] for l in linhas)
+            ultima = len(self.linhas)
+        return {"updates": {"updatedRange": f"'{self.title}'!A{primeira}:E{ultima}"}}
+
+
+class PlanilhaFalsa:
+    # Subconjunto de gspread.Spreadsheet: sheet1 + abas por título
+    def __init__(self, linhas=None, latencia=None):
+        self.latencia = latencia or Latencia()
+        self.sheet1 = AbaFalsa("Sheet1", linhas, self.latencia)
+        self.abas = {"Sheet1": self.sheet1}
+
+    def worksheets(self):
+        self.latencia.esperar()
+        return list(self.abas.values())
+
+    def worksheet(self, titulo):
+        self.latencia.esperar()
+        return self.abas[titulo]
+
+    def add_worksheet(self, title, rows=100, cols=26, **kwargs):
+        self.latencia.esperar()
+        aba = AbaFalsa(title, latencia=self.latencia)
+        aba.linhas = []
+        self.abas[title] = aba
+        return aba
+
+    def values_batch_get(self, intervalos, **kwargs):
+        self.latencia.esperar()
+        faixas = []
+        for intervalo in intervalos:
+            titulo, celulas = intervalo.rsplit("!", 1)
+            m = re.match(r"([A-Z]+)(\d+)(?::([A-Z]+))?", celulas)
+            primeira = indice_coluna(m.group(1))
+            ultima = indice_coluna(m.group(3)) if m.group(3) else None
+            aba = self.abas[titulo.strip("'")]
+            with aba.lock:
+                valores = [l[primeira:None if ultima is None else ultima + 1] for l in aba.linhas[int(m.group(2)) - 1:]]
+            faixas.append({"range": intervalo, "values": valores})
+        return {"valueRanges": faixas}
+
+    def chamadas(self):
+        total = {}
+        for aba in self.abas.values():
+            for metodo, n in aba.chamadas.items():
+                total[metodo] = total.get(metodo, 0) + n
+        return total
+
+
+class MensagemFalsa:
+    _proximo_id = 0
+
+    def __init__(self, chat_id, foto=False):
+        MensagemFalsa._proximo_id += 1
+        self.message_id = MensagemFalsa._proximo_id
+        self.chat_id = chat_id
+        self.photo = [type("PhotoSize", (), {"file_id": f"foto-{self.message_id}"})()] if foto else []
+
+
+class BotFalso:
+    # Subconjunto de telegram.Bot: registra os envios em vez de mandá-los
+    def __init__(self, latencia=None, guardar=False):
+        self.latencia = latencia or Latencia()
+        self.guardar = guardar
+        self.enviados = []
+        self.contagem = {}
+        self.lock = threading.Lock()
+
+    def _registrar(self, metodo, chat_id, conteudo):
+        self.latencia.esperar()
+        with self.lock:
+            self.contagem[metodo] = self.contagem.get(metodo, 0) + 1
+            if self.guardar:
+                self.enviados.append((metodo, chat_id, conteudo))
+
+    def send_message(self, chat_id, text, **kwargs):
+        self._registrar("send_message", chat_id, text)
+        return MensagemFalsa(chat_id)
+
+    def send_photo(self, chat_id, photo, **kwargs):
+        self._registrar("send_photo", chat_id, kwargs.get("caption"))
+        return MensagemFalsa(chat_id, foto=True)
+
+    def send_document(self, chat_id, document, **kwargs):
+        self._registrar("send_document", chat_id, getattr(document, "name", None))
+        return MensagemFalsa(chat_id)
+
+    def edit_message_text(self, text=None, chat_id=None, **kwargs):
+        self._registrar("edit_message_text", chat_id, text)
+        return MensagemFalsa(chat_id)
+
+
+def carregar_app(planilha, bot):
+    # Importa o app com os substitutos no lugar da planilha e do bot e espera
+    # a inicialização em segundo plano terminar
+    diretorio = os.getcwd()
+    os.chdir(TEMPORARIO)  # static/ do app fica fora do repositório
+    try:
+        import servicos
+        servicos.planilha.definir(planilha)
+        servicos.bot.definir(bot)
+        import app
+    finally:
+        os.chdir(diretorio)
+    while not app.estado_inicializacao["pronto"] and not app.estado_inicializacao["erro"]:
+        time.sleep(0.01)
+    if app.estado_inicializacao["erro"]:
+        raise RuntimeError(app.estado_inicializacao["erro"])
+    logging.getLogger().setLevel(logging.WARNING)
+    return app
+
+
+# ========== CRONOMETRAGEM ==========
+def percentil(valores, p):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100.0 * (len(ordenados) - 1))))]
+
+
+def medir(funcao, repeticoes=5, preparar=None):
+    # Executa `funcao` `repeticoes` vezes; `preparar` roda antes de cada uma, fora do tempo
+    tempos = []
+    for _ in range(repeticoes):
+        if preparar:
+            preparar()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return {
+        "repeticoes": repeticoes,
+        "mediana_ms": percentil(tempos, 50) * 1000,
+        "min_ms": min(tempos) * 1000,
+        "max_ms": max(tempos) * 1000,
+    }
+
+
+# ========== RESULTADOS ==========
+def salvar_resultados(nome, parametros, resultados, caminho=None):
+    documento = {
+        "benchmark": nome,
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "maquina": platform.platform(),
+        "parametros": parametros,
+        "resultados": resultados,
+    }
+    if caminho is None:
+        os.makedirs(DIR_RESULTADOS, exist_ok=True)
+        caminho = os.path.join(DIR_RESULTADOS, f"{nome}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(documento, f, ensure_ascii=False, indent=1)
+    return caminho
+
+
+def comparar(resultados, caminho_anterior, tolerancia=0.10):
+    # Compara os tempos (mediana e percentis; menor é melhor) com um JSON anterior, imprime
+    # a variação e devolve as medições que pioraram mais que `tolerancia`
+    with open(caminho_anterior, encoding="utf-8") as f:
+        anteriores = json.load(f)["resultados"]
+    regressoes = []
+    print(f"\n{'medição':<44} {'antes':>10} {'agora':>10} {'variação':>9}")
+    for nome, atual in resultados.items():
+        for metrica, agora in atual.items():
+            antes = anteriores.get(nome, {}).get(metrica)
+            if not metrica.endswith("_ms") or metrica[:4] in ("min_", "max_") or not antes or agora is None:
+                continue
+            variacao = (agora - antes) / antes
+            marca = "  <-- regressão" if variacao > tolerancia else ""
+            print(f"{nome + ' ' + metrica:<44} {antes:>10.2f} {agora:>10.2f} {variacao:>+8.1%}{marca}")
+            if variacao > tolerancia:
+                regressoes.append(f"{nome} {metrica}")
+    return regressoes
+
+
+def argumentos_comuns(parser):
+    parser.add_argument("--saida", help="arquivo JSON dos resultados (padrão: benchmarks/resultados/)")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.10, help="piora aceitável na comparação (0.10 = 10%%)")
+    return parser
+
+
+def finalizar(nome, parametros, resultados, args):
+    # Salva o JSON, compara com a execução anterior (se pedida) e devolve o código de saída
+    caminho = salvar_resultados(nome, parametros, resultados, args.saida)
+    print(f"\nResultados salvos em {caminho}")
+    if args.comparar:
+        regressoes = comparar(resultados, args.comparar, tolerancia=args.tolerancia)
+        if regressoes:
+            print(f"\n{len(regressoes)} regressão(ões) acima de {args.tolerancia:.0%}")
+            return 1
+    return 0
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Envio da mesma rodada de mensagens para vários chats (lembretes, resumos),
+# em paralelo e dentro dos limites do Telegram:
+#   - ~30 mensagens/s no total por bot
+#   - 1 mensagem/s por chat privado, 20 mensagens/min por grupo
+# RetryAfter pausa todos os envios pelo tempo pedido; falhas de rede são
+# repetidas com backoff exponencial.
+
+import os
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from limitador import BaldeTokens
+
+logger = logging.getLogger()
+
+BROADCAST_THREADS = int(os.environ.get("BROADCAST_THREADS", 8))
+BROADCAST_TAXA_GLOBAL = float(os.environ.get("BROADCAST_TAXA_GLOBAL", 30))
+BROADCAST_TENTATIVAS = int(os.environ.get("BROADCAST_TENTATIVAS", 4))
+TAXA_CHAT_PRIVADO = 1.0
+TAXA_GRUPO = 20 / 60
+
+
+class Transmissor:
+    def __init__(self, bot, threads=BROADCAST_THREADS, taxa_global=BROADCAST_TAXA_GLOBAL,
+                 tentativas=BROADCAST_TENTATIVAS):
+        self.bot = bot
+        self.threads = threads
+        self.tentativas = tentativas
+        self.balde_global = BaldeTokens(taxa_global)
+        self.baldes_chat = {}
+        self.lock = threading.Lock()
+
+    def _balde_do_chat(self, chat_id):
+        with self.lock:
+            if chat_id not in self.baldes_chat:
+                # chat_id negativo = grupo/supergrupo
+                taxa = TAXA_GRUPO if int(chat_id) < 0 else TAXA_CHAT_PRIVADO
+                self.baldes_chat[chat_id] = BaldeTokens(taxa, capacidade=1)
+            return self.baldes_chat[chat_id]
+
+    def _enviar(self, envio):
+        from telegram.error import RetryAfter, BadRequest, Unauthorized, ChatMigrated, NetworkError
+        nome, chat_id = envio.get("nome"), envio["chat_id"]
+        resultado = {"nome": nome, "chat_id": chat_id, "ok": False, "tentativas": 0, "erro": None}
+        inicio = time.monotonic()
+        for tentativa in range(1, self.tentativas + 1):
+            resultado["tentativas"] = tentativa
+            self._balde_do_chat(chat_id).consumir()
+            self.balde_global.consumir()
+            try:
+                self.bot.send_message(chat_id=chat_id, text=envio["texto"], **envio.get("opcoes", {}))
+                resultado["ok"] = True
+                resultado["erro"] = None
+                break
+            except RetryAfter as e:
+                # Flood control: o Telegram diz quanto esperar; vale para todos os envios
+                resultado["erro"] = f"RetryAfter {e.retry_after}s"
+                self.balde_global.pausar(e.retry_after)
+            except (BadRequest, Unauthorized, ChatMigrated) as e:
+                # Chat inexistente, bot bloqueado...: não adianta repetir
+                resultado["erro"] = str(e)
+                break
+            except NetworkError as e:
+                # Inclui TimedOut
+                resultado["erro"] = str(e)
+                time.sleep(min(2 ** tentativa, 30) + random.random())
+            except Exception as e:
+                resultado["erro"] = str(e)
+                break
+        resultado["segundos"] = round(time.monotonic() - inicio, 3)
+        return resultado
+
+    def transmitir(self, envios):
+        # envios: [{"nome", "chat_id", "texto", "opcoes"?}] -> um resultado por destinatário
+        if not envios:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.threads, len(envios))) as executor:
+            resultados = list(executor.map(self._enviar, envios))
+        for r in resultados:
+            if r["ok"]:
+                logger.info(f"Mensagem enviada para {r['nome'] or r['chat_id']} ({r['tentativas']} tentativa(s))")
+            else:
+                logger.error(f"Falha ao enviar para {r['nome'] or r['chat_id']}: {r['erro']}")
+        return resultados
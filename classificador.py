@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Classificação de despesas por palavra-chave com um autômato Aho-Corasick:
+# uma única passada pela descrição encontra todas as palavras, sem acento e
+# sem diferenciar maiúsculas. Prioridade determinística:
+#   1. palavras aprendidas com correções dos usuários (mais longas primeiro)
+#   2. categorias na ordem de palavras_categoria (a primeira vence, como antes)
+
+import os
+import json
+import time
+import fcntl
+import logging
+import threading
+import unicodedata
+from functools import lru_cache
+
+logger = logging.getLogger()
+
+CATEGORIAS_APRENDIDAS = os.environ.get("CATEGORIAS_APRENDIDAS", "categorias_aprendidas.json")
+CLASSIFICADOR_CACHE = int(os.environ.get("CLASSIFICADOR_CACHE", 4096))
+# Intervalo mínimo (segundos) entre verificações do arquivo de palavras aprendidas
+CLASSIFICADOR_RECARGA = float(os.environ.get("CLASSIFICADOR_RECARGA", 5))
+CATEGORIA_PADRAO = "OUTROS"
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize("NFKD", str(texto).lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+class Automato:
+    def __init__(self, padroes):
+        # padroes: [(palavra normalizada, prioridade, categoria)]; menor prioridade vence
+        self.transicoes = [{}]
+        self.melhor = [None]
+        for palavra, prioridade, categoria in padroes:
+            if not palavra:
+                continue
+            no = 0
+            for c in palavra:
+                if c not in self.transicoes[no]:
+                    self.transicoes.append({})
+                    self.melhor.append(None)
+                    self.transicoes[no][c] = len(self.transicoes) - 1
+                no = self.transicoes[no][c]
+            if self.melhor[no] is None or prioridade < self.melhor[no][0]:
+                self.melhor[no] = (prioridade, categoria)
+        # Links de falha em largura; cada nó herda a melhor saída do seu link
+        self.falha = [0] * len(self.transicoes)
+        fila = list(self.transicoes[0].values())
+        for no in fila:
+            for c, filho in self.transicoes[no].items():
+                f = self.falha[no]
+                while f and c not in self.transicoes[f]:
+                    f = self.falha[f]
+                destino = self.transicoes[f].get(c, 0)
+                self.falha[filho] = destino if destino != filho else 0
+                herdada = self.melhor[self.falha[filho]]
+                if herdada and (self.melhor[filho] is None or herdada[0] < self.melhor[filho][0]):
+                    self.melhor[filho] = herdada
+                fila.append(filho)
+        prioridades = [m[0] for m in self.melhor if m]
+        self.prioridade_minima = min(prioridades) if prioridades else None
+
+    def buscar(self, texto):
+        # Retorna a categoria de maior prioridade presente no texto (ou None)
+        transicoes, falha, melhor = self.transicoes, self.falha, self.melhor
+        no, achado = 0, None
+        for c in texto:
+            while no and c not in transicoes[no]:
+                no = falha[no]
+            no = transicoes[no].get(c, 0)
+            m = melhor[no]
+            if m and (achado is None or m[0] < achado[0]):
+                achado = m
+                if m[0] == self.prioridade_minima:
+                    break
+        return achado[1] if achado else None
+
+
+class ClassificadorCategorias:
+    def __init__(self, palavras_categoria, caminho_aprendidas=CATEGORIAS_APRENDIDAS):
+        self.palavras_categoria = palavras_categoria
+        self.caminho = caminho_aprendidas
+        self.lock = threading.Lock()
+        self._mtime = None
+        self._verificado = 0.0
+        self.aprendidas = {}
+        self._classificar = None
+        self._recarregar()
+
+    def _ler_aprendidas(self):
+        try:
+            with open(self.caminho, encoding="utf-8") as f:
+                return {normalizar(k): v for k, v in json.load(f).items()}
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            logger.error(f"Arquivo de categorias aprendidas inválido: {e}")
+            return self.aprendidas
+
+    def _recarregar(self):
+        aprendidas = self._ler_aprendidas()
+        padroes = [
+            (palavra, i, categoria)
+            for i, (palavra, categoria) in enumerate(sorted(aprendidas.items(), key=lambda x: (-len(x[0]), x[0])))
+        ]
+        base = len(padroes)
+        for j, (categoria, palavras) in enumerate(self.palavras_categoria.items()):
+            padroes.extend((normalizar(p), base + j, categoria) for p in palavras)
+        automato = Automato(padroes)
+
+        @lru_cache(maxsize=CLASSIFICADOR_CACHE)
+        def classificar(desc_normalizada):
+            return automato.buscar(desc_normalizada) or CATEGORIA_PADRAO
+
+        # Troca atômica: leituras concorrentes veem o autômato antigo ou o novo
+        self.aprendidas = aprendidas
+        self._classificar = classificar
+        self._mtime = self._mtime_arquivo()
+
+    def _mtime_arquivo(self):
+        try:
+            return os.stat(self.caminho).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _verificar_recarga(self):
+        # Hot reload: outro processo (ou uma edição manual) pode ter mudado o arquivo
+        agora = time.monotonic()
+        if agora - self._verificado < CLASSIFICADOR_RECARGA:
+            return
+        self._verificado = agora
+        if self._mtime_arquivo() != self._mtime:
+            with self.lock:
+                self._recarregar()
+            logger.info("Categorias aprendidas recarregadas")
+
+    def classificar(self, descricao):
+        self._verificar_recarga()
+        return self._classificar(normalizar(descricao))
+
+    def categorias(self):
+        return list(self.palavras_categoria) + [CATEGORIA_PADRAO]
+
+    def categoria_conhecida(self, nome):
+        # "alimentacao" -> "ALIMENTAÇÃO"
+        alvo = normalizar(nome).strip()
+        for categoria in self.categorias():
+            if normalizar(categoria) == alvo:
+                return categoria
+        return None
+
+    def aprender(self, palavra, categoria):
+        # Trava de arquivo: dois workers aprendendo juntos não perdem a palavra um do outro;
+        # o temporário leva o pid para nunca publicar o arquivo pela metade de outro processo
+        with self.lock, open(f"{self.caminho}.lock", "a") as trava:
+            fcntl.flock(trava, fcntl.LOCK_EX)
+            aprendidas = dict(self._ler_aprendidas())
+            aprendidas[normalizar(palavra).strip()] = categoria
+            temporario = f"{self.caminho}.{os.getpid()}.tmp"
+            with open(temporario, "w", encoding="utf-8") as f:
+                json.dump(aprendidas, f, ensure_ascii=False, indent=1, sort_keys=True)
+            os.replace(temporario, self.caminho)
+            self._recarregar()
+
+    def estatisticas(self):
+        info = self._classificar.cache_info()
+        return {"aprendidas": len(self.aprendidas), "cache_acertos": info.hits,
+                "cache_faltas": info.misses, "cache_itens": info.currsize}
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from datetime import date
+import numpy as np
+
+# Ledger em colunas para agregação vetorizada:
+#   dias        -> ordinal da data (int32, 0 = data inválida)
+#   centavos    -> valor em centavos (int64)
+#   categorias  -> código da categoria (int32, índice em self.categorias)
+#   responsaveis-> código do responsável (int32, índice em self.responsaveis)
+#   qtd         -> quantidade de registros representados pela linha (int64)
+
+
+class LedgerColunar:
+    def __init__(self, dias, centavos, cod_categoria, cod_responsavel, qtd, categorias, responsaveis):
+        self.dias = dias
+        self.centavos = centavos
+        self.cod_categoria = cod_categoria
+        self.cod_responsavel = cod_responsavel
+        self.qtd = qtd
+        self.categorias = categorias
+        self.responsaveis = responsaveis
+
+    @classmethod
+    def de_linhas(cls, linhas):
+        # linhas: iterável de (data | None, categoria, responsável, centavos, qtd)
+        categorias, responsaveis = {}, {}
+        dias, centavos, cod_cat, cod_resp, qtd = [], [], [], [], []
+        for data, categoria, responsavel, valor, n in linhas:
+            dias.append(data.toordinal() if data else 0)
+            centavos.append(valor)
+            cod_cat.append(categorias.setdefault(categoria, len(categorias)))
+            cod_resp.append(responsaveis.setdefault(responsavel, len(responsaveis)))
+            qtd.append(n)
+        return cls(
+            np.array(dias, dtype=np.int32),
+            np.array(centavos, dtype=np.int64),
+            np.array(cod_cat, dtype=np.int32),
+            np.array(cod_resp, dtype=np.int32),
+            np.array(qtd, dtype=np.int64),
+            list(categorias),
+            list(responsaveis),
+        )
+
+    def __len__(self):
+        return len(self.dias)
+
+    def mascara(self, inicio=None, fim=None, responsavel=None):
+        mascara = np.ones(len(self.dias), dtype=bool)
+        if inicio is not None or fim is not None:
+            mascara &= self.dias > 0
+        if inicio is not None:
+            mascara &= self.dias >= inicio.toordinal()
+        if fim is not None:
+            mascara &= self.dias <= fim.toordinal()
+        if responsavel:
+            try:
+                codigo = self.responsaveis.index(responsavel.upper())
+            except ValueError:
+                return np.zeros(len(self.dias), dtype=bool)
+            mascara &= self.cod_responsavel == codigo
+        return mascara
+
+    def agregar(self, inicio=None, fim=None, responsavel=None):
+        # Mesmo retorno de LedgerLocal.agregar: (por categoria, por dia, quantidade)
+        mascara = self.mascara(inicio, fim, responsavel)
+        centavos = self.centavos[mascara]
+        qtd = self.qtd[mascara]
+
+        cod_cat = self.cod_categoria[mascara]
+        soma_cat = np.bincount(cod_cat, weights=centavos, minlength=len(self.categorias))
+        presentes_cat = np.bincount(cod_cat, minlength=len(self.categorias)) > 0
+        categorias = {
+            self.categorias[i]: round(soma_cat[i]) / 100 for i in np.flatnonzero(presentes_cat)
+        }
+
+        dias = {}
+        validos = self.dias[mascara] > 0
+        if validos.any():
+            ordinais = self.dias[mascara][validos]
+            base = int(ordinais.min())
+            soma_dia = np.bincount(ordinais - base, weights=centavos[validos])
+            presentes_dia = np.bincount(ordinais - base) > 0
+            dias = {
+                date.fromordinal(base + int(i)): round(soma_dia[i]) / 100 for i in np.flatnonzero(presentes_dia)
+            }
+        return categorias, dias, int(qtd.sum())
+
+
+class IndicePrefixos:
+    # Somas acumuladas por dia para consultas de período em O(log n + C*R):
+    #   dias      -> ordinais distintos com despesas, em ordem (int32)
+    #   somas[i]  -> centavos de cada combinação (categoria, responsável) em dias[:i]
+    #   qtds[i]   -> idem, quantidade de registros
+    # Um período [inicio, fim] vira duas buscas binárias e uma subtração de linhas.
+    # Linhas sem data válida ficam de fora (como em LedgerColunar.agregar com período).
+
+    def __init__(self, dias, somas, qtds, categorias, responsaveis):
+        self.dias = dias
+        self.somas = somas
+        self.qtds = qtds
+        self.categorias = categorias
+        self.responsaveis = responsaveis
+
+    @classmethod
+    def de_colunar(cls, colunar):
+        validos = colunar.dias > 0
+        dias, posicao = np.unique(colunar.dias[validos], return_inverse=True)
+        n_resp = len(colunar.responsaveis)
+        combinacao = colunar.cod_categoria[validos] * n_resp + colunar.cod_responsavel[validos]
+        largura = len(colunar.categorias) * n_resp
+        somas = np.zeros((len(dias) + 1, largura), dtype=np.int64)
+        qtds = np.zeros((len(dias) + 1, largura), dtype=np.int64)
+        np.add.at(somas, (posicao + 1, combinacao), colunar.centavos[validos])
+        np.add.at(qtds, (posicao + 1, combinacao), colunar.qtd[validos])
+        np.cumsum(somas, axis=0, out=somas)
+        np.cumsum(qtds, axis=0, out=qtds)
+        return cls(dias.astype(np.int32), somas, qtds, list(colunar.categorias), list(colunar.responsaveis))
+
+    def _faixa(self, inicio, fim):
+        i0 = 0 if inicio is None else int(np.searchsorted(self.dias, inicio.toordinal(), side="left"))
+        i1 = len(self.dias) if fim is None else int(np.searchsorted(self.dias, fim.toordinal(), side="right"))
+        return i0, max(i0, i1)
+
+    def consultar(self, inicio=None, fim=None, responsavel=None, categoria=None):
+        # Retorna (totais por categoria, totais por responsável, quantidade de registros)
+        i0, i1 = self._faixa(inicio, fim)
+        forma = (len(self.categorias), len(self.responsaveis))
+        somas = (self.somas[i1] - self.somas[i0]).reshape(forma)
+        qtds = (self.qtds[i1] - self.qtds[i0]).reshape(forma)
+        if responsavel:
+            if responsavel.upper() not in self.responsaveis:
+                return {}, {}, 0
+            coluna = self.responsaveis.index(responsavel.upper())
+            somas, qtds = somas[:, [coluna]], qtds[:, [coluna]]
+            responsaveis = [self.responsaveis[coluna]]
+        else:
+            responsaveis = self.responsaveis
+        if categoria:
+            if categoria not in self.categorias:
+                return {}, {}, 0
+            linha = self.categorias.index(categoria)
+            somas, qtds = somas[[linha], :], qtds[[linha], :]
+            categorias = [categoria]
+        else:
+            categorias = self.categorias
+        por_categoria = {
+            categorias[i]: int(somas[i].sum()) / 100 for i in np.flatnonzero(qtds.sum(axis=1))
+        }
+        por_responsavel = {
+            responsaveis[j]: int(somas[:, j].sum()) / 100 for j in np.flatnonzero(qtds.sum(axis=0))
+        }
+        return por_categoria, por_responsavel, int(qtds.sum())
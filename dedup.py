@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Descarte de updates repetidos do Telegram pelo update_id.
+# O Telegram reenvia um update quando o webhook demora a responder; sem isso o
+# reenvio grava a mesma despesa de novo. Dois níveis:
+#   1. LRU em memória com os update_ids recentes do processo (O(1))
+#   2. tabela SQLite compartilhada pelos workers do gunicorn: INSERT OR IGNORE
+#      na chave primária decide, de forma atômica, quem viu o update primeiro
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger()
+
+DEDUP_DB = os.environ.get("DEDUP_DB", "updates.db")
+# Quantos update_ids recentes são lembrados (memória e disco)
+DEDUP_CAPACIDADE = int(os.environ.get("DEDUP_CAPACIDADE", 10000))
+# A tabela em disco é podada a cada tantos updates novos gravados pelo processo
+DEDUP_LIMPEZA = int(os.environ.get("DEDUP_LIMPEZA", 1000))
+
+
+class DeduplicadorUpdates:
+    def __init__(self, caminho=DEDUP_DB, capacidade=DEDUP_CAPACIDADE, limpeza=DEDUP_LIMPEZA):
+        self.capacidade = capacidade
+        self.limpeza = limpeza
+        self.insercoes = 0
+        self.recentes = OrderedDict()
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(caminho, check_same_thread=False, timeout=10)
+        self.novos = 0
+        self.repetidos_memoria = 0
+        self.repetidos_disco = 0
+        with self.lock, self.conn:
+            if caminho != ":memory:":
+                self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS updates (update_id INTEGER PRIMARY KEY, recebido REAL)")
+
+    def _lembrar(self, update_id):
+        self.recentes[update_id] = True
+        self.recentes.move_to_end(update_id)
+        while len(self.recentes) > self.capacidade:
+            self.recentes.popitem(last=False)
+
+    def primeira_vez(self, update_id):
+        # True se o update ainda não foi visto por nenhum worker (e o marca como visto)
+        with self.lock:
+            if update_id in self.recentes:
+                self.recentes.move_to_end(update_id)
+                self.repetidos_memoria += 1
+                return False
+            try:
+                with self.conn:
+                    cursor = self.conn.execute(
+                        "INSERT OR IGNORE INTO updates (update_id, recebido) VALUES (?, ?)", (update_id, time.time())
+                    )
+                    novo = cursor.rowcount == 1
+                    self.insercoes += novo
+                    if novo and self.insercoes % self.limpeza == 0:
+                        # Fica só com os `capacidade` maiores update_ids (crescentes por bot). Conta
+                        # inserções, não o valor do id: os ids do bot têm buracos.
+                        self.conn.execute(
+                            "DELETE FROM updates WHERE update_id < ("
+                            " SELECT update_id FROM updates ORDER BY update_id DESC LIMIT 1 OFFSET ?)",
+                            (self.capacidade - 1,),
+                        )
+            except sqlite3.Error as e:
+                # Sem o disco vale só a memória: melhor processar do que perder o update
+                logger.error(f"Erro no registro de update_ids: {e}")
+                novo = True
+            self._lembrar(update_id)
+            if novo:
+                self.novos += 1
+            else:
+                self.repetidos_disco += 1
+            return novo
+
+    def esquecer(self, update_id):
+        # Update recusado (fila cheia): o reenvio do Telegram deve ser aceito
+        with self.lock:
+            self.recentes.pop(update_id, None)
+            try:
+                with self.conn:
+                    self.conn.execute("DELETE FROM updates WHERE update_id = ?", (update_id,))
+            except sqlite3.Error as e:
+                logger.error(f"Erro no registro de update_ids: {e}")
+
+    def estatisticas(self):
+        with self.lock:
+            return {
+                "novos": self.novos,
+                "repetidos_memoria": self.repetidos_memoria,
+                "repetidos_disco": self.repetidos_disco,
+                "em_memoria": len(self.recentes),
+            }
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Envio dos resumos (texto + gráfico) pelo Telegram.
+#   - Cada gráfico é enviado uma única vez: o file_id que o Telegram devolve
+#     fica guardado pelo hash do conteúdo e os reenvios do mesmo gráfico usam
+#     o id, sem novo upload.
+#   - Texto de até 1024 caracteres vai como legenda da foto: uma requisição
+#     em vez de duas.
+
+import io
+import os
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger()
+
+# Quantos file_ids de gráficos ficam guardados
+TELEGRAM_FILE_IDS = int(os.environ.get("TELEGRAM_FILE_IDS", 256))
+LIMITE_LEGENDA = 1024
+
+
+class EnvioResumos:
+    def __init__(self, bot, tamanho_cache=TELEGRAM_FILE_IDS):
+        self.bot = bot
+        self.tamanho_cache = tamanho_cache
+        self.file_ids = OrderedDict()
+        self.lock = threading.Lock()
+        self.reaproveitados = 0
+        self.uploads = 0
+        self.com_legenda = 0
+
+    def _file_id(self, chave):
+        with self.lock:
+            file_id = self.file_ids.get(chave)
+            if file_id:
+                self.file_ids.move_to_end(chave)
+            return file_id
+
+    def _guardar(self, chave, mensagem):
+        fotos = getattr(mensagem, "photo", None)
+        if not chave or not fotos:
+            return
+        with self.lock:
+            self.file_ids[chave] = fotos[-1].file_id  # maior resolução
+            while len(self.file_ids) > self.tamanho_cache:
+                self.file_ids.popitem(last=False)
+
+    def _enviar_foto(self, chat_id, png, chave, legenda=None):
+        from telegram.error import BadRequest
+        opcoes = {"caption": legenda} if legenda else {}
+        file_id = self._file_id(chave)
+        if file_id:
+            try:
+                mensagem = self.bot.send_photo(chat_id=chat_id, photo=file_id, **opcoes)
+                with self.lock:
+                    self.reaproveitados += 1
+                return mensagem
+            except BadRequest as e:
+                # file_id expirado/inválido: esquece e faz o upload de novo
+                logger.warning(f"file_id do gráfico recusado ({e}), reenviando o arquivo")
+                with self.lock:
+                    self.file_ids.pop(chave, None)
+        with io.BytesIO(png) as arquivo:
+            arquivo.name = "grafico.png"
+            mensagem = self.bot.send_photo(chat_id=chat_id, photo=arquivo, **opcoes)
+        with self.lock:
+            self.uploads += 1
+        self._guardar(chave, mensagem)
+        return mensagem
+
+    def enviar(self, chat_id, texto, grafico):
+        # grafico: (PNG em bytes, hash do conteúdo), como devolvido por ServicoGraficos.gerar
+        png, chave = grafico
+        if len(texto) <= LIMITE_LEGENDA:
+            with self.lock:
+                self.com_legenda += 1
+            return self._enviar_foto(chat_id, png, chave, legenda=texto)
+        self.bot.send_message(chat_id=chat_id, text=texto)
+        return self._enviar_foto(chat_id, png, chave)
+
+    def estatisticas(self):
+        with self.lock:
+            return {
+                "file_ids": len(self.file_ids),
+                "reaproveitados": self.reaproveitados,
+                "uploads": self.uploads,
+                "com_legenda": self.com_legenda,
+            }
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Exportação do ledger para CSV compactado (gzip) com memória constante:
+# as despesas vêm do espelho local em páginas (LedgerLocal.paginas), passam por
+# um gerador que filtra o período e são escritas direto no gzip. O resumo por
+# categoria é somado durante a mesma passada. As linhas trazem as colunas
+# tipadas (ledger.COLUNAS_PLANILHA): filtro e somas não interpretam texto.
+
+import io
+import os
+import csv
+import gzip
+from ledger import COLUNAS
+
+EXPORTACAO_PAGINA = int(os.environ.get("EXPORTACAO_PAGINA", 1000))
+
+
+def valor_csv(centavos):
+    # 123456 -> "1234,56" (número que o Excel em português reconhece)
+    return f"{centavos / 100:.2f}".replace(".", ",")
+
+def linhas_do_periodo(paginas, inicio=None, fim=None):
+    # Sem período, todas as linhas (inclusive com data inválida); com período, só as datas dentro dele.
+    # Datas ISO comparam como texto; data inválida é "" e fica fora de qualquer período.
+    inicio = inicio.isoformat() if inicio else None
+    fim = fim.isoformat() if fim else None
+    for pagina in paginas:
+        for linha in pagina:
+            data_iso = linha[6]
+            if (inicio or fim) and (not data_iso or (inicio and data_iso < inicio) or (fim and data_iso > fim)):
+                continue
+            yield linha
+
+def exportar_csv_gzip(linhas, destino):
+    # Escreve as linhas em `destino` (arquivo binário) como CSV gzip.
+    # Retorna {categoria: [quantidade, total]} das linhas escritas.
+    resumo = {}
+    with gzip.GzipFile(fileobj=destino, mode="wb") as compactado:
+        with io.TextIOWrapper(compactado, encoding="utf-8-sig", newline="") as texto:
+            escritor = csv.writer(texto, delimiter=";")
+            escritor.writerow(COLUNAS)
+            for data, categoria, descricao, responsavel, _, centavos, _ in linhas:
+                escritor.writerow([data, categoria, descricao, responsavel, valor_csv(centavos)])
+                soma = resumo.setdefault(categoria, [0, 0])
+                soma[0] += 1
+                soma[1] += centavos
+    return {categoria: [quantidade, centavos / 100] for categoria, (quantidade, centavos) in resumo.items()}
+
+def resumo_csv(resumo):
+    # Planilha de resumo: uma linha por categoria, da maior para a menor
+    total = sum(v for _, v in resumo.values())
+    texto = io.StringIO()
+    escritor = csv.writer(texto, delimiter=";")
+    escritor.writerow(["Categoria", "Despesas", "Total", "Percentual"])
+    for categoria, (quantidade, valor) in sorted(resumo.items(), key=lambda x: x[1][1], reverse=True):
+        percentual = valor / total * 100 if total else 0
+        escritor.writerow([categoria, quantidade, f"{valor:.2f}".replace(".", ","), f"{percentual:.1f}".replace(".", ",")])
+    escritor.writerow(["TOTAL", sum(q for q, _ in resumo.values()), f"{total:.2f}".replace(".", ","), "100,0"])
+    return texto.getvalue().encode("utf-8-sig")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import queue
+import logging
+import threading
+import traceback
+
+logger = logging.getLogger()
+
+# Pool de workers para os updates do Telegram
+FILA_WORKERS = int(os.environ.get("FILA_WORKERS", 4))
+# Capacidade de cada worker; com a fila cheia o webhook responde 503 e o Telegram reenvia depois
+FILA_CAPACIDADE = int(os.environ.get("FILA_CAPACIDADE", 50))
+
+
+class FilaPorChat:
+    # Cada chat_id é sempre atendido pelo mesmo worker (fila FIFO própria), o que
+    # mantém a ordem das mensagens de um chat e deixa chats diferentes em paralelo.
+
+    def __init__(self, processar, workers=FILA_WORKERS, capacidade=FILA_CAPACIDADE):
+        self.processar = processar
+        self.capacidade = capacidade
+        self.filas = [queue.Queue(maxsize=capacidade) for _ in range(max(workers, 1))]
+        self.lock = threading.Lock()
+        self.aceitos = 0
+        self.rejeitados = 0
+        self.processados = 0
+        self.erros = 0
+        for i, fila in enumerate(self.filas):
+            threading.Thread(target=self._worker, args=(fila,), name=f"fila-worker-{i}", daemon=True).start()
+
+    def _fila_do_chat(self, chat_id):
+        return self.filas[hash(chat_id) % len(self.filas)]
+
+    def enfileirar(self, chat_id, item):
+        # Retorna False quando a fila do chat está cheia (backpressure)
+        try:
+            self._fila_do_chat(chat_id).put_nowait(item)
+        except queue.Full:
+            with self.lock:
+                self.rejeitados += 1
+            return False
+        with self.lock:
+            self.aceitos += 1
+        return True
+
+    def _worker(self, fila):
+        while True:
+            item = fila.get()
+            try:
+                self.processar(item)
+                with self.lock:
+                    self.processados += 1
+            except Exception as e:
+                with self.lock:
+                    self.erros += 1
+                logger.error(f"Erro no worker da fila: {e}")
+                logger.error(traceback.format_exc())
+            finally:
+                fila.task_done()
+
+    def profundidade(self):
+        return sum(f.qsize() for f in self.filas)
+
+    def aguardar(self):
+        # Bloqueia até todos os itens enfileirados serem processados
+        for fila in self.filas:
+            fila.join()
+
+    def estatisticas(self):
+        with self.lock:
+            return {
+                "profundidade": self.profundidade(),
+                "profundidade_por_worker": [f.qsize() for f in self.filas],
+                "capacidade_por_worker": self.capacidade,
+                "aceitos": self.aceitos,
+                "rejeitados": self.rejeitados,
+                "processados": self.processados,
+                "erros": self.erros,
+            }
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import json
+import hashlib
+import logging
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from metricas import tempo_grafico
+
+logger = logging.getLogger()
+
+# Processos dedicados à renderização (0 = renderiza na thread que pediu o gráfico)
+GRAFICOS_PROCESSOS = int(os.environ.get("GRAFICOS_PROCESSOS", 2))
+# Quantidade de PNGs mantidos em memória
+GRAFICOS_CACHE = int(os.environ.get("GRAFICOS_CACHE", 64))
+FONTE = 14
+
+
+def renderizar(tipo, titulo, dados, categorias=None):
+    # API orientada a objetos (Figure + Agg): não usa o estado global do pyplot
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    import numpy as np
+
+    fig = Figure(figsize=(10, 6))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.set_title(titulo, fontsize=FONTE)
+    ax.tick_params(labelsize=FONTE)
+    if tipo == 'barra':
+        ax.bar(categorias, dados)
+        ax.tick_params(axis='x', labelrotation=45)
+        for rotulo in ax.get_xticklabels():
+            rotulo.set_horizontalalignment('right')
+        fig.tight_layout()
+    elif tipo == 'pizza':
+        if categorias and len(categorias) > 6:
+            top_indices = np.argsort(dados)[-5:]
+            top_categorias = [categorias[i] for i in top_indices]
+            top_dados = [dados[i] for i in top_indices]
+            outros_valor = sum(d for i, d in enumerate(dados) if i not in top_indices)
+            top_categorias.append('Outros')
+            top_dados.append(outros_valor)
+            categorias = top_categorias
+            dados = top_dados
+        ax.pie(dados, labels=categorias, autopct='%1.1f%%', startangle=90, shadow=True,
+               textprops={'fontsize': FONTE})
+        ax.axis('equal')
+    elif tipo == 'linha':
+        ax.plot(categorias, dados, marker='o', linestyle='-')
+        ax.tick_params(axis='x', labelrotation=45)
+        for rotulo in ax.get_xticklabels():
+            rotulo.set_horizontalalignment('right')
+        fig.tight_layout()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
+    return buffer.getvalue()
+
+
+def chave_grafico(tipo, titulo, dados, categorias=None):
+    conteudo = json.dumps([tipo, titulo, list(categorias or []), [float(d) for d in dados]], ensure_ascii=False)
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+
+class ServicoGraficos:
+    def __init__(self, processos=GRAFICOS_PROCESSOS, tamanho_cache=GRAFICOS_CACHE):
+        self.processos = processos
+        self.tamanho_cache = tamanho_cache
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+        self._pool = None
+
+    def iniciar(self):
+        # Os processos são criados por fork logo na inicialização, antes de o
+        # app abrir threads (fila, scheduler, flusher), e reaproveitados depois.
+        if self.processos > 0 and self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.processos, mp_context=multiprocessing.get_context("fork")
+            )
+            self._pool.submit(os.getpid).result()
+
+    def _renderizar(self, tipo, titulo, dados, categorias):
+        with tempo_grafico.cronometrar(tipo):
+            return self._renderizar_no_pool(tipo, titulo, dados, categorias)
+
+    def _renderizar_no_pool(self, tipo, titulo, dados, categorias):
+        if self._pool is None:
+            return renderizar(tipo, titulo, dados, categorias)
+        try:
+            return self._pool.submit(renderizar, tipo, titulo, dados, categorias).result()
+        except BrokenProcessPool:
+            # Não recria o pool com threads já rodando: segue renderizando na própria thread
+            logger.error("Pool de gráficos indisponível, renderizando na própria thread")
+            self._pool = None
+            return renderizar(tipo, titulo, dados, categorias)
+
+    def gerar(self, tipo, titulo, dados, categorias=None):
+        # Retorna (PNG em bytes, hash do conteúdo)
+        dados = [float(d) for d in dados]
+        categorias = list(categorias) if categorias is not None else None
+        chave = chave_grafico(tipo, titulo, dados, categorias)
+        with self.lock:
+            png = self.cache.get(chave)
+            if png is not None:
+                self.cache.move_to_end(chave)
+                self.acertos += 1
+                return png, chave
+            self.faltas += 1
+        png = self._renderizar(tipo, titulo, dados, categorias)
+        with self.lock:
+            self.cache[chave] = png
+            while len(self.cache) > self.tamanho_cache:
+                self.cache.popitem(last=False)
+        return png, chave
+
+    def estatisticas(self):
+        with self.lock:
+            return {
+                "itens": len(self.cache),
+                "bytes": sum(len(p) for p in self.cache.values()),
+                "acertos": self.acertos,
+                "faltas": self.faltas,
+            }
+
+
+def limpar_graficos_antigos(diretorio):
+    # Remove os PNGs que versões anteriores deixavam em disco a cada resumo
+    removidos = 0
+    if os.path.isdir(diretorio):
+        for nome in os.listdir(diretorio):
+            if nome.startswith("grafico_") and nome.endswith(".png"):
+                os.remove(os.path.join(diretorio, nome))
+                removidos += 1
+    return removidos
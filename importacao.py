@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Importação de extratos (CSV ou OFX) enviados ao bot como documento.
+#   - O arquivo é lido em blocos de IMPORTACAO_LOTE lançamentos, sem carregar
+#     tudo na memória.
+#   - Cada bloco é classificado (uma vez por descrição distinta), comparado com
+#     as despesas do responsável já presentes no ledger e gravado com um único
+#     append. Reenviar o mesmo extrato (ou retomar um que falhou no meio) não
+#     duplica nada.
+#   - Despesas são os lançamentos com o sinal predominante no início do extrato
+#     (negativos em extrato de conta, positivos em fatura de cartão). No OFX,
+#     débito é sempre negativo. Os demais contam como créditos e ficam de fora.
+
+import io
+import os
+import re
+import csv
+import html
+import time
+import codecs
+import logging
+import traceback
+from itertools import islice, chain
+from datetime import datetime
+from ledger import parse_valor, parse_data, formatar_valor
+from classificador import normalizar
+from metricas import linhas_importadas
+
+logger = logging.getLogger()
+
+IMPORTACAO_LOTE = int(os.environ.get("IMPORTACAO_LOTE", 500))
+# Limite de download de arquivos da Bot API do Telegram
+IMPORTACAO_MAX_BYTES = int(os.environ.get("IMPORTACAO_MAX_BYTES", 20 * 1024 * 1024))
+# Intervalo mínimo (segundos) entre duas atualizações da mensagem de progresso
+IMPORTACAO_PROGRESSO = float(os.environ.get("IMPORTACAO_PROGRESSO", 3))
+
+# Nomes de coluna aceitos no cabeçalho do CSV (já normalizados)
+COLUNAS_EXTRATO = {
+    "data": ("data", "date", "dt"),
+    "descricao": ("descricao", "historico", "title", "description", "lancamento", "estabelecimento", "memo"),
+    "valor": ("valor", "amount", "value", "quantia"),
+}
+# Cabeçalho em inglês: na falta de valores que decidam, "." é o separador decimal
+COLUNAS_VALOR_INGLES = ("amount", "value")
+# Lançamentos lidos antes de decidir o separador decimal do arquivo
+AMOSTRA_DECIMAL = 200
+
+
+def valor_com_sinal(texto, decimal=None):
+    # parse_valor descarta o sinal: débito vem como "-30,50", "R$ -30,50", "(30,50)", "30,50-" ou "30,50 D".
+    # Com `decimal` ("," ou "."), o outro separador é o de milhar: "1,234.50" e "1.234,50" valem 1234,50
+    texto = str(texto).strip()
+    numero = texto
+    if decimal:
+        numero = numero.replace("." if decimal == "," else ",", "").replace(decimal, ".")
+    valor = parse_valor(numero)
+    if re.search(r"^[^\d]*[-(]|-\s*$|\sD$", texto, re.IGNORECASE):
+        return -valor
+    return valor
+
+def separador_decimal(textos, padrao=","):
+    # Separador decimal mais votado entre os valores do arquivo; valores ambíguos ("1,234",
+    # "500") não votam e, sem nenhum voto, vale `padrao`
+    votos = {",": 0, ".": 0}
+    for texto in textos:
+        numero = re.sub(r"[^\d.,]", "", str(texto))
+        posicao = max(numero.rfind(","), numero.rfind("."))
+        if posicao < 0:
+            continue
+        ultimo = numero[posicao]
+        outro = "." if ultimo == "," else ","
+        if outro in numero:
+            votos[ultimo] += 1  # "1.234,50", "1,234.50": o último é o decimal
+        elif numero.count(ultimo) > 1:
+            votos[outro] += 1   # "1.234.567": só pode ser milhar
+        elif len(numero) - posicao - 1 != 3:
+            votos[ultimo] += 1  # "30,50", "30.5"
+    if votos[","] == votos["."]:
+        return padrao
+    return "," if votos[","] > votos["."] else "."
+
+def ler_data(texto):
+    # dd/mm/YYYY, YYYY-mm-dd (com ou sem hora) ou dd/mm/yy
+    texto = str(texto).strip()
+    data = parse_data(texto[:10])
+    if data is None:
+        try:
+            data = datetime.strptime(texto[:8], "%d/%m/%y").date()
+        except ValueError:
+            return None
+    return data
+
+def em_blocos(iteravel, tamanho):
+    iterador = iter(iteravel)
+    while True:
+        bloco = list(islice(iterador, tamanho))
+        if not bloco:
+            return
+        yield bloco
+
+
+# ========== LEITORES ==========
+# Geram (data ou None, descrição, valor com sinal) por lançamento
+
+def ler_csv(texto):
+    amostra = texto.read(8192)
+    texto.seek(0)
+    try:
+        delimitador = csv.Sniffer().sniff(amostra, delimiters=";,\t|").delimiter
+    except csv.Error:
+        delimitador = ";" if amostra.count(";") > amostra.count(",") else ","
+    leitor = csv.reader(texto, delimiter=delimitador)
+    # O cabeçalho pode vir depois de algumas linhas com dados da conta
+    posicoes = None
+    for linha in islice(leitor, 20):
+        posicoes = posicoes_colunas(linha)
+        if posicoes:
+            break
+    if not posicoes:
+        raise ValueError("Não encontrei o cabeçalho do CSV (colunas de data, descrição e valor).")
+    ingles = normalizar(linha[posicoes[2]]).strip() in COLUNAS_VALOR_INGLES
+    campos = campos_csv(leitor, posicoes, len(linha), delimitador)
+    # O separador decimal é decidido uma vez, pelos primeiros valores do arquivo
+    amostra = list(islice(campos, AMOSTRA_DECIMAL))
+    decimal = separador_decimal((c[2] for c in amostra if c), "." if ingles else ",")
+    for c in chain(amostra, campos):
+        if c is None:
+            yield None, "", 0.0
+            continue
+        data, descricao, valor = c
+        yield ler_data(data), descricao.strip(), valor_com_sinal(valor, decimal)
+
+def campos_csv(leitor, posicoes, colunas, delimitador):
+    # (data, descrição, valor) em texto por linha de dados; None se a linha não tem as colunas
+    i_data, i_descricao, i_valor = posicoes
+    ultima = max(posicoes)
+    for linha in leitor:
+        if not any(c.strip() for c in linha):
+            continue
+        while len(linha) > colunas and not linha[-1].strip():
+            linha = linha[:-1]  # separador sobrando no fim da linha
+        sobra = len(linha) - colunas
+        if sobra > 0:
+            # Valor sem aspas com o separador do arquivo ("-1,234.50" em CSV com ","):
+            # os pedaços só de dígitos depois dele voltam para a coluna de valor
+            pedacos = linha[i_valor:i_valor + sobra + 1]
+            if not all(re.fullmatch(r"\d+(?:[.,]\d+)?\s*-?(?:\s*[DC])?", p.strip(), re.IGNORECASE) for p in pedacos[1:]):
+                yield None
+                continue
+            linha = linha[:i_valor] + [delimitador.join(pedacos)] + linha[i_valor + sobra + 1:]
+        if len(linha) <= ultima:
+            yield None
+            continue
+        yield linha[i_data], linha[i_descricao], linha[i_valor]
+
+def posicoes_colunas(cabecalho):
+    nomes = [normalizar(c).strip() for c in cabecalho]
+    posicoes = []
+    for apelidos in COLUNAS_EXTRATO.values():
+        # Nome exato primeiro ("data"), depois contido ("data da compra", "valor (r$)")
+        exatas = [i for i, nome in enumerate(nomes) if nome in apelidos]
+        contidas = [i for i, nome in enumerate(nomes) if any(a in nome for a in apelidos)]
+        candidatas = exatas or contidas
+        if not candidatas:
+            return None
+        posicoes.append(candidatas[0])
+    return posicoes
+
+def ler_ofx(texto, tamanho=64 * 1024):
+    # OFX 1.x (SGML, tags sem fechamento) e 2.x (XML): um <STMTTRN> por lançamento
+    buffer = ""
+    while True:
+        pedaco = texto.read(tamanho)
+        buffer += pedaco
+        blocos = re.split(r"</STMTTRN>", buffer, flags=re.IGNORECASE)
+        buffer = blocos.pop()
+        for bloco in blocos:
+            yield transacao_ofx(re.split(r"<STMTTRN>", bloco, flags=re.IGNORECASE)[-1])
+        if not pedaco:
+            return
+
+def transacao_ofx(bloco):
+    campos = {k.upper(): html.unescape(v.strip()) for k, v in re.findall(r"<(\w+)>([^<\r\n]*)", bloco)}
+    try:
+        data = datetime.strptime(campos.get("DTPOSTED", "")[:8], "%Y%m%d").date()
+    except ValueError:
+        data = None
+    descricao = campos.get("MEMO") or campos.get("NAME", "")
+    return data, descricao, valor_com_sinal(campos.get("TRNAMT", ""))
+
+def abrir_extrato(arquivo, nome):
+    # arquivo: binário no início -> ("csv" | "ofx", gerador de lançamentos)
+    amostra = arquivo.read(64 * 1024)
+    arquivo.seek(0)
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(amostra, final=False)
+        codificacao = "utf-8-sig"
+    except UnicodeDecodeError:
+        codificacao = "cp1252"  # exportação da maioria dos bancos brasileiros
+    texto = io.TextIOWrapper(arquivo, encoding=codificacao, errors="replace", newline="")
+    if nome.lower().endswith((".ofx", ".qfx")) or b"<OFX>" in amostra.upper():
+        return "ofx", ler_ofx(texto)
+    return "csv", ler_csv(texto)
+
+
+# ========== IMPORTAÇÃO ==========
+class ImportadorExtrato:
+    def __init__(self, gravar, classificar, chaves_existentes, lote=IMPORTACAO_LOTE,
+                 intervalo_progresso=IMPORTACAO_PROGRESSO):
+        # gravar(linhas): append na planilha (e no ledger); classificar(descrição) -> categoria;
+        # chaves_existentes(responsável) -> Counter de (data ISO, DESCRIÇÃO, centavos) já gravados
+        self.gravar = gravar
+        self.classificar = classificar
+        self.chaves_existentes = chaves_existentes
+        self.lote = lote
+        self.intervalo_progresso = intervalo_progresso
+
+    def importar(self, arquivo, nome, responsavel, progresso=None):
+        # Retorna o resumo da importação; progresso(resumo) é chamado entre os blocos.
+        # Formato irreconhecível levanta ValueError com a mensagem para o usuário.
+        inicio = time.monotonic()
+        responsavel = responsavel.upper()
+        resumo = {"lidos": 0, "importados": 0, "duplicados": 0, "creditos": 0, "invalidos": 0,
+                  "total": 0.0, "categorias": {}, "segundos": 0.0, "erro": None}
+        formato, lancamentos = abrir_extrato(arquivo, nome)
+        existentes = self.chaves_existentes(responsavel)
+        categorias = {}
+        sinal = -1 if formato == "ofx" else None
+        ultimo_aviso = inicio
+        for bloco in em_blocos(lancamentos, self.lote):
+            if sinal is None:
+                sinal = sinal_das_despesas(bloco)
+            linhas = self._preparar(bloco, sinal, responsavel, existentes, categorias, resumo)
+            if linhas:
+                try:
+                    self.gravar(linhas)
+                except Exception as e:
+                    # Os blocos já gravados ficam; reenviar o arquivo continua de onde parou
+                    logger.error(f"Erro ao gravar bloco da importação: {e}")
+                    logger.error(traceback.format_exc())
+                    resumo["erro"] = str(e)
+                    break
+                self._contabilizar(linhas, resumo)
+            agora = time.monotonic()
+            if progresso and agora - ultimo_aviso >= self.intervalo_progresso:
+                ultimo_aviso = agora
+                progresso(resumo)
+        resumo["segundos"] = time.monotonic() - inicio
+        for resultado in ("importados", "duplicados", "creditos", "invalidos"):
+            if resumo[resultado]:
+                linhas_importadas.inc(resultado, n=resumo[resultado])
+        return resumo
+
+    def _preparar(self, bloco, sinal, responsavel, existentes, categorias, resumo):
+        linhas = []
+        for data, descricao, valor in bloco:
+            resumo["lidos"] += 1
+            descricao = " ".join(descricao.split()).upper()
+            if data is None or not descricao or not valor:
+                resumo["invalidos"] += 1
+                continue
+            if (valor < 0) != (sinal < 0):
+                resumo["creditos"] += 1
+                continue
+            centavos = round(abs(valor) * 100)
+            chave = (data.isoformat(), descricao, centavos)
+            if existentes[chave] > 0:
+                existentes[chave] -= 1
+                resumo["duplicados"] += 1
+                continue
+            if descricao not in categorias:
+                categorias[descricao] = self.classificar(descricao)
+            # Colunas: Data da Despesa, Categoria, Descrição, Responsável, Valor
+            linhas.append([data.strftime("%d/%m/%Y"), categorias[descricao], descricao, responsavel,
+                           formatar_valor(centavos / 100)])
+        return linhas
+
+    def _contabilizar(self, linhas, resumo):
+        resumo["importados"] += len(linhas)
+        for _, categoria, _, _, valor in linhas:
+            valor = parse_valor(valor)
+            resumo["total"] += valor
+            resumo["categorias"][categoria] = resumo["categorias"].get(categoria, 0.0) + valor
+
+
+def sinal_das_despesas(bloco):
+    negativos = sum(1 for _, _, valor in bloco if valor < 0)
+    positivos = sum(1 for _, _, valor in bloco if valor > 0)
+    return -1 if negativos > positivos else 1
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import time
+import fcntl
+import logging
+import threading
+import traceback
+
+logger = logging.getLogger()
+
+# Modo write-behind: a despesa é confirmada após entrar no journal local e
+# um flusher em segundo plano grava os lotes pendentes na planilha.
+WRITE_BEHIND = os.environ.get("WRITE_BEHIND", "0") == "1"
+JOURNAL_PATH = os.environ.get("JOURNAL_PATH", "despesas.journal")
+JOURNAL_INTERVALO = float(os.environ.get("JOURNAL_INTERVALO", 5))
+JOURNAL_BACKOFF_MAX = 300
+
+
+class JournalDespesas:
+    # Arquivos (compartilhados entre os workers do gunicorn):
+    #   <caminho>           -> append-only, uma linha JSON por mensagem
+    #   <caminho>.enviando  -> lote em gravação; se existir no início, é reenviado
+    #   <caminho>.lock      -> garante um único flusher por vez
+    # O lote é gravado em partes (agrupar: um append por partição da planilha) e,
+    # após cada parte, o .enviando é reescrito sem ela: uma falha no meio reenvia
+    # só o que faltou. A entrega é "pelo menos uma vez": se o processo cair entre
+    # um append e a reescrita do .enviando, aquela parte é gravada de novo.
+
+    def __init__(self, gravar_lote, caminho=JOURNAL_PATH, intervalo=JOURNAL_INTERVALO, agrupar=None):
+        self.gravar_lote = gravar_lote
+        self.agrupar = agrupar
+        self.caminho = caminho
+        self.enviando = caminho + ".enviando"
+        self.intervalo = intervalo
+        self.falhas = 0
+        self._acordar = threading.Event()
+        self._thread = None
+
+    def adicionar(self, linhas):
+        registro = json.dumps({"ts": time.time(), "linhas": linhas}, ensure_ascii=False)
+        while True:
+            with open(self.caminho, "a", encoding="utf-8") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    # O flusher pode ter renomeado o arquivo enquanto esperávamos a trava
+                    if not self._mesmo_arquivo(f):
+                        continue
+                    f.write(registro + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                    return
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _mesmo_arquivo(self, f):
+        try:
+            return os.fstat(f.fileno()).st_ino == os.stat(self.caminho).st_ino
+        except FileNotFoundError:
+            return False
+
+    def pendentes(self):
+        total = 0
+        for caminho in (self.enviando, self.caminho):
+            if os.path.exists(caminho):
+                total += sum(len(r["linhas"]) for r in self._ler(caminho))
+        return total
+
+    def _ler(self, caminho):
+        registros = []
+        with open(caminho, encoding="utf-8") as f:
+            for linha in f:
+                try:
+                    registros.append(json.loads(linha))
+                except ValueError:
+                    # Linha incompleta (queda durante a escrita): descartada
+                    logger.warning(f"Journal: linha corrompida ignorada em {caminho}")
+        return registros
+
+    def _separar_lote(self):
+        # Move o journal atual para .enviando sem bloquear novas despesas por muito tempo
+        if os.path.exists(self.enviando):
+            return
+        if not os.path.exists(self.caminho):
+            return
+        with open(self.caminho, "a", encoding="utf-8") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                os.replace(self.caminho, self.enviando)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _reescrever_lote(self, linhas):
+        # .enviando só com as linhas ainda não gravadas (troca atômica)
+        temporario = f"{self.enviando}.{os.getpid()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"ts": time.time(), "linhas": linhas}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, self.enviando)
+
+    def descarregar(self):
+        # Grava na planilha tudo o que estiver pendente: um append por grupo de agrupar()
+        with open(self.caminho + ".lock", "a") as trava:
+            try:
+                fcntl.flock(trava, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return 0  # outro processo já está descarregando
+            try:
+                self._separar_lote()
+                if not os.path.exists(self.enviando):
+                    return 0
+                linhas = [l for r in self._ler(self.enviando) for l in r["linhas"]]
+                grupos = self.agrupar(linhas) if self.agrupar else [linhas]
+                for i, grupo in enumerate(grupos):
+                    if not grupo:
+                        continue
+                    self.gravar_lote(grupo)
+                    restantes = [l for g in grupos[i + 1:] for l in g]
+                    if restantes:
+                        self._reescrever_lote(restantes)
+                os.remove(self.enviando)
+                if linhas:
+                    logger.info(f"Journal: {len(linhas)} linhas gravadas na planilha")
+                return len(linhas)
+            finally:
+                fcntl.flock(trava, fcntl.LOCK_UN)
+
+    def _loop(self):
+        while True:
+            espera = min(self.intervalo * (2 ** self.falhas), JOURNAL_BACKOFF_MAX)
+            self._acordar.wait(espera)
+            self._acordar.clear()
+            try:
+                self.descarregar()
+                self.falhas = 0
+            except Exception as e:
+                self.falhas += 1
+                logger.error(f"Journal: erro ao gravar lote (tentativa {self.falhas}): {e}")
+                logger.error(traceback.format_exc())
+
+    def iniciar(self):
+        # Reenvia o que sobrou de uma execução anterior e inicia o flusher
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="journal-flusher", daemon=True)
+            self._thread.start()
+            self._acordar.set()
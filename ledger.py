@@ -0,0 +1,357 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+from collections import Counter
+from datetime import datetime, date
+from sheets import VooUnico
+
+logger = logging.getLogger()
+
+# Espelho local da planilha de despesas (SQLite em disco ou ":memory:")
+LEDGER_DB = os.environ.get("LEDGER_DB", "ledger.db")
+# Snapshot binário dos rollups mapeado por todos os workers (snapshot.py); vazio desativa
+LEDGER_SNAPSHOT = os.environ.get("LEDGER_SNAPSHOT", "ledger.snap")
+# Intervalo mínimo (segundos) entre duas buscas incrementais na planilha
+LEDGER_SYNC_INTERVALO = float(os.environ.get("LEDGER_SYNC_INTERVALO", 30))
+
+# Colunas: Data da Despesa, Categoria, Descrição, Responsável, Valor
+COLUNAS = ["Data da Despesa", "Categoria", "Descrição", "Responsável", "Valor"]
+# Cópias para leitura por máquina, gravadas junto com as colunas de exibição:
+# valor em centavos (inteiro) e data ISO (YYYY-MM-DD). Linhas antigas são
+# preenchidas por migrar_colunas_tipadas.py; enquanto isso, o texto é lido.
+COLUNAS_TIPADAS = ["Valor (centavos)", "Data ISO"]
+COLUNAS_PLANILHA = COLUNAS + COLUNAS_TIPADAS
+
+
+def parse_valor(valor_str):
+    valor_str = str(valor_str).replace("R$", "").replace(" ", "").strip()
+    valor_str = re.sub(r"[^\d\.,]", "", valor_str)
+    if "," in valor_str and "." in valor_str:
+        valor_str = valor_str.replace(".", "").replace(",", ".")
+    elif "," in valor_str:
+        valor_str = valor_str.replace(",", ".")
+    try:
+        return float(valor_str)
+    except:
+        return 0.0
+
+def formatar_valor(valor):
+    return f"R${valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+def parse_data(data_str):
+    # Aceita dd/mm/YYYY (formato gravado pelo bot) e YYYY-mm-dd
+    for formato in ("%d/%m/%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(data_str, formato).date()
+        except ValueError:
+            continue
+    return None
+
+
+def valores_tipados(linha):
+    # (centavos, data ISO ou "" se inválida) de uma linha da planilha: das colunas
+    # tipadas quando preenchidas, senão do texto de Valor e Data da Despesa
+    centavos = data_iso = None
+    if len(linha) >= len(COLUNAS_PLANILHA):
+        texto_centavos, texto_data = str(linha[5]).strip(), str(linha[6]).strip()
+        if re.fullmatch(r"-?\d+", texto_centavos):
+            centavos = int(texto_centavos)
+        if re.fullmatch(r"\d{4}-\d{2}-\d{2}", texto_data):
+            data_iso = texto_data
+    if centavos is None:
+        centavos = round(parse_valor(linha[4]) * 100)
+    if data_iso is None:
+        data = parse_data(str(linha[0]).strip())
+        data_iso = data.isoformat() if data else ""
+    return centavos, data_iso
+
+def com_colunas_tipadas(linhas):
+    # Linhas no formato de COLUNAS -> COLUNAS_PLANILHA (para gravar na planilha)
+    return [list(linha[:len(COLUNAS)]) + list(valores_tipados(linha)) for linha in linhas]
+
+
+def letra_coluna(numero):
+    # 1 -> A, 27 -> AA
+    letras = ""
+    while numero > 0:
+        numero, resto = divmod(numero - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+def linha_do_range(updated_range):
+    # "Página1!A12:E14" -> 12
+    m = re.search(r"![A-Z]+(\d+)", updated_range or "")
+    return int(m.group(1)) if m else None
+
+
+# Versão do esquema do espelho; ao mudar (ou ao trocar de fonte) o cache é refeito
+SCHEMA_VERSAO = "3"
+
+
+class LedgerLocal:
+    def __init__(self, caminho=LEDGER_DB, modo="unica", parcelamentos=None, snapshot=LEDGER_SNAPSHOT):
+        self.conn = sqlite3.connect(caminho, check_same_thread=False, timeout=30)
+        # Parcelas projetadas dos planos (parcelamentos.CarteiraParcelamentos) somadas às consultas
+        self.parcelamentos = parcelamentos
+        self.lock = threading.RLock()
+        self.ultima_sync = 0.0
+        # Com o SQLite em memória não há outros processos: a visão em colunas fica no processo
+        self.caminho_snapshot = snapshot if caminho != ":memory:" else None
+        self._snapshot = None
+        self._colunar = None
+        self._indice = None
+        self._versao = None
+        self._voo = VooUnico()
+        with self.lock, self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS estado (chave TEXT PRIMARY KEY, valor TEXT)")
+            if self._ler_estado("schema") != SCHEMA_VERSAO or self._ler_estado("modo") != modo:
+                # É só um cache: descarta e recarrega da planilha
+                self.conn.execute("DROP TABLE IF EXISTS despesas")
+                self.conn.execute("DROP TABLE IF EXISTS rollups")
+                self.conn.execute("DELETE FROM estado")
+                self._gravar_estado("schema", SCHEMA_VERSAO)
+                self._gravar_estado("modo", modo)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS despesas ("
+                " aba TEXT, linha INTEGER,"
+                " data TEXT, categoria TEXT, descricao TEXT, responsavel TEXT, valor TEXT,"
+                " centavos INTEGER, data_iso TEXT,"
+                " PRIMARY KEY (aba, linha))"
+            )
+            # Totais por (dia, categoria, responsável); data vazia = data inválida na planilha
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS rollups ("
+                " data TEXT, categoria TEXT, responsavel TEXT,"
+                " total_centavos INTEGER, qtd INTEGER,"
+                " PRIMARY KEY (data, categoria, responsavel))"
+            )
+            # Versão dos rollups compartilhada pelos processos: (época, geração). A época
+            # muda quando o espelho é recriado; a geração, a cada alteração dos rollups.
+            self.conn.execute("INSERT OR IGNORE INTO estado (chave, valor) VALUES ('epoca', ?)", (str(time.time_ns()),))
+            if self._ler_estado("rollups_ok") is None:
+                self._reconstruir_rollups()
+
+    # ---------- estado ----------
+    def _ler_estado(self, chave, padrao=None):
+        row = self.conn.execute("SELECT valor FROM estado WHERE chave = ?", (chave,)).fetchone()
+        return row[0] if row else padrao
+
+    def _gravar_estado(self, chave, valor):
+        self.conn.execute("INSERT OR REPLACE INTO estado (chave, valor) VALUES (?, ?)", (chave, str(valor)))
+
+    def _nova_geracao(self):
+        # Dentro da mesma transação que alterou os rollups
+        self.conn.execute(
+            "INSERT INTO estado (chave, valor) VALUES ('geracao', 1)"
+            " ON CONFLICT (chave) DO UPDATE SET valor = CAST(valor AS INTEGER) + 1"
+        )
+
+    def versao(self):
+        estado = dict(self.conn.execute("SELECT chave, valor FROM estado WHERE chave IN ('epoca', 'geracao')"))
+        return int(estado.get("epoca", 0)), int(estado.get("geracao", 0))
+
+    def linhas_sincronizadas(self, aba):
+        # Última linha da aba já lida (linha 1 é o cabeçalho)
+        return int(self._ler_estado(f"ultima_linha:{aba}", 1))
+
+    # ---------- escrita ----------
+    def _inserir(self, aba, linha, valores):
+        # valores: COLUNAS_PLANILHA (ou só COLUNAS); o texto só é lido se as colunas tipadas estiverem vazias
+        centavos, data_iso = valores_tipados(valores)
+        cursor = self.conn.execute(
+            "INSERT OR IGNORE INTO despesas (aba, linha, data, categoria, descricao, responsavel, valor, centavos, data_iso)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (aba, linha, *valores[:len(COLUNAS)], centavos, data_iso),
+        )
+        if cursor.rowcount:
+            self._somar_rollup(data_iso, valores[1], valores[3], centavos)
+        return cursor.rowcount
+
+    def _somar_rollup(self, data_iso, categoria, responsavel, centavos):
+        self.conn.execute(
+            "INSERT INTO rollups (data, categoria, responsavel, total_centavos, qtd) VALUES (?, ?, ?, ?, 1)"
+            " ON CONFLICT (data, categoria, responsavel) DO UPDATE SET"
+            " total_centavos = total_centavos + excluded.total_centavos, qtd = qtd + 1",
+            (data_iso, categoria, responsavel.upper(), centavos),
+        )
+
+    def _reconstruir_rollups(self):
+        self.conn.execute("DELETE FROM rollups")
+        for data_iso, categoria, responsavel, centavos in self.conn.execute(
+            "SELECT data_iso, categoria, responsavel, centavos FROM despesas"
+        ).fetchall():
+            self._somar_rollup(data_iso, categoria, responsavel, centavos)
+        self._gravar_estado("rollups_ok", 1)
+        self._nova_geracao()
+
+    def registrar(self, aba, linhas, primeira_linha):
+        # Linhas recém gravadas pelo webhook: entram no espelho sem nova leitura da planilha
+        with self.lock, self.conn:
+            inseridas = sum(self._inserir(aba, primeira_linha + i, [str(v) for v in valores])
+                            for i, valores in enumerate(linhas))
+            if inseridas:
+                self._nova_geracao()
+
+    # ---------- sincronização ----------
+    def sincronizar(self, fonte, forcar=False):
+        # Busca somente as linhas adicionadas após a última linha vista de cada aba
+        # aberta; abas fechadas (meses encerrados) são lidas uma última vez e nunca mais.
+        if not forcar and time.monotonic() - self.ultima_sync < LEDGER_SYNC_INTERVALO:
+            return 0
+        # Vários resumos pedindo sync ao mesmo tempo compartilham uma única leitura
+        return self._voo.executar("sincronizar", self._sincronizar, fonte)
+
+    def _sincronizar(self, fonte):
+        with self.lock:
+            abas = [a for a in fonte.abas() if not self._ler_estado(f"fechada:{a}")]
+            pedidos = [(aba, self.linhas_sincronizadas(aba) + 1) for aba in abas]
+            respostas = fonte.ler(pedidos, COLUNAS_PLANILHA)
+            novas = 0
+            with self.conn:
+                for (aba, inicio), valores in zip(pedidos, respostas):
+                    for i, linha in enumerate(valores):
+                        self._inserir(aba, inicio + i, linha)
+                    if valores:
+                        self._gravar_estado(f"ultima_linha:{aba}", inicio + len(valores) - 1)
+                    if fonte.fechada(aba):
+                        self._gravar_estado(f"fechada:{aba}", 1)
+                    novas += len(valores)
+                if novas:
+                    self._nova_geracao()
+            self.ultima_sync = time.monotonic()
+            if novas:
+                logger.info(f"Ledger local: {novas} novas linhas sincronizadas")
+            return novas
+
+    def ressincronizar(self, fonte):
+        # Descarta o espelho e recarrega tudo (após edições manuais na planilha)
+        fonte.recarregar()
+        with self.lock:
+            with self.conn:
+                self.conn.execute("DELETE FROM despesas")
+                self.conn.execute("DELETE FROM rollups")
+                self.conn.execute(
+                    "DELETE FROM estado WHERE chave LIKE 'ultima_linha:%' OR chave LIKE 'fechada:%'"
+                )
+                self._nova_geracao()
+            return self._sincronizar(fonte)
+
+    # ---------- leitura ----------
+    def paginas(self, tamanho=1000):
+        # Despesas (COLUNAS_PLANILHA) em páginas de `tamanho` linhas, na ordem da planilha.
+        # A trava só é mantida durante cada página: a memória não depende do tamanho do ledger.
+        ultima = ("", 0)
+        while True:
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT aba, linha, data, categoria, descricao, responsavel, valor, centavos, data_iso FROM despesas"
+                    " WHERE (aba, linha) > (?, ?) ORDER BY aba, linha LIMIT ?",
+                    (*ultima, tamanho),
+                ).fetchall()
+            if not rows:
+                return
+            ultima = rows[-1][:2]
+            yield [row[2:] for row in rows]
+
+    def colunar(self):
+        # Visão em colunas (numpy) dos buckets; refeita só quando a versão dos rollups muda.
+        # Com snapshot, é o arquivo mapeado compartilhado pelos workers (snapshot.py).
+        with self.lock:
+            versao = self.versao()
+            if self._colunar is None or versao != self._versao:
+                self._colunar, self._indice = None, None
+                if self.caminho_snapshot:
+                    try:
+                        if self._snapshot is None:
+                            from snapshot import SnapshotLedger  # numpy só é carregado no primeiro resumo
+                            self._snapshot = SnapshotLedger(self.caminho_snapshot)
+                        versao, self._colunar, self._indice = self._snapshot.carregar(versao, self._montar_versao)
+                    except OSError as e:
+                        logger.error(f"Erro no snapshot do ledger, usando cópia local: {e}")
+                if self._colunar is None:
+                    self._colunar = self._montar_colunar()
+                self._versao = versao
+            return self._colunar
+
+    def _montar_versao(self):
+        # Versão lida antes dos buckets: o rótulo nunca é mais novo que o conteúdo
+        return self.versao(), self._montar_colunar()
+
+    def _montar_colunar(self):
+        from colunar import LedgerColunar
+        buckets = self.conn.execute(
+            "SELECT data, categoria, responsavel, total_centavos, qtd FROM rollups"
+        ).fetchall()
+        return LedgerColunar.de_linhas(
+            (date.fromisoformat(d) if d else None, cat, resp, centavos, qtd)
+            for d, cat, resp, centavos, qtd in buckets
+        )
+
+    def agregar(self, inicio=None, fim=None, responsavel=None):
+        # Soma os buckets do período [inicio, fim] (datas inclusivas; None = sem limite).
+        # Retorna (totais por categoria, totais por dia, quantidade de registros).
+        categorias, dias, qtd = self.colunar().agregar(inicio, fim, responsavel)
+        for data, categoria, _, centavos in self._parcelas(inicio, fim, responsavel):
+            categorias[categoria] = round(categorias.get(categoria, 0.0) + centavos / 100, 2)
+            dias[data] = round(dias.get(data, 0.0) + centavos / 100, 2)
+            qtd += 1
+        return categorias, dias, qtd
+
+    def _parcelas(self, inicio, fim, responsavel=None, categoria=None):
+        if not self.parcelamentos:
+            return []
+        return self.parcelamentos.projetar(inicio, fim, responsavel, categoria)
+
+    def indice(self):
+        # Somas acumuladas por dia (colunar.IndicePrefixos); vem junto com o snapshot ou é
+        # refeito quando os rollups mudam
+        with self.lock:
+            colunar = self.colunar()
+            if self._indice is None:
+                from colunar import IndicePrefixos
+                self._indice = IndicePrefixos.de_colunar(colunar)
+            return self._indice
+
+    def totais(self, inicio=None, fim=None, responsavel=None, categoria=None):
+        # Totais do período sem percorrer as linhas: O(log n) + categorias x responsáveis.
+        # Retorna (totais por categoria, totais por responsável, quantidade de registros).
+        por_categoria, por_responsavel, qtd = self.indice().consultar(inicio, fim, responsavel, categoria)
+        for _, cat, resp, centavos in self._parcelas(inicio, fim, responsavel, categoria):
+            por_categoria[cat] = round(por_categoria.get(cat, 0.0) + centavos / 100, 2)
+            por_responsavel[resp] = round(por_responsavel.get(resp, 0.0) + centavos / 100, 2)
+            qtd += 1
+        return por_categoria, por_responsavel, qtd
+
+    def totais_mensais(self, desde):
+        # [(mês "YYYY-MM", categoria, responsável, centavos)] a partir da data `desde`
+        with self.lock:
+            return self.conn.execute(
+                "SELECT substr(data, 1, 7), categoria, responsavel, SUM(total_centavos) FROM rollups"
+                " WHERE data >= ? GROUP BY 1, 2, 3",
+                (desde.isoformat(),),
+            ).fetchall()
+
+    def responsaveis(self):
+        # Nomes presentes no ledger (em maiúsculas), na ordem em que apareceram
+        nomes = list(self.colunar().responsaveis)
+        if self.parcelamentos:
+            nomes += [n for n in self.parcelamentos.responsaveis() if n not in nomes]
+        return nomes
+
+    def estatisticas_snapshot(self):
+        return self._snapshot.estatisticas() if self._snapshot else {}
+
+    def chaves_despesas(self, responsavel):
+        # Quantas vezes cada (data ISO, DESCRIÇÃO, centavos) aparece para o responsável:
+        # base da deduplicação na importação de extratos
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT data_iso, descricao, centavos FROM despesas WHERE UPPER(responsavel) = ?", (responsavel.upper(),)
+            ).fetchall()
+        return Counter((data_iso, " ".join(descricao.split()).upper(), centavos) for data_iso, descricao, centavos in rows)
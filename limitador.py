@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger()
+
+
+class BaldeTokens:
+    # Token bucket: `taxa` tokens por segundo, acumulando até `capacidade`.
+    # consumir() bloqueia a thread até haver token disponível.
+
+    def __init__(self, taxa, capacidade=None):
+        self.taxa = float(taxa)
+        self.capacidade = float(capacidade if capacidade is not None else max(taxa, 1))
+        self.tokens = self.capacidade
+        self.atualizado = time.monotonic()
+        self.pausado_ate = 0.0
+        self.lock = threading.Lock()
+
+    def _repor(self, agora):
+        self.tokens = min(self.capacidade, self.tokens + (agora - self.atualizado) * self.taxa)
+        self.atualizado = agora
+
+    def espera(self, n=1):
+        # Reserva n tokens e devolve quantos segundos faltam para poder usá-los
+        with self.lock:
+            agora = time.monotonic()
+            self._repor(agora)
+            self.tokens -= n
+            falta = max(0.0, -self.tokens / self.taxa)
+            return max(falta, self.pausado_ate - agora)
+
+    def consumir(self, n=1):
+        espera = self.espera(n)
+        if espera > 0:
+            time.sleep(espera)
+        return espera
+
+    def pausar(self, segundos):
+        # Ninguém consome antes de `segundos` (ex.: RetryAfter do Telegram, 429 do Sheets)
+        with self.lock:
+            self.pausado_ate = max(self.pausado_ate, time.monotonic() + segundos)
+
+
+class BaldeCompartilhado:
+    # Token bucket com o estado numa linha SQLite, visto por todos os processos
+    # (workers do gunicorn) que abrem o mesmo arquivo: a cota vale para o
+    # conjunto, não por processo. Mesma interface de BaldeTokens; se o SQLite
+    # falhar, vale o balde local do processo.
+
+    def __init__(self, caminho, nome, taxa, capacidade=None):
+        self.nome = nome
+        self.local = BaldeTokens(taxa, capacidade)
+        self.taxa = self.local.taxa
+        self.capacidade = self.local.capacidade
+        self.lock = threading.Lock()
+        # Transações explícitas: BEGIN IMMEDIATE serializa a leitura e a escrita da linha
+        self.conn = sqlite3.connect(caminho, check_same_thread=False, timeout=10, isolation_level=None)
+        with self.lock:
+            if caminho != ":memory:":
+                self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS baldes ("
+                " nome TEXT PRIMARY KEY, tokens REAL, atualizado REAL, pausado_ate REAL)"
+            )
+            self.conn.execute("INSERT OR IGNORE INTO baldes VALUES (?, ?, ?, 0)", (nome, self.capacidade, time.time()))
+
+    def espera(self, n=1):
+        # Reserva n tokens e devolve quantos segundos faltam para poder usá-los
+        with self.lock:
+            try:
+                self.conn.execute("BEGIN IMMEDIATE")
+                try:
+                    tokens, atualizado, pausado_ate = self.conn.execute(
+                        "SELECT tokens, atualizado, pausado_ate FROM baldes WHERE nome = ?", (self.nome,)
+                    ).fetchone()
+                    agora = time.time()
+                    tokens = min(self.capacidade, tokens + max(0.0, agora - atualizado) * self.taxa) - n
+                    self.conn.execute("UPDATE baldes SET tokens = ?, atualizado = ? WHERE nome = ?",
+                                      (tokens, max(agora, atualizado), self.nome))
+                    self.conn.execute("COMMIT")
+                except BaseException:
+                    self.conn.execute("ROLLBACK")
+                    raise
+            except sqlite3.Error as e:
+                logger.error(f"Erro no balde compartilhado {self.nome}, usando o do processo: {e}")
+                return self.local.espera(n)
+            falta = max(0.0, -tokens / self.taxa)
+            return max(falta, pausado_ate - agora)
+
+    def consumir(self, n=1):
+        espera = self.espera(n)
+        if espera > 0:
+            time.sleep(espera)
+        return espera
+
+    def pausar(self, segundos):
+        # Nenhum processo consome antes de `segundos` (ex.: 429 do Sheets)
+        self.local.pausar(segundos)
+        with self.lock:
+            try:
+                self.conn.execute("UPDATE baldes SET pausado_ate = max(pausado_ate, ?) WHERE nome = ?",
+                                  (time.time() + segundos, self.nome))
+            except sqlite3.Error as e:
+                logger.error(f"Erro no balde compartilhado {self.nome}: {e}")
@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Métricas no formato texto do Prometheus (GET /metrics), sem dependências:
+#   - contadores e histogramas com rótulos, atualizados pelo código
+#   - coletores: funções chamadas na hora da leitura (fila, caches...) cujos
+#     valores numéricos viram gauges
+#   - ClienteInstrumentado: proxy que conta e cronometra cada chamada ao
+#     Sheets/Telegram
+#   - Amostrador: profiler por amostragem de pilha, ligado por requisição que
+#     traga o segredo PERFIL_SEGREDO
+
+import os
+import sys
+import hmac
+import time
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+
+logger = logging.getLogger()
+
+PREFIXO = "financeiro"
+BUCKETS_PADRAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# Intervalo de amostragem do profiler em milissegundos (0 = desligado)
+PERFIL_AMOSTRAGEM_MS = float(os.environ.get("PERFIL_AMOSTRAGEM_MS", 0))
+# Quantos perfis recentes ficam disponíveis em /perfil/<segredo>
+PERFIL_HISTORICO = int(os.environ.get("PERFIL_HISTORICO", 20))
+# Segredo que liga o profiler num update e lê /perfil/<segredo>; sem ele o profiler fica desligado
+PERFIL_SEGREDO = os.environ.get("PERFIL_SEGREDO", "")
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _rotulos(nomes, valores, extra=None):
+    pares = list(zip(nomes, valores)) + (list(extra.items()) if extra else [])
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{n}="{_escapar(v)}"' for n, v in pares) + "}"
+
+
+def _numero(valor):
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Contador:
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self.valores = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *valores_rotulos, n=1):
+        with self.lock:
+            self.valores[valores_rotulos] = self.valores.get(valores_rotulos, 0) + n
+
+    def exportar(self):
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} counter"]
+        with self.lock:
+            for chave, valor in sorted(self.valores.items()):
+                linhas.append(f"{self.nome}{_rotulos(self.rotulos, chave)} {_numero(valor)}")
+        return linhas
+
+
+class Histograma:
+    def __init__(self, nome, ajuda, rotulos=(), buckets=BUCKETS_PADRAO):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self.series = {}  # rótulos -> [contagens por bucket, soma, total]
+        self.lock = threading.Lock()
+
+    def observar(self, valor, *valores_rotulos):
+        with self.lock:
+            serie = self.series.get(valores_rotulos)
+            if serie is None:
+                serie = self.series[valores_rotulos] = [[0] * len(self.buckets), 0.0, 0]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[0][i] += 1
+                    break
+            serie[1] += valor
+            serie[2] += 1
+
+    @contextmanager
+    def cronometrar(self, *valores_rotulos):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, *valores_rotulos)
+
+    def exportar(self):
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} histogram"]
+        with self.lock:
+            for chave, (contagens, soma, total) in sorted(self.series.items()):
+                acumulado = 0
+                for limite, contagem in zip(self.buckets, contagens):
+                    acumulado += contagem
+                    linhas.append(f"{self.nome}_bucket{_rotulos(self.rotulos, chave, {'le': _numero(limite)})} {acumulado}")
+                linhas.append(f"{self.nome}_sum{_rotulos(self.rotulos, chave)} {_numero(soma)}")
+                linhas.append(f"{self.nome}_count{_rotulos(self.rotulos, chave)} {total}")
+        return linhas
+
+
+class Registro:
+    def __init__(self, prefixo=PREFIXO):
+        self.prefixo = prefixo
+        self.metricas = []
+        self.coletores = []
+        self.lock = threading.Lock()
+
+    def contador(self, nome, ajuda, rotulos=()):
+        return self._adicionar(Contador(f"{self.prefixo}_{nome}", ajuda, rotulos))
+
+    def histograma(self, nome, ajuda, rotulos=(), buckets=BUCKETS_PADRAO):
+        return self._adicionar(Histograma(f"{self.prefixo}_{nome}", ajuda, rotulos, buckets))
+
+    def _adicionar(self, metrica):
+        with self.lock:
+            self.metricas.append(metrica)
+        return metrica
+
+    def coletor(self, nome, funcao):
+        # funcao() -> dict; cada valor numérico vira o gauge <prefixo>_<nome>_<chave>
+        with self.lock:
+            self.coletores.append((nome, funcao))
+
+    def exportar(self):
+        with self.lock:
+            metricas, coletores = list(self.metricas), list(self.coletores)
+        linhas = []
+        for metrica in metricas:
+            linhas.extend(metrica.exportar())
+        for nome, funcao in coletores:
+            try:
+                valores = funcao() or {}
+            except Exception as e:
+                logger.error(f"Erro no coletor de métricas '{nome}': {e}")
+                continue
+            for chave, valor in sorted(valores.items()):
+                if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+                    continue
+                metrica = f"{self.prefixo}_{nome}_{chave}"
+                linhas.append(f"# TYPE {metrica} gauge")
+                linhas.append(f"{metrica} {_numero(valor)}")
+        return "\n".join(linhas) + "\n"
+
+
+registro = Registro()
+
+tempo_comando = registro.histograma(
+    "comando_segundos", "Tempo de processamento de cada comando do bot", ("comando",))
+chamadas_externas = registro.contador(
+    "chamadas_externas_total", "Chamadas ao Google Sheets e ao Telegram", ("servico", "metodo", "resultado"))
+tempo_chamadas_externas = registro.histograma(
+    "chamadas_externas_segundos", "Duração das chamadas ao Google Sheets e ao Telegram", ("servico", "metodo"))
+tempo_grafico = registro.histograma(
+    "grafico_render_segundos", "Tempo de renderização de um gráfico (faltas no cache)", ("tipo",))
+updates_recebidos = registro.contador(
+    "updates_recebidos_total", "POSTs do Telegram por resultado", ("resultado",))
+linhas_importadas = registro.contador(
+    "importacao_linhas_total", "Lançamentos de extratos importados, por resultado", ("resultado",))
+
+
+def medir_comando(comando):
+    # O comando também é o rótulo do perfil, se o update estiver sendo perfilado
+    if amostrador:
+        amostrador.rotular(comando)
+    return tempo_comando.cronometrar(comando)
+
+
+# ========== CHAMADAS EXTERNAS ==========
+class ClienteInstrumentado:
+    # Repassa tudo para o objeto real, contando e cronometrando cada método.
+    # Objetos devolvidos cujo tipo está em `embrulhar` (ex.: "Worksheet" do
+    # gspread) também são instrumentados.
+
+    def __init__(self, objeto, servico, embrulhar=()):
+        self._objeto = objeto
+        self._servico = servico
+        self._tipos = tuple(embrulhar)
+
+    def _embrulhar(self, valor):
+        if not self._tipos:
+            return valor
+        if isinstance(valor, list) and valor and type(valor[0]).__name__ in self._tipos:
+            return [self._embrulhar(v) for v in valor]  # ex.: planilha.worksheets()
+        if type(valor).__name__ in self._tipos:
+            return ClienteInstrumentado(valor, self._servico, self._tipos)
+        return valor
+
+    def __getattr__(self, nome):
+        valor = getattr(self._objeto, nome)
+        if not callable(valor):
+            return self._embrulhar(valor)
+
+        @wraps(valor)
+        def chamada(*args, **kwargs):
+            inicio = time.perf_counter()
+            resultado = "ok"
+            try:
+                return self._embrulhar(valor(*args, **kwargs))
+            except Exception as e:
+                resultado = type(e).__name__
+                raise
+            finally:
+                tempo_chamadas_externas.observar(time.perf_counter() - inicio, self._servico, nome)
+                chamadas_externas.inc(self._servico, nome, resultado)
+        return chamada
+
+    def __repr__(self):
+        return f"ClienteInstrumentado({self._objeto!r})"
+
+
+# ========== PROFILER POR AMOSTRAGEM ==========
+class Amostrador:
+    # Enquanto ativo, lê a pilha da thread alvo a cada `intervalo_ms` e conta
+    # as pilhas no formato "collapsed" (uma linha por pilha: f1;f2;f3 N),
+    # pronto para flamegraph.pl / speedscope.
+
+    def __init__(self, intervalo_ms=PERFIL_AMOSTRAGEM_MS, historico=PERFIL_HISTORICO):
+        self.intervalo = max(intervalo_ms, 1) / 1000.0
+        self.historico = historico
+        self.perfis = []
+        self.lock = threading.Lock()
+        self._atual = threading.local()  # rótulo do perfil em andamento nesta thread
+
+    def rotular(self, rotulo):
+        if getattr(self._atual, "rotulo", None) is not None:
+            self._atual.rotulo = rotulo
+
+    @contextmanager
+    def perfilar(self, rotulo="outro"):
+        # O rótulo pode ser trocado durante o perfil com rotular() (ex.: pelo nome do comando)
+        self._atual.rotulo = rotulo
+        alvo = threading.get_ident()
+        pilhas = Counter()
+        parar = threading.Event()
+
+        def amostrar():
+            while not parar.wait(self.intervalo):
+                frame = sys._current_frames().get(alvo)
+                pilha = []
+                while frame is not None:
+                    codigo = frame.f_code
+                    pilha.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}")
+                    frame = frame.f_back
+                if pilha:
+                    pilhas[";".join(reversed(pilha))] += 1
+
+        thread = threading.Thread(target=amostrar, name="amostrador", daemon=True)
+        inicio = time.perf_counter()
+        thread.start()
+        try:
+            yield
+        finally:
+            parar.set()
+            thread.join()
+            perfil = {
+                "rotulo": self._atual.rotulo,
+                "inicio": time.time(),
+                "segundos": round(time.perf_counter() - inicio, 4),
+                "amostras": sum(pilhas.values()),
+                "pilhas": pilhas,
+            }
+            self._atual.rotulo = None
+            with self.lock:
+                self.perfis.append(perfil)
+                del self.perfis[:-self.historico]
+
+    def recentes(self):
+        with self.lock:
+            return list(self.perfis)
+
+    def exportar(self):
+        # Texto "collapsed" de todos os perfis recentes, cada um precedido de um comentário
+        linhas = []
+        for perfil in self.recentes():
+            linhas.append(f"# {perfil['rotulo']} {perfil['segundos']}s {perfil['amostras']} amostras")
+            linhas.extend(f"{pilha} {n}" for pilha, n in perfil["pilhas"].most_common())
+        return "\n".join(linhas) + "\n"
+
+
+def segredo_perfil(valor):
+    # True se `valor` é o segredo do profiler (e o profiler está ligado)
+    return bool(amostrador and valor) and hmac.compare_digest(str(valor), PERFIL_SEGREDO)
+
+
+if PERFIL_AMOSTRAGEM_MS > 0 and not PERFIL_SEGREDO:
+    logger.warning("PERFIL_AMOSTRAGEM_MS definido sem PERFIL_SEGREDO: profiler desligado")
+amostrador = Amostrador() if PERFIL_AMOSTRAGEM_MS > 0 and PERFIL_SEGREDO else None
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Preenche as colunas tipadas (ledger.COLUNAS_TIPADAS: valor em centavos e data
+# ISO) das linhas gravadas antes de elas existirem.
+#
+# Uso:
+#   python migrar_colunas_tipadas.py             -> só mostra quantas linhas faltam em cada aba
+#   python migrar_colunas_tipadas.py --executar  -> cria as colunas e grava os valores que faltam
+#
+# Vale para o modo configurado (sheet1 ou partições, LEDGER_PARTICIONADO). Em
+# sheet1 as colunas novas entram depois da última coluna do cabeçalho. As colunas
+# de exibição não são alteradas. A gravação é retomável: só linhas com coluna
+# tipada vazia ou inválida são gravadas, em lotes de LOTE; rodar de novo continua
+# de onde parou. No fim, mande "ressincronizar" ao bot para o espelho local
+# passar a usar os valores gravados.
+
+import sys
+import logging
+from ledger import COLUNAS, COLUNAS_TIPADAS, COLUNAS_PLANILHA, valores_tipados, letra_coluna
+from particoes import FonteUnica, criar_fonte
+from servicos import planilha, timezone_brasilia
+from sheets import governador_sheets
+
+logger = logging.getLogger()
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+LOTE = 500
+
+
+def posicoes_tipadas(fonte, ws, executar):
+    # Índices (0 = coluna A) das colunas tipadas na aba; com `executar`, cria as que faltam
+    cabecalho = governador_sheets.ler(ws.row_values, 1)
+    if isinstance(fonte, FonteUnica):
+        proxima = max(len(cabecalho), len(COLUNAS))
+        posicoes = []
+        for coluna in COLUNAS_TIPADAS:
+            if coluna in cabecalho:
+                posicoes.append(cabecalho.index(coluna))
+            else:
+                posicoes.append(proxima)
+                proxima += 1
+    else:
+        # Partições têm sempre o layout de ledger.COLUNAS_PLANILHA
+        posicoes = [COLUNAS_PLANILHA.index(c) for c in COLUNAS_TIPADAS]
+    faltando = [(p, c) for p, c in zip(posicoes, COLUNAS_TIPADAS) if p >= len(cabecalho) or cabecalho[p] != c]
+    if executar and faltando:
+        if ws.col_count < max(posicoes) + 1:
+            governador_sheets.escrever(ws.add_cols, max(posicoes) + 1 - ws.col_count)
+        governador_sheets.escrever(ws.batch_update, [
+            {"range": f"{letra_coluna(p + 1)}1", "values": [[c]]} for p, c in faltando
+        ], idempotente=True)
+        logger.info(f"{ws.title}: colunas {', '.join(c for _, c in faltando)} criadas")
+    return posicoes
+
+
+def pendentes(linhas, primeira_linha=2):
+    # [(linha na planilha, [centavos, data ISO])] das linhas com coluna tipada vazia ou inválida
+    resultado = []
+    for i, linha in enumerate(linhas, start=primeira_linha):
+        if not any(linha[:len(COLUNAS)]):
+            continue
+        tipados = list(valores_tipados(linha))
+        if [str(v) for v in tipados] != linha[len(COLUNAS):]:
+            resultado.append((i, tipados))
+    return resultado
+
+
+def faixas(lote):
+    # Linhas consecutivas viram uma só faixa: [(primeira, última, [valores])]
+    grupos = []
+    for numero, valores in lote:
+        if grupos and numero == grupos[-1][1] + 1:
+            grupos[-1][1] = numero
+            grupos[-1][2].append(valores)
+        else:
+            grupos.append([numero, numero, [valores]])
+    return grupos
+
+
+def gravar(ws, posicoes, lote):
+    dados = []
+    for primeira, ultima, valores in faixas(lote):
+        for j, p in enumerate(posicoes):
+            letra = letra_coluna(p + 1)
+            dados.append({"range": f"{letra}{primeira}:{letra}{ultima}", "values": [[v[j]] for v in valores]})
+    governador_sheets.escrever(ws.batch_update, dados, idempotente=True)
+
+
+def main(executar):
+    fonte = criar_fonte(planilha, timezone_brasilia)
+    abas = fonte.abas()
+    planilhas = {ws.title: ws for ws in governador_sheets.ler(planilha.worksheets)}
+    posicoes = {aba: posicoes_tipadas(fonte, planilhas[aba], executar) for aba in abas}
+    # Cabeçalho novo em sheet1: FonteUnica precisa reler para achar as colunas
+    fonte.recarregar()
+    respostas = fonte.ler([(aba, 2) for aba in abas], COLUNAS_PLANILHA)
+    total = 0
+    for aba, linhas in zip(abas, respostas):
+        faltam = pendentes(linhas)
+        total += len(faltam)
+        logger.info(f"{aba}: {len(linhas)} linhas ({len(faltam)} sem colunas tipadas)")
+        if not executar:
+            continue
+        for i in range(0, len(faltam), LOTE):
+            gravar(planilhas[aba], posicoes[aba], faltam[i:i + LOTE])
+            logger.info(f"{aba}: {min(i + LOTE, len(faltam))}/{len(faltam)} linhas gravadas")
+    if not executar:
+        logger.info("Nada foi gravado. Use --executar para preencher as colunas tipadas.")
+    elif total:
+        logger.info("Concluído. Envie \"ressincronizar\" ao bot para recarregar o espelho local.")
+
+
+if __name__ == "__main__":
+    main("--executar" in sys.argv[1:])
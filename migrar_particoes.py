@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Divide o ledger de sheet1 em uma aba por mês ("AAAA-MM").
+#
+# Uso:
+#   python migrar_particoes.py             -> só mostra quantas linhas vão para cada partição
+#   python migrar_particoes.py --executar  -> cria as abas e copia as linhas
+#
+# Rode antes de ligar LEDGER_PARTICIONADO=1. A cópia é retomável: partições que já
+# têm todas as linhas são puladas e as incompletas continuam de onde pararam.
+# sheet1 não é alterada; o espelho local é refeito sozinho ao trocar de modo.
+
+import sys
+import logging
+from ledger import COLUNAS_PLANILHA, com_colunas_tipadas
+from particoes import FonteUnica, FonteParticionada, particao_da_linha
+from servicos import planilha, timezone_brasilia
+from sheets import governador_sheets
+
+logger = logging.getLogger()
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+LOTE = 500
+
+
+def ler_sheet1():
+    # Só as colunas do ledger, localizadas pelo cabeçalho; as colunas tipadas que
+    # ainda estiverem vazias em sheet1 são calculadas aqui
+    fonte = FonteUnica(planilha)
+    grupos = {}
+    linhas = [linha for linha in fonte.ler([(fonte.sheet.title, 2)], COLUNAS_PLANILHA)[0] if any(linha)]
+    for linha in com_colunas_tipadas(linhas):
+        grupos.setdefault(particao_da_linha(linha), []).append(linha)
+    return grupos
+
+
+def main(executar):
+    grupos = ler_sheet1()
+    fonte = FonteParticionada(planilha, timezone_brasilia)
+    for titulo in sorted(grupos):
+        lote = grupos[titulo]
+        aba = fonte.aba(titulo)
+        existentes = len(governador_sheets.ler(aba.get_values, "A2:A")) if aba is not None else 0
+        pendentes = lote[existentes:]
+        logger.info(f"{titulo}: {len(lote)} linhas ({existentes} já migradas)")
+        if not executar or not pendentes:
+            continue
+        aba = fonte.aba(titulo, criar=True)
+        for i in range(0, len(pendentes), LOTE):
+            governador_sheets.escrever(aba.append_rows, pendentes[i:i + LOTE])
+    if not executar:
+        logger.info("Nada foi gravado. Use --executar para criar as partições.")
+
+
+if __name__ == "__main__":
+    main("--executar" in sys.argv[1:])
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Orçamento mensal por categoria com alertas (80% e 100% por padrão).
+#
+# Os totais do mês por (mês, categoria, responsável) ficam num SQLite pequeno
+# compartilhado pelos workers: cada despesa registrada soma seu valor com um
+# UPSERT (O(1)), inclusive as parcelas futuras, que caem no mês delas. O alerta
+# sai quando a soma cruza um limiar, na mesma transação: dois workers nunca
+# avisam o mesmo cruzamento. Edições à mão na planilha e falhas de gravação são
+# corrigidas pela reconciliação noturna (tarefas.py), que refaz os totais a
+# partir dos rollups do ledger.
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from ledger import valores_tipados
+
+logger = logging.getLogger()
+
+ORCAMENTO_DB = os.environ.get("ORCAMENTO_DB", "orcamento.db")
+# Frações do limite que disparam alerta
+ORCAMENTO_ALERTAS = sorted(float(x) for x in os.environ.get("ORCAMENTO_ALERTAS", "0.8,1.0").split(","))
+
+
+class ControleOrcamento:
+    def __init__(self, caminho=ORCAMENTO_DB, limiares=ORCAMENTO_ALERTAS):
+        self.limiares = limiares
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(caminho, check_same_thread=False, timeout=30, isolation_level=None)
+        self.alertas = 0
+        self.registros = 0
+        self.ajustes = 0
+        with self.lock:
+            if caminho != ":memory:":
+                self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS limites (categoria TEXT PRIMARY KEY, centavos INTEGER)")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS totais ("
+                " mes TEXT, categoria TEXT, responsavel TEXT, centavos INTEGER,"
+                " PRIMARY KEY (mes, categoria, responsavel))"
+            )
+            self.conn.execute("CREATE TABLE IF NOT EXISTS estado (chave TEXT PRIMARY KEY, valor TEXT)")
+
+    # ---------- limites ----------
+    def definir_limite(self, categoria, valor):
+        # valor 0 remove o limite da categoria
+        with self.lock:
+            if valor > 0:
+                self.conn.execute("INSERT OR REPLACE INTO limites (categoria, centavos) VALUES (?, ?)",
+                                  (categoria, round(valor * 100)))
+            else:
+                self.conn.execute("DELETE FROM limites WHERE categoria = ?", (categoria,))
+
+    def limites(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT categoria, centavos FROM limites").fetchall()
+        return {categoria: centavos / 100 for categoria, centavos in rows}
+
+    # ---------- totais ----------
+    def registrar(self, linhas):
+        # Soma as linhas gravadas (mesmo formato da planilha, com ou sem as colunas
+        # tipadas) aos totais do mês.
+        # Retorna os alertas: [{"mes", "categoria", "limiar", "total", "limite"}]
+        somas = {}
+        for linha in linhas:
+            centavos, data_iso = valores_tipados(linha)
+            if data_iso:
+                chave = (data_iso[:7], linha[1], linha[3].upper())
+                somas[chave] = somas.get(chave, 0) + centavos
+        alertas = []
+        try:
+            with self.lock:
+                self.conn.execute("BEGIN IMMEDIATE")
+                try:
+                    acrescimos = {}
+                    for (mes, categoria, responsavel), centavos in somas.items():
+                        self.conn.execute(
+                            "INSERT INTO totais (mes, categoria, responsavel, centavos) VALUES (?, ?, ?, ?)"
+                            " ON CONFLICT (mes, categoria, responsavel) DO UPDATE SET centavos = centavos + excluded.centavos",
+                            (mes, categoria, responsavel, centavos),
+                        )
+                        acrescimos[(mes, categoria)] = acrescimos.get((mes, categoria), 0) + centavos
+                    for (mes, categoria), centavos in sorted(acrescimos.items()):
+                        alerta = self._cruzamento(mes, categoria, centavos)
+                        if alerta:
+                            alertas.append(alerta)
+                    self.conn.execute("COMMIT")
+                except Exception:
+                    self.conn.execute("ROLLBACK")
+                    raise
+                self.registros += len(linhas)
+                self.alertas += len(alertas)
+        except sqlite3.Error as e:
+            # A despesa já foi gravada; a reconciliação noturna corrige os totais
+            logger.error(f"Erro ao atualizar os totais do orçamento: {e}")
+        return alertas
+
+    def _cruzamento(self, mes, categoria, acrescimo):
+        row = self.conn.execute("SELECT centavos FROM limites WHERE categoria = ?", (categoria,)).fetchone()
+        if not row:
+            return None
+        limite = row[0]
+        total = self.conn.execute("SELECT SUM(centavos) FROM totais WHERE mes = ? AND categoria = ?",
+                                  (mes, categoria)).fetchone()[0]
+        anterior = total - acrescimo
+        # Só o maior limiar cruzado por este registro
+        cruzados = [l for l in self.limiares if anterior < l * limite <= total]
+        if not cruzados:
+            return None
+        return {"mes": mes, "categoria": categoria, "limiar": cruzados[-1], "total": total / 100, "limite": limite / 100}
+
+    def situacao(self, mes):
+        # {categoria: {"limite": float ou None, "total": float, "responsaveis": {nome: float}}}
+        with self.lock:
+            limites = dict(self.conn.execute("SELECT categoria, centavos FROM limites").fetchall())
+            rows = self.conn.execute("SELECT categoria, responsavel, centavos FROM totais WHERE mes = ?",
+                                     (mes,)).fetchall()
+        situacao = {c: {"limite": v / 100, "total": 0.0, "responsaveis": {}} for c, v in limites.items()}
+        for categoria, responsavel, centavos in rows:
+            item = situacao.setdefault(categoria, {"limite": None, "total": 0.0, "responsaveis": {}})
+            item["total"] += centavos / 100
+            item["responsaveis"][responsavel] = item["responsaveis"].get(responsavel, 0.0) + centavos / 100
+        return situacao
+
+    # ---------- reconciliação ----------
+    def reconciliar(self, totais, desde_mes):
+        # Substitui os totais dos meses >= desde_mes ("YYYY-MM") pelos do ledger:
+        # totais = [(mes, categoria, responsavel, centavos)]. Retorna quantos totais mudaram.
+        novos = {}
+        for m, c, r, v in totais:
+            if m >= desde_mes:
+                novos[(m, c, r.upper())] = novos.get((m, c, r.upper()), 0) + v
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                antigos = {(m, c, r): v for m, c, r, v in self.conn.execute(
+                    "SELECT mes, categoria, responsavel, centavos FROM totais WHERE mes >= ?", (desde_mes,))}
+                ajustes = sum(1 for k in antigos.keys() | novos.keys() if antigos.get(k, 0) != novos.get(k, 0))
+                self.conn.execute("DELETE FROM totais WHERE mes >= ?", (desde_mes,))
+                self.conn.executemany(
+                    "INSERT INTO totais (mes, categoria, responsavel, centavos) VALUES (?, ?, ?, ?)",
+                    [(*k, v) for k, v in novos.items()],
+                )
+                self.conn.execute("INSERT OR REPLACE INTO estado (chave, valor) VALUES ('reconciliado', ?)",
+                                  (str(time.time()),))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.ajustes += ajustes
+        return ajustes
+
+    def reconciliado(self):
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM estado WHERE chave = 'reconciliado'").fetchone() is not None
+
+    def estatisticas(self):
+        with self.lock:
+            return {"registros": self.registros, "alertas": self.alertas, "ajustes_reconciliacao": self.ajustes}
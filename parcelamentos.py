@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Compras parceladas ("Larissa, geladeira, 2400, 12x") guardadas como um único
+# plano na aba "Parcelamentos" (data inicial, valor da parcela, número de
+# parcelas) em vez de N linhas no ledger. As parcelas só existem na consulta:
+# cada resumo pede as do seu período (CarteiraParcelamentos.projetar) e cada
+# plano calcula direto quais índices caem nele, sem percorrer os demais.
+# Cancelar um parcelamento grava a data do cancelamento no plano: parcelas até
+# essa data continuam valendo, as seguintes somem.
+
+import os
+import time
+import uuid
+import logging
+import calendar
+import threading
+from datetime import date, timedelta
+from ledger import parse_valor, parse_data, formatar_valor, linha_do_range, LEDGER_SYNC_INTERVALO
+from classificador import normalizar
+from sheets import governador_sheets, VooUnico
+
+logger = logging.getLogger()
+
+ABA_PARCELAMENTOS = os.environ.get("ABA_PARCELAMENTOS", "Parcelamentos")
+COLUNAS_PARCELAMENTOS = ["ID", "Data Inicial", "Categoria", "Descrição", "Responsável",
+                         "Valor da Parcela", "Parcelas", "Cancelado em"]
+
+
+def somar_meses(data, meses):
+    # Mesmo dia `meses` meses depois (31/01 + 1 -> 28/02 ou 29/02)
+    mes = data.month - 1 + meses
+    ano, mes = data.year + mes // 12, mes % 12 + 1
+    return date(ano, mes, min(data.day, calendar.monthrange(ano, mes)[1]))
+
+def meses_entre(inicio, fim):
+    return (fim.year - inicio.year) * 12 + fim.month - inicio.month
+
+
+class Parcelamento:
+    def __init__(self, id, inicio, categoria, descricao, responsavel, centavos, parcelas,
+                 cancelado_em=None, linha=None):
+        self.id = id
+        self.inicio = inicio
+        self.categoria = categoria
+        self.descricao = descricao
+        self.responsavel = responsavel.upper()
+        self.centavos = centavos  # valor de cada parcela
+        self.parcelas = parcelas
+        self.cancelado_em = cancelado_em
+        self.linha = linha  # linha na aba Parcelamentos
+        # Parcelas que valem: todas, ou até a data do cancelamento
+        self.efetivas = parcelas
+        if cancelado_em:
+            self.efetivas = max(0, min(parcelas, self._indice_ate(cancelado_em) + 1))
+
+    def _indice_ate(self, data):
+        # Índice da última parcela com data <= `data` (-1 se nenhuma)
+        i = meses_entre(self.inicio, data)
+        if i >= 0 and somar_meses(self.inicio, i) > data:
+            i -= 1
+        return i
+
+    def datas(self, inicio=None, fim=None):
+        # [(índice, data)] das parcelas em [inicio, fim] (None = sem limite)
+        i0 = 0
+        if inicio:
+            i0 = max(0, self._indice_ate(inicio))
+            if i0 < self.efetivas and somar_meses(self.inicio, i0) < inicio:
+                i0 += 1
+        i1 = self.efetivas - 1
+        if fim:
+            i1 = min(i1, self._indice_ate(fim))
+        return [(i, somar_meses(self.inicio, i)) for i in range(i0, i1 + 1)]
+
+    def linhas(self, inicio=None, fim=None):
+        # Parcelas no formato das linhas do ledger (Data, Categoria, Descrição, Responsável, Valor)
+        return [
+            [data.strftime("%d/%m/%Y"), self.categoria, f"{self.descricao} [{i + 1}/{self.parcelas}]",
+             self.responsavel, formatar_valor(self.centavos / 100)]
+            for i, data in self.datas(inicio, fim)
+        ]
+
+    def linha_planilha(self):
+        return [self.id, self.inicio.strftime("%d/%m/%Y"), self.categoria, self.descricao, self.responsavel,
+                formatar_valor(self.centavos / 100), self.parcelas,
+                self.cancelado_em.strftime("%d/%m/%Y") if self.cancelado_em else ""]
+
+    @classmethod
+    def da_planilha(cls, valores, linha):
+        valores = list(valores) + [""] * (len(COLUNAS_PARCELAMENTOS) - len(valores))
+        id, inicio, categoria, descricao, responsavel, valor, parcelas, cancelado = valores[:8]
+        inicio = parse_data(str(inicio).strip())
+        if not id or not inicio or not str(parcelas).strip().isdigit():
+            return None
+        return cls(str(id), inicio, categoria, descricao, responsavel, round(parse_valor(valor) * 100),
+                   int(parcelas), parse_data(str(cancelado).strip()), linha)
+
+
+class CarteiraParcelamentos:
+    def __init__(self, planilha, governador=governador_sheets, intervalo=LEDGER_SYNC_INTERVALO):
+        self.planilha = planilha
+        self.governador = governador
+        self.intervalo = intervalo
+        self.lock = threading.Lock()
+        self.planos = []
+        self.ultima_sync = 0.0
+        self._aba = None
+        self._voo = VooUnico()
+
+    # ---------- planilha ----------
+    def aba(self, criar=False):
+        if self._aba is None:
+            abas = {ws.title: ws for ws in self.governador.ler(self.planilha.worksheets)}
+            self._aba = abas.get(ABA_PARCELAMENTOS)
+            if self._aba is None and criar:
+                ws = self.governador.escrever(self.planilha.add_worksheet, title=ABA_PARCELAMENTOS,
+                                              rows=100, cols=len(COLUNAS_PARCELAMENTOS))
+                self.governador.escrever(ws.append_row, COLUNAS_PARCELAMENTOS)
+                self._aba = ws
+                logger.info(f"Aba {ABA_PARCELAMENTOS} criada")
+        return self._aba
+
+    def sincronizar(self, forcar=False):
+        # Relê a aba inteira (um plano por compra: poucas linhas), no máximo a cada `intervalo`
+        if not forcar and time.monotonic() - self.ultima_sync < self.intervalo:
+            return len(self.planos)
+        return self._voo.executar("parcelamentos", self._carregar)
+
+    def _carregar(self):
+        aba = self.aba()
+        valores = self.governador.ler(aba.get_values) if aba else []
+        planos = []
+        for i, linha in enumerate(valores[1:], start=2):
+            plano = Parcelamento.da_planilha(linha, i)
+            if plano:
+                planos.append(plano)
+            elif any(str(v).strip() for v in linha):
+                logger.warning(f"Parcelamento inválido na linha {i} da aba {ABA_PARCELAMENTOS}: {linha}")
+        with self.lock:
+            self.planos = planos
+            self.ultima_sync = time.monotonic()
+        return len(planos)
+
+    def adicionar(self, inicio, categoria, descricao, responsavel, valor_parcela, parcelas):
+        plano = Parcelamento(uuid.uuid4().hex[:6], inicio, categoria, descricao, responsavel,
+                             round(valor_parcela * 100), parcelas)
+        with self.lock:
+            aba = self.aba(criar=True)
+        resposta = self.governador.escrever(aba.append_rows, [plano.linha_planilha()])
+        plano.linha = linha_do_range((resposta or {}).get("updates", {}).get("updatedRange"))
+        with self.lock:
+            self.planos.append(plano)
+        return plano
+
+    def cancelar(self, plano, data):
+        # Parcelas depois de `data` deixam de existir; retorna o plano atualizado,
+        # ou None se o plano não está mais na planilha (linha apagada à mão)
+        if plano.linha is None:
+            self._carregar()
+            plano = next((p for p in self.planos if p.id == plano.id), None)
+            if plano is None:
+                return None
+        cancelado = Parcelamento(plano.id, plano.inicio, plano.categoria, plano.descricao, plano.responsavel,
+                                 plano.centavos, plano.parcelas, data, plano.linha)
+        self.governador.escrever(self.aba().update_cell, plano.linha, COLUNAS_PARCELAMENTOS.index("Cancelado em") + 1,
+                                 data.strftime("%d/%m/%Y"), idempotente=True)
+        with self.lock:
+            self.planos = [cancelado if p.id == plano.id else p for p in self.planos]
+        return cancelado
+
+    # ---------- consultas ----------
+    def _filtrados(self, responsavel=None, categoria=None):
+        with self.lock:
+            planos = list(self.planos)
+        return [p for p in planos
+                if (not responsavel or p.responsavel == responsavel.upper())
+                and (not categoria or p.categoria == categoria)]
+
+    def projetar(self, inicio=None, fim=None, responsavel=None, categoria=None):
+        # [(data, categoria, responsável, centavos)] das parcelas no período
+        return [(data, p.categoria, p.responsavel, p.centavos)
+                for p in self._filtrados(responsavel, categoria)
+                for _, data in p.datas(inicio, fim)]
+
+    def linhas(self, inicio=None, fim=None):
+        return [linha for p in self._filtrados() for linha in p.linhas(inicio, fim)]
+
+    def totais_mensais(self, desde):
+        # Mesmo formato de LedgerLocal.totais_mensais: [(mês "YYYY-MM", categoria, responsável, centavos)]
+        totais = {}
+        for data, categoria, responsavel, centavos in self.projetar(desde):
+            chave = (data.strftime("%Y-%m"), categoria, responsavel)
+            totais[chave] = totais.get(chave, 0) + centavos
+        return [(*chave, centavos) for chave, centavos in totais.items()]
+
+    def ativos(self, hoje):
+        # Planos com parcelas depois de hoje: [(plano, parcelas restantes)]
+        amanha = hoje + timedelta(days=1)
+        restantes = [(p, len(p.datas(amanha))) for p in self._filtrados()]
+        return [(p, n) for p, n in restantes if n]
+
+    def buscar(self, texto, hoje):
+        # Parcelamentos ativos pelo ID ou por parte da descrição
+        alvo = normalizar(texto).strip()
+        ativos = [p for p, _ in self.ativos(hoje)]
+        por_id = [p for p in ativos if p.id == alvo]
+        return por_id or [p for p in ativos if alvo and alvo in normalizar(p.descricao)]
+
+    def responsaveis(self):
+        return sorted({p.responsavel for p in self._filtrados()})
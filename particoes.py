@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Onde o ledger fica na planilha. Duas fontes com a mesma interface:
+#   FonteUnica        -> tudo em spreadsheet.sheet1 (formato original)
+#   FonteParticionada -> uma aba por mês ("AAAA-MM"), escolhida pela data de
+#                        cada linha (inclusive parcelas futuras). Meses que já
+#                        acabaram são imutáveis: lidos uma última vez e depois
+#                        servidos só pelo espelho local.
+# Interface usada pelo LedgerLocal:
+#   abas()                -> abas que compõem o ledger
+#   ler(pedidos, colunas) -> [(aba, primeira_linha)] -> uma lista de linhas por pedido,
+#                            só com as colunas pedidas (padrão: ledger.COLUNAS), nessa ordem
+#   fechada(aba)          -> True se a aba não recebe mais linhas
+#   gravar(linhas)        -> [(aba, resposta do append, linhas gravadas)]; as linhas chegam
+#                            em ledger.COLUNAS e são gravadas (e devolvidas) com as
+#                            colunas tipadas (ledger.COLUNAS_PLANILHA)
+#   agrupar(linhas)       -> as linhas separadas nos lotes que gravar() faz em um append
+#                            cada, na mesma ordem (o journal grava e confirma lote a lote)
+#   recarregar()          -> esquece abas/cabeçalhos guardados (após edições manuais)
+# Toda chamada à API passa pelo governador de cotas (sheets.py).
+
+import os
+import re
+import time
+import logging
+import threading
+from datetime import datetime
+from ledger import (COLUNAS, COLUNAS_TIPADAS, COLUNAS_PLANILHA, LEDGER_SYNC_INTERVALO, com_colunas_tipadas,
+                    valores_tipados, letra_coluna)
+from sheets import governador_sheets
+
+logger = logging.getLogger()
+
+LEDGER_PARTICIONADO = os.environ.get("LEDGER_PARTICIONADO", "0") == "1"
+# Aba das linhas cuja data não pôde ser lida na migração
+ABA_SEM_DATA = "sem-data"
+PADRAO_PARTICAO = re.compile(r"^\d{4}-\d{2}$")
+
+
+def nome_particao(data):
+    return f"{data.year:04d}-{data.month:02d}"
+
+def particao_da_linha(linha):
+    _, data_iso = valores_tipados(linha)
+    return data_iso[:7] if data_iso else ABA_SEM_DATA
+
+
+def faixas_contiguas(posicoes):
+    # [0, 1, 2, 3, 4, 7] -> [(0, 4), (7, 7)]: uma faixa de células por bloco de colunas vizinhas
+    faixas = []
+    for p in sorted(set(posicoes)):
+        if faixas and p == faixas[-1][1] + 1:
+            faixas[-1] = (faixas[-1][0], p)
+        else:
+            faixas.append((p, p))
+    return faixas
+
+def ler_colunas(planilha, pedidos, posicoes, governador=governador_sheets):
+    # Lê só as colunas nas `posicoes` (índice 0 na aba; None = coluna inexistente)
+    # de todos os pedidos [(aba, primeira_linha)] em uma única chamada values_batch_get.
+    if not pedidos:
+        return []
+    faixas = faixas_contiguas(p for p in posicoes if p is not None)
+    if not faixas:
+        return [[] for _ in pedidos]
+    intervalos = [
+        f"'{aba}'!{letra_coluna(a + 1)}{inicio}:{letra_coluna(b + 1)}"
+        for aba, inicio in pedidos for a, b in faixas
+    ]
+    resposta = governador.ler(planilha.values_batch_get, intervalos)
+    blocos = [faixa.get("values", []) for faixa in resposta.get("valueRanges", [])]
+    resultado = []
+    for k in range(len(pedidos)):
+        blocos_pedido = blocos[k * len(faixas):(k + 1) * len(faixas)]
+        # A API corta linhas e células vazias no fim de cada faixa
+        total = max((len(bloco) for bloco in blocos_pedido), default=0)
+        linhas = []
+        for i in range(total):
+            celulas = {}
+            for (a, b), bloco in zip(faixas, blocos_pedido):
+                linha = bloco[i] if i < len(bloco) else []
+                for j in range(a, b + 1):
+                    celulas[j] = linha[j - a] if j - a < len(linha) else ""
+            linhas.append([str(celulas[p]).strip() if p is not None else "" for p in posicoes])
+        resultado.append(linhas)
+    return resultado
+
+
+class FonteUnica:
+    def __init__(self, planilha, governador=governador_sheets, intervalo=LEDGER_SYNC_INTERVALO):
+        self.planilha = planilha
+        self.governador = governador
+        self.intervalo = intervalo
+        self.lock = threading.Lock()
+        self._sheet = None
+        self._cabecalho = None
+        self._cabecalho_lido = 0.0
+
+    @property
+    def sheet(self):
+        # planilha.sheet1 consulta os metadados na API: guardado após o primeiro uso
+        if self._sheet is None:
+            self._sheet = self.governador.ler(lambda: self.planilha.sheet1)
+        return self._sheet
+
+    def cabecalho(self):
+        # Relido no máximo a cada `intervalo` (o da sincronização do ledger): colunas tipadas
+        # criadas por migrar_colunas_tipadas.py chegam a todos os workers, não só a quem
+        # recebeu "ressincronizar"
+        with self.lock:
+            if self._cabecalho is None or time.monotonic() - self._cabecalho_lido >= self.intervalo:
+                self._cabecalho = self.governador.ler(self.sheet.row_values, 1)
+                self._cabecalho_lido = time.monotonic()
+            return self._cabecalho
+
+    def recarregar(self):
+        with self.lock:
+            self._sheet = None
+            self._cabecalho = None
+
+    def abas(self):
+        return [self.sheet.title]
+
+    def ler(self, pedidos, colunas=COLUNAS):
+        # Colunas localizadas pelo cabeçalho (a aba original pode ter outra ordem e
+        # colunas extras, que não são baixadas)
+        cabecalho = self.cabecalho()
+        posicoes = [cabecalho.index(c) if c in cabecalho else None for c in colunas]
+        return ler_colunas(self.planilha, pedidos, posicoes, self.governador)
+
+    def fechada(self, aba):
+        return False
+
+    def agrupar(self, linhas):
+        return [list(linhas)] if linhas else []
+
+    def gravar(self, linhas):
+        # As colunas tipadas vão para onde o cabeçalho as tiver (migrar_colunas_tipadas.py
+        # as cria); antes disso, só as colunas de sempre são gravadas
+        linhas = com_colunas_tipadas(linhas)
+        cabecalho = self.cabecalho()
+        posicoes = {c: cabecalho.index(c) for c in COLUNAS_TIPADAS if c in cabecalho[len(COLUNAS):]}
+        largura = max(posicoes.values(), default=len(COLUNAS) - 1) + 1
+        gravadas = []
+        for linha in linhas:
+            celulas = linha[:len(COLUNAS)] + [""] * (largura - len(COLUNAS))
+            for c, valor in zip(COLUNAS_TIPADAS, linha[len(COLUNAS):]):
+                if c in posicoes:
+                    celulas[posicoes[c]] = valor
+            gravadas.append(celulas)
+        return [(self.sheet.title, self.governador.escrever(self.sheet.append_rows, gravadas), linhas)]
+
+
+class FonteParticionada:
+    def __init__(self, planilha, fuso, governador=governador_sheets):
+        self.planilha = planilha
+        self.fuso = fuso
+        self.governador = governador
+        self.lock = threading.Lock()
+        self._abas = None
+
+    def _carregar_abas(self):
+        self._abas = {ws.title: ws for ws in self.governador.ler(self.planilha.worksheets)}
+
+    def recarregar(self):
+        with self.lock:
+            self._abas = None
+
+    def abas(self):
+        with self.lock:
+            self._carregar_abas()  # novas partições podem ter sido criadas por outro processo
+            return sorted(t for t in self._abas if PADRAO_PARTICAO.match(t) or t == ABA_SEM_DATA)
+
+    def aba(self, titulo, criar=False):
+        with self.lock:
+            if self._abas is None or titulo not in self._abas:
+                self._carregar_abas()
+            if titulo not in self._abas and criar:
+                try:
+                    ws = self.governador.escrever(
+                        self.planilha.add_worksheet, title=titulo, rows=200, cols=len(COLUNAS_PLANILHA))
+                    self.governador.escrever(ws.append_row, COLUNAS_PLANILHA)
+                    self._abas[titulo] = ws
+                    logger.info(f"Partição criada: {titulo}")
+                except Exception:
+                    # Outro processo pode ter criado a mesma partição ao mesmo tempo
+                    self._carregar_abas()
+                    if titulo not in self._abas:
+                        raise
+            return self._abas.get(titulo)
+
+    def ler(self, pedidos, colunas=COLUNAS):
+        # Uma única chamada para todas as partições pedidas (criadas sempre com ledger.COLUNAS_PLANILHA)
+        posicoes = [COLUNAS_PLANILHA.index(c) if c in COLUNAS_PLANILHA else None for c in colunas]
+        return ler_colunas(self.planilha, pedidos, posicoes, self.governador)
+
+    def fechada(self, aba):
+        return aba == ABA_SEM_DATA or aba < nome_particao(datetime.now(self.fuso))
+
+    def agrupar(self, linhas):
+        # Um lote por partição, na ordem em que aparecem
+        grupos = {}
+        for linha in linhas:
+            grupos.setdefault(particao_da_linha(linha), []).append(linha)
+        return list(grupos.values())
+
+    def gravar(self, linhas):
+        # Um append por partição
+        gravadas = []
+        for grupo in self.agrupar(linhas):
+            lote = com_colunas_tipadas(grupo)
+            titulo = particao_da_linha(lote[0])
+            resposta = self.governador.escrever(self.aba(titulo, criar=True).append_rows, lote)
+            gravadas.append((titulo, resposta, lote))
+        return gravadas
+
+
+def criar_fonte(planilha, fuso):
+    return FonteParticionada(planilha, fuso) if LEDGER_PARTICIONADO else FonteUnica(planilha)
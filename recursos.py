@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import logging
+import threading
+
+logger = logging.getLogger()
+
+
+class RecursoPreguicoso:
+    # Cria o objeto real (planilha, bot...) só no primeiro uso e repassa os
+    # atributos para ele; chamadas concorrentes esperam a mesma criação.
+
+    def __init__(self, nome, fabrica):
+        self._nome = nome
+        self._fabrica = fabrica
+        self._objeto = None
+        self._erro = None
+        self._segundos = None
+        self._lock = threading.Lock()
+
+    def obter(self):
+        if self._objeto is None:
+            with self._lock:
+                if self._objeto is None:
+                    inicio = time.monotonic()
+                    try:
+                        self._objeto = self._fabrica()
+                        self._erro = None
+                    except Exception as e:
+                        self._erro = str(e)
+                        raise
+                    self._segundos = time.monotonic() - inicio
+                    logger.info(f"Recurso '{self._nome}' pronto em {self._segundos:.2f}s")
+        return self._objeto
+
+    def pronto(self):
+        return self._objeto is not None
+
+    def definir(self, objeto):
+        # Substitui o objeto real (ex.: fakes em benchmarks)
+        with self._lock:
+            self._objeto = objeto
+            self._erro = None
+
+    def estado(self):
+        return {"pronto": self.pronto(), "segundos": self._segundos, "erro": self._erro}
+
+    def __getattr__(self, nome):
+        return getattr(self.obter(), nome)
+
+
+def em_segundo_plano(nome, funcao):
+    thread = threading.Thread(target=funcao, name=nome, daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Conexões e dados compartilhados entre o app (webhook) e os jobs agendados.
+
+import os
+import json
+import logging
+from pytz import timezone
+from ledger import LedgerLocal
+from orcamento import ControleOrcamento
+from parcelamentos import CarteiraParcelamentos
+from recursos import RecursoPreguicoso
+from particoes import criar_fonte, LEDGER_PARTICIONADO
+from metricas import ClienteInstrumentado
+from fila import FILA_WORKERS
+from broadcast import BROADCAST_THREADS
+
+logger = logging.getLogger()
+
+timezone_brasilia = timezone("America/Sao_Paulo")
+
+# ========== GOOGLE SHEETS ==========
+SHEET_ID = os.environ.get("SHEET_ID", "1vKrmgkMTDwcx5qufF-YRvsXSk99J1Vq9-LwuQINwcl8")
+
+def conectar_planilha():
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
+    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+    json_creds = os.environ.get("GOOGLE_CREDS_JSON")
+    if not json_creds:
+        raise Exception("A variável de ambiente GOOGLE_CREDS_JSON não está definida!")
+    creds_dict = json.loads(json_creds)
+    creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
+    gc = gspread.authorize(creds)
+    try:
+        # Chamadas à planilha e às abas contadas/cronometradas em /metrics
+        return ClienteInstrumentado(gc.open_by_key(SHEET_ID), "sheets", embrulhar=("Worksheet",))
+    except Exception as e:
+        logger.critical(f"Erro ao conectar com a planilha: {e}")
+        raise
+
+# Conexão feita no primeiro uso (ou pela inicialização em segundo plano)
+planilha = RecursoPreguicoso("planilha", conectar_planilha)
+
+# Onde o ledger está na planilha: sheet1 ou uma aba por mês (LEDGER_PARTICIONADO=1)
+fonte_ledger = criar_fonte(planilha, timezone_brasilia)
+
+# Compras parceladas: um plano por compra na aba Parcelamentos, parcelas projetadas nas consultas
+parcelamentos = CarteiraParcelamentos(planilha)
+
+# Espelho local da planilha (o arquivo SQLite é compartilhado entre processos)
+ledger_local = LedgerLocal(modo="particionado" if LEDGER_PARTICIONADO else "unica", parcelamentos=parcelamentos)
+
+def sincronizar_ledger(forcar=False):
+    parcelamentos.sincronizar(forcar)
+    return ledger_local.sincronizar(fonte_ledger, forcar)
+
+def ressincronizar_ledger():
+    parcelamentos.sincronizar(forcar=True)
+    return ledger_local.ressincronizar(fonte_ledger)
+
+# Totais do mês por categoria para os alertas de orçamento (SQLite compartilhado)
+orcamento = ControleOrcamento()
+
+# ========== TELEGRAM ==========
+telegram_token = os.environ.get("TELEGRAM_TOKEN")
+# Conexões keep-alive com a API do Telegram: uma por thread que envia (workers
+# da fila + threads do broadcast), para ninguém esperar por conexão livre
+TELEGRAM_CONEXOES = int(os.environ.get("TELEGRAM_CONEXOES", FILA_WORKERS + BROADCAST_THREADS))
+TELEGRAM_TIMEOUT = float(os.environ.get("TELEGRAM_TIMEOUT", 10))
+
+def criar_bot():
+    import telegram
+    from telegram.utils.request import Request
+    if not telegram_token:
+        raise Exception("A variável de ambiente TELEGRAM_TOKEN não está definida!")
+    sessao = Request(con_pool_size=TELEGRAM_CONEXOES, connect_timeout=TELEGRAM_TIMEOUT,
+                     read_timeout=TELEGRAM_TIMEOUT)
+    return ClienteInstrumentado(telegram.Bot(token=telegram_token, request=sessao), "telegram")
+
+bot = RecursoPreguicoso("bot", criar_bot)
+
+contatos = [
+    {"nome": "Larissa", "chat_id": int(os.environ.get("LARISSA_CHAT_ID", 0))},
+    {"nome": "Thiago",  "chat_id": int(os.environ.get("THIAGO_CHAT_ID", 0))}
+]
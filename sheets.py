@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Acesso ao Google Sheets dentro das cotas da API:
+#   - GovernadorSheets: token bucket para leituras e outro para escritas (cotas
+#     por minuto do Sheets) e backoff exponencial em 429/5xx/falhas de rede.
+#     Os baldes ficam em SQLite (SHEETS_COTA_DB), compartilhados pelos workers
+#     do gunicorn: a cota é do projeto, não do processo. Um 429 pausa todas as
+#     chamadas de todos os workers, não só a que falhou. Escritas
+#     só são repetidas em 429 (nada foi aplicado), a menos que sejam idempotentes:
+#     um append que deu timeout pode ter sido gravado, e repetir duplicaria linhas
+#   - VooUnico: chamadas simultâneas com a mesma chave esperam e recebem o
+#     resultado de uma única execução (ex.: vários resumos pedindo sync juntos)
+
+import os
+import time
+import random
+import logging
+import threading
+from limitador import BaldeTokens, BaldeCompartilhado
+
+logger = logging.getLogger()
+
+# Cota do Sheets por usuário: 60 leituras e 60 escritas por minuto
+SHEETS_LEITURAS_POR_MINUTO = float(os.environ.get("SHEETS_LEITURAS_POR_MINUTO", 60))
+SHEETS_ESCRITAS_POR_MINUTO = float(os.environ.get("SHEETS_ESCRITAS_POR_MINUTO", 60))
+# Chamadas permitidas em rajada antes de o ritmo por minuto valer
+SHEETS_RAJADA = float(os.environ.get("SHEETS_RAJADA", 10))
+SHEETS_TENTATIVAS = int(os.environ.get("SHEETS_TENTATIVAS", 5))
+SHEETS_BACKOFF_MAXIMO = float(os.environ.get("SHEETS_BACKOFF_MAXIMO", 64))
+# Estado dos baldes compartilhado pelos workers; vazio = baldes só do processo
+SHEETS_COTA_DB = os.environ.get("SHEETS_COTA_DB", "sheets_cota.db")
+
+
+def status_http(erro):
+    # gspread.exceptions.APIError guarda a resposta HTTP em .response
+    return getattr(getattr(erro, "response", None), "status_code", None)
+
+def erro_temporario(erro, idempotente=True):
+    # Vale repetir a chamada? Sem idempotência, só o 429 garante que nada foi aplicado
+    status = status_http(erro)
+    if status == 429:
+        return True
+    if not idempotente:
+        return False
+    if status is not None:
+        return status >= 500
+    try:
+        import requests
+    except ImportError:
+        return False
+    return isinstance(erro, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+
+class GovernadorSheets:
+    def __init__(self, leituras_por_minuto=SHEETS_LEITURAS_POR_MINUTO,
+                 escritas_por_minuto=SHEETS_ESCRITAS_POR_MINUTO, rajada=SHEETS_RAJADA,
+                 tentativas=SHEETS_TENTATIVAS, caminho=SHEETS_COTA_DB):
+        if caminho:
+            self.balde_leituras = BaldeCompartilhado(caminho, "sheets_leituras", leituras_por_minuto / 60.0, rajada)
+            self.balde_escritas = BaldeCompartilhado(caminho, "sheets_escritas", escritas_por_minuto / 60.0, rajada)
+        else:
+            self.balde_leituras = BaldeTokens(leituras_por_minuto / 60.0, capacidade=rajada)
+            self.balde_escritas = BaldeTokens(escritas_por_minuto / 60.0, capacidade=rajada)
+        self.tentativas = tentativas
+        self.lock = threading.Lock()
+        self.contagem = {"leituras": 0, "escritas": 0, "repeticoes": 0, "erros_429": 0,
+                         "falhas": 0, "espera_segundos": 0.0}
+
+    def _contar(self, chave, n=1):
+        with self.lock:
+            self.contagem[chave] += n
+
+    def ler(self, funcao, *args, **kwargs):
+        return self._chamar(self.balde_leituras, "leituras", funcao, args, kwargs)
+
+    def escrever(self, funcao, *args, idempotente=False, **kwargs):
+        # idempotente=True: repetir não muda o resultado (ex.: gravar valores fixos em
+        # células); também é repetida em 5xx e falhas de rede
+        return self._chamar(self.balde_escritas, "escritas", funcao, args, kwargs, idempotente)
+
+    def _chamar(self, balde, tipo, funcao, args, kwargs, idempotente=True):
+        for tentativa in range(1, self.tentativas + 1):
+            self._contar("espera_segundos", balde.consumir())
+            self._contar(tipo)
+            try:
+                return funcao(*args, **kwargs)
+            except Exception as e:
+                if not erro_temporario(e, idempotente) or tentativa == self.tentativas:
+                    self._contar("falhas")
+                    raise
+                espera = min(2 ** tentativa, SHEETS_BACKOFF_MAXIMO) + random.random()
+                self._contar("repeticoes")
+                if status_http(e) == 429:
+                    # Cota estourada: nenhum worker chama a API antes de `espera`
+                    self._contar("erros_429")
+                    self.balde_leituras.pausar(espera)
+                    self.balde_escritas.pausar(espera)
+                else:
+                    time.sleep(espera)
+                logger.warning(f"Sheets: {getattr(funcao, '__name__', funcao)} falhou ({e}); "
+                               f"tentativa {tentativa + 1} em {espera:.1f}s")
+
+    def estatisticas(self):
+        with self.lock:
+            return dict(self.contagem)
+
+
+class VooUnico:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.em_voo = {}  # chave -> [evento, resultado, erro]
+        self.compartilhadas = 0
+
+    def executar(self, chave, funcao, *args, **kwargs):
+        with self.lock:
+            voo = self.em_voo.get(chave)
+            lider = voo is None
+            if lider:
+                voo = self.em_voo[chave] = [threading.Event(), None, None]
+            else:
+                self.compartilhadas += 1
+        if not lider:
+            voo[0].wait()
+            if voo[2] is not None:
+                raise voo[2]
+            return voo[1]
+        try:
+            voo[1] = funcao(*args, **kwargs)
+            return voo[1]
+        except Exception as e:
+            voo[2] = e
+            raise
+        finally:
+            with self.lock:
+                del self.em_voo[chave]
+            voo[0].set()
+
+
+# Compartilhado por todas as fontes do processo: as cotas são da conta, não da aba
+governador_sheets = GovernadorSheets()
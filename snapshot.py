@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Snapshot binário dos rollups do ledger, compartilhado pelos workers via mmap.
+#
+# Cada worker do gunicorn montava sua própria cópia em numpy (LedgerColunar +
+# IndicePrefixos) a partir do SQLite. Agora um processo grava o arquivo (troca
+# atômica com os.replace, sob trava de arquivo: um escritor por vez) e todos o
+# mapeiam só para leitura: os arrays são views sobre as mesmas páginas do cache
+# do sistema, sem cópia. O arquivo traz a versão (época, geração) do SQLite de
+# onde saiu; quando a geração do ledger muda, quem pedir o próximo resumo regrava
+# e os demais remapeiam. Um worker novo só mapeia o arquivo existente.
+#
+# Formato (little-endian, seções alinhadas em 8 bytes):
+#   cabeçalho (64 bytes) -> CABECALHO
+#   registros            -> n x REGISTRO (32 bytes): dia, categoria, responsável, centavos, qtd
+#   dias do índice       -> d x int32
+#   somas, qtds          -> (d + 1) x (categorias x responsáveis) x int64 (IndicePrefixos)
+#   tabela de strings    -> categorias e responsáveis: uint16 tamanho + UTF-8
+
+import os
+import mmap
+import fcntl
+import struct
+import logging
+import threading
+import numpy as np
+from colunar import LedgerColunar, IndicePrefixos
+
+logger = logging.getLogger()
+
+MAGICO = b"LSNP"
+FORMATO = 1
+# mágico, formato, época, geração, registros, categorias, responsáveis, dias do índice
+CABECALHO = struct.Struct("<4sIQQQIIQ")
+TAMANHO_CABECALHO = 64
+REGISTRO = np.dtype([
+    ("dia", "<i4"), ("categoria", "<i4"), ("responsavel", "<i4"), ("reservado", "<i4"),
+    ("centavos", "<i8"), ("qtd", "<i8"),
+])
+
+
+def alinhar(posicao):
+    return (posicao + 7) // 8 * 8
+
+
+def serializar(colunar, indice, versao):
+    # bytes do snapshot de (LedgerColunar, IndicePrefixos) na versão (época, geração)
+    epoca, geracao = versao
+    registros = np.zeros(len(colunar), dtype=REGISTRO)
+    registros["dia"] = colunar.dias
+    registros["categoria"] = colunar.cod_categoria
+    registros["responsavel"] = colunar.cod_responsavel
+    registros["centavos"] = colunar.centavos
+    registros["qtd"] = colunar.qtd
+    partes = [
+        CABECALHO.pack(MAGICO, FORMATO, epoca, geracao, len(colunar), len(colunar.categorias),
+                       len(colunar.responsaveis), len(indice.dias)).ljust(TAMANHO_CABECALHO, b"\0"),
+        registros.tobytes(),
+    ]
+    dias = indice.dias.astype("<i4").tobytes()
+    partes.append(dias.ljust(alinhar(len(dias)), b"\0"))
+    partes.append(indice.somas.astype("<i8").tobytes())
+    partes.append(indice.qtds.astype("<i8").tobytes())
+    for texto in list(colunar.categorias) + list(colunar.responsaveis):
+        dados = texto.encode("utf-8")
+        partes.append(struct.pack("<H", len(dados)) + dados)
+    return b"".join(partes)
+
+
+def desserializar(buffer):
+    # (versão, LedgerColunar, IndicePrefixos) com os arrays apontando para `buffer` (sem cópia)
+    magico, formato, epoca, geracao, n, n_cat, n_resp, n_dias = CABECALHO.unpack_from(buffer, 0)
+    if magico != MAGICO or formato != FORMATO:
+        raise ValueError("snapshot em formato desconhecido")
+    posicao = TAMANHO_CABECALHO
+    registros = np.frombuffer(buffer, dtype=REGISTRO, count=n, offset=posicao)
+    posicao += n * REGISTRO.itemsize
+    dias = np.frombuffer(buffer, dtype="<i4", count=n_dias, offset=posicao)
+    posicao += alinhar(n_dias * 4)
+    largura = n_cat * n_resp
+    somas = np.frombuffer(buffer, dtype="<i8", count=(n_dias + 1) * largura, offset=posicao)
+    posicao += somas.nbytes
+    qtds = np.frombuffer(buffer, dtype="<i8", count=(n_dias + 1) * largura, offset=posicao)
+    posicao += qtds.nbytes
+    textos = []
+    for _ in range(n_cat + n_resp):
+        tamanho, = struct.unpack_from("<H", buffer, posicao)
+        textos.append(bytes(buffer[posicao + 2:posicao + 2 + tamanho]).decode("utf-8"))
+        posicao += 2 + tamanho
+    categorias, responsaveis = textos[:n_cat], textos[n_cat:]
+    colunar = LedgerColunar(registros["dia"], registros["centavos"], registros["categoria"],
+                            registros["responsavel"], registros["qtd"], categorias, responsaveis)
+    indice = IndicePrefixos(dias, somas.reshape(n_dias + 1, largura), qtds.reshape(n_dias + 1, largura),
+                            categorias, responsaveis)
+    return (epoca, geracao), colunar, indice
+
+
+def cobre(visao, versao):
+    # O snapshot mapeado serve para quem leu `versao`: mesma época e geração igual ou mais nova
+    return visao is not None and visao[0][0] == versao[0] and visao[0][1] >= versao[1]
+
+
+class SnapshotLedger:
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.lock = threading.Lock()
+        self._identidade = None  # (inode, mtime, tamanho) do arquivo mapeado
+        self._visao = None       # (versão, LedgerColunar, IndicePrefixos)
+        self.escritas = 0
+        self.mapeamentos = 0
+        self.bytes = 0
+
+    def _mapear(self):
+        # Remapeia se o arquivo foi trocado desde o último mapeamento. O mapeamento
+        # anterior não é fechado: consultas em andamento ainda usam os arrays dele,
+        # e ele é liberado junto com o último array.
+        try:
+            estado = os.stat(self.caminho)
+        except FileNotFoundError:
+            return None
+        identidade = (estado.st_ino, estado.st_mtime_ns, estado.st_size)
+        if identidade != self._identidade:
+            try:
+                with open(self.caminho, "rb") as arquivo:
+                    mapa = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+                self._visao = desserializar(mapa)
+            except (OSError, ValueError, struct.error) as e:
+                logger.warning(f"Snapshot do ledger ilegível ({self.caminho}): {e}")
+                self._visao = None
+            self._identidade = identidade
+            self.mapeamentos += 1
+            self.bytes = estado.st_size
+        return self._visao
+
+    def _gravar(self, colunar, indice, versao):
+        temporario = f"{self.caminho}.{os.getpid()}.tmp"
+        with open(temporario, "wb") as arquivo:
+            arquivo.write(serializar(colunar, indice, versao))
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        os.replace(temporario, self.caminho)
+        self.escritas += 1
+
+    def carregar(self, versao, gerar):
+        # (versão, LedgerColunar, IndicePrefixos) do ledger, a partir da versão (época,
+        # geração) que o chamador leu. gerar() -> (versão, LedgerColunar) lidos do SQLite
+        # nessa ordem; só é chamado se o arquivo estiver desatualizado, por um processo
+        # de cada vez.
+        with self.lock:
+            visao = self._mapear()
+            if cobre(visao, versao):
+                return visao
+            with open(f"{self.caminho}.lock", "a") as trava:
+                fcntl.flock(trava, fcntl.LOCK_EX)
+                # Outro processo pode ter gravado esta versão (ou uma mais nova) enquanto esperávamos
+                visao = self._mapear()
+                if cobre(visao, versao):
+                    return visao
+                # A versão gravada é a lida agora, sob a trava, antes dos dados: nunca mais
+                # nova que o conteúdo (no pior caso, o próximo resumo regrava)
+                versao, colunar = gerar()
+                indice = IndicePrefixos.de_colunar(colunar)
+                self._gravar(colunar, indice, versao)
+                visao = self._mapear()
+                if visao is None or visao[0] != versao:
+                    logger.warning(f"Snapshot do ledger gravado mas não mapeado ({self.caminho}); usando cópia local")
+                    return versao, colunar, indice
+                return visao
+
+    def estatisticas(self):
+        with self.lock:
+            versao = self._visao[0] if self._visao else (0, 0)
+            return {"geracao": versao[1], "escritas": self.escritas, "mapeamentos": self.mapeamentos,
+                    "bytes": self.bytes}
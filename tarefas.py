@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Jobs agendados (lembrete e resumo diário) com um único líder por máquina.
+#
+# Todo processo que inicia o executor (cada worker do gunicorn e o scheduler.py)
+# disputa uma trava de arquivo; só quem a obtém agenda e roda os jobs. Se o líder
+# morrer, o sistema libera a trava e outro processo assume na próxima tentativa.
+# A última execução de cada job fica gravada em disco: um novo líder recupera o
+# horário perdido (dentro da tolerância) e nunca repete um horário já executado.
+
+import os
+import json
+import fcntl
+import logging
+import threading
+import traceback
+from datetime import datetime, timedelta
+from ledger import formatar_valor
+from servicos import bot, contatos, ledger_local, orcamento, parcelamentos, timezone_brasilia, sincronizar_ledger
+from broadcast import Transmissor
+
+logger = logging.getLogger()
+
+TAREFAS_LOCK = os.environ.get("TAREFAS_LOCK", "tarefas.lock")
+TAREFAS_ESTADO = os.environ.get("TAREFAS_ESTADO", "tarefas.json")
+# Intervalo (segundos) entre tentativas de assumir a liderança
+TAREFAS_INTERVALO_LIDER = float(os.environ.get("TAREFAS_INTERVALO_LIDER", 60))
+# Até quantas horas depois do horário um job perdido ainda é executado
+TAREFAS_TOLERANCIA_HORAS = float(os.environ.get("TAREFAS_TOLERANCIA_HORAS", 3))
+
+
+# ========== JOBS ==========
+# Envios em paralelo, respeitando os limites do Telegram (ver broadcast.py)
+transmissor = Transmissor(bot)
+
+# Função para enviar o lembrete diário
+def enviar_lembrete_diario():
+    logger.info("Executando função de lembrete diário")
+    data_formatada = datetime.now(timezone_brasilia).strftime("%d/%m/%Y")
+
+    # Mensagem personalizada com a data
+    envios = []
+    for contato in contatos:
+        mensagem = (
+            f"⏰ Olá, {contato['nome']}!\n\n"
+            f"Não se esqueça de registrar suas despesas de hoje ({data_formatada}).\n\n"
+            f"Para registrar uma despesa, envie no formato:\n"
+            f"{contato['nome']}, descrição, valor\n\n"
+            f"Exemplo: {contato['nome']}, supermercado, 50,00"
+        )
+        envios.append({"nome": contato["nome"], "chat_id": contato["chat_id"], "texto": mensagem})
+    return transmissor.transmitir(envios)
+
+# Função para enviar resumo diário
+def enviar_resumo_diario():
+    logger.info("Executando função de resumo diário")
+    hoje = datetime.now(timezone_brasilia)
+    data_formatada = hoje.strftime("%d/%m/%Y")
+
+    try:
+        sincronizar_ledger(forcar=True)
+        # Totais de hoje a partir dos buckets (dia, categoria, responsável)
+        categorias, _, _ = ledger_local.agregar(hoje.date(), hoje.date())
+        total_hoje = sum(categorias.values())
+
+        # Preparar mensagem de resumo
+        if total_hoje > 0:
+            resumo = f"📊 Resumo do dia {data_formatada}:\n\nTotal gasto hoje: {formatar_valor(total_hoje)}\n\n"
+
+            # Adicionar detalhes por categoria
+            if categorias:
+                resumo += "Detalhamento por categoria:\n"
+                for cat, val in sorted(categorias.items(), key=lambda x: x[1], reverse=True):
+                    percentual = (val / total_hoje) * 100
+                    resumo += f"- {cat}: {formatar_valor(val)} ({percentual:.1f}%)\n"
+
+            # Enviar para todos os contatos
+            return transmissor.transmitir([
+                {"nome": contato["nome"], "chat_id": contato["chat_id"], "texto": resumo}
+                for contato in contatos
+            ])
+        else:
+            logger.info("Nenhuma despesa registrada hoje. Resumo não enviado.")
+
+    except Exception as e:
+        logger.error(f"Erro ao gerar resumo diário: {e}")
+        logger.error(traceback.format_exc())
+
+# Refaz os totais do orçamento (mês atual e parcelas futuras) a partir do ledger:
+# corrige edições à mão na planilha, importações e alertas perdidos por falha
+def reconciliar_orcamento():
+    logger.info("Reconciliando os totais do orçamento com o ledger")
+    try:
+        sincronizar_ledger(forcar=True)
+        inicio_mes = datetime.now(timezone_brasilia).date().replace(day=1)
+        totais = ledger_local.totais_mensais(inicio_mes) + parcelamentos.totais_mensais(inicio_mes)
+        ajustes = orcamento.reconciliar(totais, inicio_mes.strftime("%Y-%m"))
+        if ajustes:
+            logger.info(f"Orçamento: {ajustes} totais corrigidos na reconciliação")
+        return {"ajustes": ajustes}
+    except Exception as e:
+        logger.error(f"Erro ao reconciliar o orçamento: {e}")
+        logger.error(traceback.format_exc())
+
+
+# ========== EXECUTOR COM LÍDER ÚNICO ==========
+class ExecutorTarefas:
+    def __init__(self, caminho_lock=TAREFAS_LOCK, caminho_estado=TAREFAS_ESTADO):
+        self.caminho_lock = caminho_lock
+        self.caminho_estado = caminho_estado
+        self.jobs = {}
+        self.lider = False
+        self.resultados = {}
+        self._trava = None
+        self._scheduler = None
+        self._lock = threading.Lock()
+
+    def agendar(self, nome, funcao, hora, minuto=0):
+        # Job diário no horário de Brasília
+        self.jobs[nome] = {"funcao": funcao, "hora": hora, "minuto": minuto}
+
+    # ---------- marcadores de última execução ----------
+    def _ler_estado(self):
+        try:
+            with open(self.caminho_estado, encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _gravar_estado(self, estado):
+        temporario = self.caminho_estado + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(estado, f)
+        os.replace(temporario, self.caminho_estado)
+
+    def _ultimo_horario(self, nome, agora):
+        # Horário agendado mais recente que já passou
+        job = self.jobs[nome]
+        horario = agora.replace(hour=job["hora"], minute=job["minuto"], second=0, microsecond=0)
+        if horario > agora:
+            horario -= timedelta(days=1)
+        return horario
+
+    def executar(self, nome, recuperacao=False):
+        with self._lock:
+            agora = datetime.now(timezone_brasilia)
+            horario = self._ultimo_horario(nome, agora)
+            estado = self._ler_estado()
+            if estado.get(nome, "") >= horario.isoformat():
+                return False  # este horário já foi executado (por este ou outro líder)
+            if recuperacao and (nome not in estado or agora - horario > timedelta(hours=TAREFAS_TOLERANCIA_HORAS)):
+                return False  # sem histórico (primeira execução) ou fora da tolerância
+            if recuperacao:
+                logger.info(f"Recuperando job '{nome}' perdido às {horario.strftime('%d/%m %H:%M')}")
+            try:
+                # Resultado por destinatário da última execução (exposto em estado())
+                self.resultados[nome] = self.jobs[nome]["funcao"]()
+            finally:
+                estado[nome] = horario.isoformat()
+                self._gravar_estado(estado)
+            return True
+
+    # ---------- liderança ----------
+    def _tentar_lideranca(self):
+        trava = open(self.caminho_lock, "a")
+        try:
+            fcntl.flock(trava, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            trava.close()
+            return False
+        self._trava = trava  # mantida aberta enquanto o processo viver
+        trava.truncate(0)
+        trava.write(str(os.getpid()))
+        trava.flush()
+        return True
+
+    def _assumir(self):
+        from apscheduler.schedulers.background import BackgroundScheduler
+        self.lider = True
+        logger.info(f"Processo {os.getpid()} assumiu os jobs agendados")
+        for nome in self.jobs:
+            try:
+                self.executar(nome, recuperacao=True)
+            except Exception as e:
+                logger.error(f"Erro ao recuperar job '{nome}': {e}")
+        self._scheduler = BackgroundScheduler(timezone=timezone_brasilia)
+        for nome, job in self.jobs.items():
+            self._scheduler.add_job(self.executar, 'cron', args=[nome], hour=job["hora"],
+                                    minute=job["minuto"], name=nome, coalesce=True,
+                                    misfire_grace_time=int(TAREFAS_TOLERANCIA_HORAS * 3600))
+        self._scheduler.start()
+
+    def _disputar(self):
+        evento = threading.Event()
+        while not self._tentar_lideranca():
+            evento.wait(TAREFAS_INTERVALO_LIDER)
+        self._assumir()
+
+    def iniciar(self):
+        threading.Thread(target=self._disputar, name="tarefas-lider", daemon=True).start()
+
+    def estado(self):
+        return {"lider": self.lider, "ultimas_execucoes": self._ler_estado(), "resultados": self.resultados}
+
+
+def criar_executor():
+    executor = ExecutorTarefas()
+    executor.agendar("lembrete_diario", enviar_lembrete_diario, hora=20)
+    executor.agendar("resumo_diario", enviar_resumo_diario, hora=22)
+    executor.agendar("reconciliar_orcamento", reconciliar_orcamento, hora=3)
+    return executor